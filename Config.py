@@ -1,3 +1,4 @@
+import os
 
 DB_CONFIG = {
    
@@ -26,6 +27,188 @@ DB_CONFIG = {
 }
 
 
+# SQLite settings used by app.py. Each one can be overridden with an
+# environment variable of the same name.
+DATABASE = os.environ.get('DATABASE', 'internlink.db')
+
+DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 8))
+
+DB_POOL_TIMEOUT = float(os.environ.get('DB_POOL_TIMEOUT', 5))
+
+# Prepared statements kept per connection; dal.py has fewer than this.
+SQLITE_STATEMENT_CACHE = int(os.environ.get('SQLITE_STATEMENT_CACHE', 256))
+
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': int(os.environ.get('SQLITE_BUSY_TIMEOUT', 5000)),
+    'cache_size': -16000,
+    'mmap_size': 128 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+}
+
+
+# Password hashing runs in a separate pool so a burst of logins cannot
+# starve other requests. PASSWORD_HASH_METHOD uses Werkzeug's method
+# syntax; stored hashes made with other parameters are upgraded on login.
+# HASH_POOL_MODE is 'process', 'thread' or 'inline' (no pool, for debugging).
+PASSWORD_HASH_METHOD = os.environ.get('PASSWORD_HASH_METHOD', 'scrypt:32768:8:1')
+
+HASH_POOL_MODE = os.environ.get('HASH_POOL_MODE', 'process')
+
+HASH_POOL_WORKERS = int(os.environ.get('HASH_POOL_WORKERS', os.cpu_count() or 1))
+
+HASH_POOL_MAX_PENDING = int(os.environ.get('HASH_POOL_MAX_PENDING', HASH_POOL_WORKERS * 4))
+
+HASH_TIMEOUT = float(os.environ.get('HASH_TIMEOUT', 10))
+
+HASH_RETRY_AFTER = int(os.environ.get('HASH_RETRY_AFTER', 2))
+
+
+
+# Token-bucket limits for the login and forgot-password endpoints, as
+# (burst, seconds to refill the whole burst) per email and per client IP.
+# THROTTLE_STORE is 'memory' (per process) or 'sqlite' (shared by every
+# worker that uses the same database file).
+THROTTLE_STORE = os.environ.get('THROTTLE_STORE', 'memory')
+
+THROTTLE_LIMITS = {
+    'login': {'email': (5, 60), 'ip': (30, 60)},
+    'forgot_password': {'email': (3, 900), 'ip': (10, 900)},
+}
+
+# Number of reverse proxies in front of the app whose X-Forwarded-For
+# header can be trusted for the client IP (1 on Render).
+TRUSTED_PROXY_HOPS = int(os.environ.get('TRUSTED_PROXY_HOPS', 0))
+
+
+
+# Cache for /api/profile/<id> and /api/applications/<id> (per process).
+READ_CACHE_SIZE = int(os.environ.get('READ_CACHE_SIZE', 10000))
+
+READ_CACHE_TTL = float(os.environ.get('READ_CACHE_TTL', 30))
+
+
+
+# Largest number of applications accepted by /api/apply/batch.
+APPLY_BATCH_LIMIT = int(os.environ.get('APPLY_BATCH_LIMIT', 100))
+
+
+# Application statuses an admin can set, and the most applications one
+# /admin/applications/status call may change.
+APPLICATION_STATUSES = ('Pending', 'Approved', 'Rejected')
+
+STATUS_UPDATE_LIMIT = int(os.environ.get('STATUS_UPDATE_LIMIT', 50000))
+
+
+
+# Seconds between full rebuilds of the in-memory recommendation index.
+RECOMMENDER_REFRESH = float(os.environ.get('RECOMMENDER_REFRESH', 300))
+
+
+
+# Password reset codes. RESET_CODE_STORE is 'sqlite' (shared by all
+# workers) or 'memory' (single process only).
+RESET_CODE_STORE = os.environ.get('RESET_CODE_STORE', 'sqlite')
+
+RESET_CODE_TTL = int(os.environ.get('RESET_CODE_TTL', 15 * 60))
+
+RESET_CODE_MAX_ATTEMPTS = int(os.environ.get('RESET_CODE_MAX_ATTEMPTS', 5))
+
+RESET_CODE_PURGE_INTERVAL = float(os.environ.get('RESET_CODE_PURGE_INTERVAL', 60))
+
+RESET_CODE_PURGE_BATCH = int(os.environ.get('RESET_CODE_PURGE_BATCH', 500))
+
+
+
+# Request, SQL and row-count instrumentation served at /metrics.
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', '1') == '1'
+
+# With several worker processes, each one writes its samples to a file in
+# METRICS_DIR every METRICS_FLUSH_INTERVAL seconds and /metrics adds the
+# files up, so a scrape covers every worker, including ones that have
+# exited. Empty means each process reports only itself (gunicorn.conf.py
+# sets a directory).
+METRICS_DIR = os.environ.get('METRICS_DIR', '')
+
+METRICS_FLUSH_INTERVAL = float(os.environ.get('METRICS_FLUSH_INTERVAL', 5))
+
+
+
+# Fingerprinted static files written by build_assets.py, and on-the-fly
+# gzip for API responses of at least COMPRESS_MIN_SIZE bytes.
+ASSET_DIR = os.environ.get('ASSET_DIR', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static', 'dist'))
+
+COMPRESS_MIN_SIZE = int(os.environ.get('COMPRESS_MIN_SIZE', 1024))
+
+COMPRESS_LEVEL = int(os.environ.get('COMPRESS_LEVEL', 6))
+
+
+
+# Group commit for apply and save-profile: writes are queued to one writer
+# thread per process and committed in batches of up to
+# WRITE_QUEUE_MAX_BATCH, waiting at most WRITE_QUEUE_MAX_DELAY_MS to fill one.
+WRITE_QUEUE_ENABLED = os.environ.get('WRITE_QUEUE_ENABLED', '0') == '1'
+
+WRITE_QUEUE_MAX_BATCH = int(os.environ.get('WRITE_QUEUE_MAX_BATCH', 64))
+
+WRITE_QUEUE_MAX_DELAY_MS = float(os.environ.get('WRITE_QUEUE_MAX_DELAY_MS', 2))
+
+WRITE_QUEUE_MAX_PENDING = int(os.environ.get('WRITE_QUEUE_MAX_PENDING', 1000))
+
+WRITE_QUEUE_TIMEOUT = float(os.environ.get('WRITE_QUEUE_TIMEOUT', 5))
+
+
+# aiosqlite connections per process for async_app.py. One coroutine waits
+# on each query, so this bounds concurrent SQLite reads, not clients.
+ASYNC_DB_POOL_SIZE = int(os.environ.get('ASYNC_DB_POOL_SIZE', 8))
+
+# Worker threads per process that run async_app.py's handlers. Each holds
+# a DB_POOL_SIZE connection while it runs, so more threads than that only
+# queue on the pool. Hashing and write-queue waits are awaited on the
+# event loop and do not hold one.
+ASYNC_THREADS = int(os.environ.get('ASYNC_THREADS', DB_POOL_SIZE))
+
+
+# Live admin dashboard (/admin/events). A stream polls change_log every
+# EVENTS_POLL_INTERVAL seconds and ends after EVENTS_STREAM_SECONDS so it
+# does not hold a worker thread forever; the browser then reconnects with
+# Last-Event-ID. Each process serves at most EVENTS_MAX_STREAMS streams at
+# once, leaving the rest of its gthread threads for other requests; past
+# that the feed answers 503. Once per CHANGE_LOG_PRUNE_INTERVAL seconds
+# each process trims change_log to the newest CHANGE_LOG_RETAIN entries.
+EVENTS_POLL_INTERVAL = float(os.environ.get('EVENTS_POLL_INTERVAL', 1))
+
+EVENTS_KEEPALIVE = float(os.environ.get('EVENTS_KEEPALIVE', 15))
+
+EVENTS_STREAM_SECONDS = float(os.environ.get('EVENTS_STREAM_SECONDS', 300))
+
+EVENTS_RETRY_MS = int(os.environ.get('EVENTS_RETRY_MS', 2000))
+
+EVENTS_MAX_STREAMS = int(os.environ.get('EVENTS_MAX_STREAMS', 2))
+
+CHANGE_LOG_RETAIN = int(os.environ.get('CHANGE_LOG_RETAIN', 100000))
+
+CHANGE_LOG_PRUNE_INTERVAL = float(os.environ.get('CHANGE_LOG_PRUNE_INTERVAL', 60))
+
+
+# Cold storage for old applications, off unless ARCHIVE_DATABASE names a
+# file (e.g. internlink_archive.db). Every connection then ATTACHes it as
+# `archive`; migrations.py creates its table.
+# Once per ARCHIVE_INTERVAL seconds one worker moves applications older
+# than ARCHIVE_AFTER_DAYS there, ARCHIVE_BATCH rows per transaction, then
+# returns up to VACUUM_PAGES free pages to the filesystem.
+ARCHIVE_DATABASE = os.environ.get('ARCHIVE_DATABASE', '')
+
+ARCHIVE_AFTER_DAYS = int(os.environ.get('ARCHIVE_AFTER_DAYS', 365))
+
+ARCHIVE_BATCH = int(os.environ.get('ARCHIVE_BATCH', 500))
+
+ARCHIVE_INTERVAL = float(os.environ.get('ARCHIVE_INTERVAL', 3600))
+
+VACUUM_PAGES = int(os.environ.get('VACUUM_PAGES', 2000))
+
+
 SECRET_KEY = 'your-secret-key-here-change-this-in-production'
 
 MAX_FILE_SIZE = 16 * 1024 * 1024
@@ -1,95 +1,49 @@
-from flask import Flask, request, jsonify, render_template
+from flask import Flask, Response, request, jsonify, render_template
 from flask_cors import CORS
-from werkzeug.security import generate_password_hash, check_password_hash
-import sqlite3
-from datetime import datetime
-import random
-import string
+from werkzeug.middleware.proxy_fix import ProxyFix
 import os
 
+import Config
+import archive
+import assets
+import changes
+import compress
+import db
+import handlers
+import metrics
+import migrations
+import pagination
 
-DATABASE = 'internlink.db'
 
-def get_db_connection():
-    try:
-        conn = sqlite3.connect(DATABASE)
-        conn.row_factory = sqlite3.Row 
-        return conn
-    except Exception as e:
-        print(f"Error connecting to database: {e}")
-        return None
+DATABASE = Config.DATABASE
 
 
 def init_db():
-    conn = get_db_connection()
-    if conn:
-        cursor = conn.cursor()
-        
-        
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS users (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                first_name TEXT NOT NULL,
-                last_name TEXT NOT NULL,
-                email TEXT UNIQUE NOT NULL,
-                password TEXT NOT NULL,
-                user_type TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-            )
-        """)
-        
-        
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS profiles (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER UNIQUE NOT NULL,
-                phone TEXT,
-                university TEXT,
-                course TEXT,
-                year TEXT,
-                gpa TEXT,
-                skills TEXT,
-                interests TEXT,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
-        """)
-        
-       
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS applications (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                user_id INTEGER NOT NULL,
-                position TEXT NOT NULL,
-                company TEXT NOT NULL,
-                status TEXT DEFAULT 'Pending',
-                date_applied TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                FOREIGN KEY (user_id) REFERENCES users (id)
-            )
-        """)
-        
-        
-        cursor.execute("""
-            CREATE TABLE IF NOT EXISTS reset_codes (
-                id INTEGER PRIMARY KEY AUTOINCREMENT,
-                email TEXT NOT NULL,
-                code TEXT NOT NULL,
-                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
-                used INTEGER DEFAULT 0
-            )
-        """)
-        
-        conn.commit()
-        conn.close()
+    with db.get_pool().connection() as conn:
+        migrations.migrate(conn, verbose=False)
         print("✓ Database initialized")
 
 
-init_db()
-
-
 app = Flask(__name__)
 CORS(app)
+db.init_app(app)
+assets.init_app(app)
+
+if Config.METRICS_ENABLED:
+    metrics.init_app(app)
+
+compress.init_app(app)
+archive.init_app(app)
+changes.init_app(app)
+
+if Config.TRUSTED_PROXY_HOPS:
+    app.wsgi_app = ProxyFix(app.wsgi_app, x_for=Config.TRUSTED_PROXY_HOPS)
+
+
+@app.cli.command('init-db')
+def init_db_command():
+    """Create or migrate the database schema."""
+    init_db()
 
 
 @app.route('/')
@@ -97,462 +51,138 @@ def serve_index():
     return render_template('index.html')
 
 
-def generate_reset_code():
-    return ''.join(random.choices(string.digits, k=6))
-
+def respond(result):
+    """The response for a handler's result; see handlers.py."""
+    payload = result[0]
+    if isinstance(payload, handlers.Export):
+        conn = handlers.connection()
+        if not conn:
+            return respond(handlers.DB_FAILED)
+        return pagination.stream_rows(conn.execute(payload.sql), payload.fmt, payload.filename)
+    return handlers.make_response(app, request, result)
 
 
 @app.route('/api/signup', methods=['POST'])
 def signup():
-    try:
-        data = request.get_json()
-        first_name = data.get('first_name')
-        last_name = data.get('last_name')
-        email = data.get('email')
-        password = data.get('password')
-        user_type = 'student'
-        
-        if not all([first_name, last_name, email, password]):
-            return jsonify({'message': 'All fields are required'}), 400
-        
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'message': 'Database connection failed'}), 500
-        
-        cursor = conn.cursor()
-        
-        
-        cursor.execute("SELECT id FROM users WHERE email = ?", (email,))
-        if cursor.fetchone():
-            conn.close()
-            return jsonify({'message': 'Email already registered'}), 400
-        
-        
-        hashed_password = generate_password_hash(password)
-        
-        
-        cursor.execute("""
-            INSERT INTO users (first_name, last_name, email, password, user_type)
-            VALUES (?, ?, ?, ?, ?)
-        """, (first_name, last_name, email, hashed_password, user_type))
-        
-        conn.commit()
-        user_id = cursor.lastrowid
-        
-        user_data = {
-            'id': user_id,
-            'first_name': first_name,
-            'last_name': last_name,
-            'email': email,
-            'user_type': user_type
-        }
-        
-        conn.close()
-        return jsonify({'message': 'Signup successful', 'user': user_data}), 201
-        
-    except Exception as e:
-        print(f"Signup error: {e}")
-        return jsonify({'message': 'An error occurred during signup'}), 500
+    return respond(handlers.signup(request.get_json()))
 
 @app.route('/api/login', methods=['POST'])
 def login():
-    try:
-        data = request.get_json()
-        email = data.get('email')
-        password = data.get('password')
-        
-        if not all([email, password]):
-            return jsonify({'message': 'Email and password are required'}), 400
-        
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'message': 'Database connection failed'}), 500
-        
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM users WHERE email = ?", (email,))
-        user = cursor.fetchone()
-        
-        if not user or not check_password_hash(user['password'], password):
-            conn.close()
-            return jsonify({'message': 'Invalid email or password'}), 401
-        
-        if user['user_type'] != 'student':
-            conn.close()
-            return jsonify({'message': 'Organization portal coming soon in Phase 2!'}), 403
-        
-        user_data = {
-            'id': user['id'],
-            'first_name': user['first_name'],
-            'last_name': user['last_name'],
-            'email': user['email'],
-            'user_type': user['user_type']
-        }
-        
-        conn.close()
-        return jsonify({'message': 'Login successful', 'user': user_data}), 200
-        
-    except Exception as e:
-        print(f"Login error: {e}")
-        return jsonify({'message': 'An error occurred during login'}), 500
+    return respond(handlers.login(request.get_json(), request.remote_addr))
 
 @app.route('/api/forgot-password', methods=['POST'])
 def forgot_password():
-    try:
-        data = request.get_json()
-        email = data.get('email')
-        
-        if not email:
-            return jsonify({'message': 'Email is required'}), 400
-        
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'message': 'Database connection failed'}), 500
-        
-        cursor = conn.cursor()
-        cursor.execute("SELECT id FROM users WHERE email = ?", (email,))
-        user = cursor.fetchone()
-        
-        if user:
-            
-            reset_code = generate_reset_code()
-            
-            
-            cursor.execute("""
-                INSERT INTO reset_codes (email, code)
-                VALUES (?, ?)
-            """, (email, reset_code))
-            conn.commit()
-            
-           
-            print(f"Reset code for {email}: {reset_code}")
-            
-            conn.close()
-            return jsonify({
-                'message': f'Reset code sent! For demo purposes, your code is: {reset_code}',
-                'reset_code': reset_code  
-            }), 200
-        else:
-            conn.close()
-            
-            return jsonify({
-                'message': 'If an account exists with this email, you will receive a reset code.'
-            }), 200
-        
-    except Exception as e:
-        print(f"Forgot password error: {e}")
-        return jsonify({'message': 'An error occurred'}), 500
+    return respond(handlers.forgot_password(request.get_json(), request.remote_addr))
 
 @app.route('/api/verify-reset-code', methods=['POST'])
 def verify_reset_code():
-    try:
-        data = request.get_json()
-        email = data.get('email')
-        code = data.get('code')
-        
-        if not all([email, code]):
-            return jsonify({'message': 'Email and code are required'}), 400
-        
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'message': 'Database connection failed'}), 500
-        
-        cursor = conn.cursor()
-        
-        
-        cursor.execute("""
-            SELECT id FROM reset_codes 
-            WHERE email = ? AND code = ? AND used = 0
-            ORDER BY created_at DESC
-            LIMIT 1
-        """, (email, code))
-        
-        reset_record = cursor.fetchone()
-        conn.close()
-        
-        if reset_record:
-            return jsonify({'message': 'Code verified successfully'}), 200
-        else:
-            return jsonify({'message': 'Invalid or expired code'}), 400
-        
-    except Exception as e:
-        print(f"Verify code error: {e}")
-        return jsonify({'message': 'An error occurred'}), 500
+    return respond(handlers.verify_reset_code(request.get_json()))
 
 @app.route('/api/reset-password', methods=['POST'])
 def reset_password():
-    try:
-        data = request.get_json()
-        email = data.get('email')
-        code = data.get('code')
-        new_password = data.get('new_password')
-        
-        if not all([email, code, new_password]):
-            return jsonify({'message': 'All fields are required'}), 400
-        
-        if len(new_password) < 8:
-            return jsonify({'message': 'Password must be at least 8 characters'}), 400
-        
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'message': 'Database connection failed'}), 500
-        
-        cursor = conn.cursor()
-        
-       
-        cursor.execute("""
-            SELECT id FROM reset_codes 
-            WHERE email = ? AND code = ? AND used = 0
-            ORDER BY created_at DESC
-            LIMIT 1
-        """, (email, code))
-        
-        reset_record = cursor.fetchone()
-        
-        if not reset_record:
-            conn.close()
-            return jsonify({'message': 'Invalid or expired code'}), 400
-        
-        
-        cursor.execute("""
-            UPDATE reset_codes 
-            SET used = 1 
-            WHERE id = ?
-        """, (reset_record['id'],))
-        
-        
-        hashed_password = generate_password_hash(new_password)
-        cursor.execute("""
-            UPDATE users 
-            SET password = ? 
-            WHERE email = ?
-        """, (hashed_password, email))
-        
-        conn.commit()
-        conn.close()
-        
-        return jsonify({'message': 'Password reset successful'}), 200
-        
-    except Exception as e:
-        print(f"Reset password error: {e}")
-        return jsonify({'message': 'An error occurred'}), 500
-
-
+    return respond(handlers.reset_password(request.get_json()))
 
 @app.route('/api/profile/<int:user_id>', methods=['GET'])
 def get_profile(user_id):
-    try:
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'message': 'Database connection failed'}), 500
-        
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM profiles WHERE user_id = ?", (user_id,))
-        profile = cursor.fetchone()
-        
-        conn.close()
-        
-        if profile:
-            return jsonify(dict(profile)), 200
-        else:
-            return jsonify({'message': 'Profile not found'}), 404
-            
-    except Exception as e:
-        print(f"Get profile error: {e}")
-        return jsonify({'message': 'An error occurred'}), 500
+    return respond(handlers.get_profile(user_id, request.args))
 
 @app.route('/api/profile', methods=['POST'])
 def save_profile():
-    try:
-        data = request.get_json()
-        user_id = data.get('user_id')
-        
-        if not user_id:
-            return jsonify({'message': 'User ID is required'}), 400
-        
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'message': 'Database connection failed'}), 500
-        
-        cursor = conn.cursor()
-        
-        
-        cursor.execute("SELECT id FROM profiles WHERE user_id = ?", (user_id,))
-        existing = cursor.fetchone()
-        
-        if existing:
-            
-            cursor.execute("""
-                UPDATE profiles 
-                SET phone = ?, university = ?, course = ?, year = ?, 
-                    gpa = ?, skills = ?, interests = ?, updated_at = ?
-                WHERE user_id = ?
-            """, (
-                data.get('phone'),
-                data.get('university'),
-                data.get('course'),
-                data.get('year'),
-                data.get('gpa'),
-                data.get('skills'),
-                data.get('interests'),
-                datetime.now(),
-                user_id
-            ))
-        else:
-            
-            cursor.execute("""
-                INSERT INTO profiles 
-                (user_id, phone, university, course, year, gpa, skills, interests)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            """, (
-                user_id,
-                data.get('phone'),
-                data.get('university'),
-                data.get('course'),
-                data.get('year'),
-                data.get('gpa'),
-                data.get('skills'),
-                data.get('interests')
-            ))
-        
-        conn.commit()
-        
-        
-        cursor.execute("SELECT * FROM profiles WHERE user_id = ?", (user_id,))
-        profile = cursor.fetchone()
-        
-        conn.close()
-        return jsonify(dict(profile)), 200
-        
-    except Exception as e:
-        print(f"Save profile error: {e}")
-        return jsonify({'message': 'An error occurred while saving profile'}), 500
-
-
+    return respond(handlers.save_profile(request.get_json()))
 
 @app.route('/api/applications/<int:user_id>', methods=['GET'])
 def get_applications(user_id):
-    try:
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'message': 'Database connection failed'}), 500
-        
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT * FROM applications 
-            WHERE user_id = ? 
-            ORDER BY date_applied DESC
-        """, (user_id,))
-        
-        applications = [dict(row) for row in cursor.fetchall()]
-        conn.close()
-        
-        return jsonify(applications), 200
-        
-    except Exception as e:
-        print(f"Get applications error: {e}")
-        return jsonify({'message': 'An error occurred'}), 500
+    return respond(handlers.get_applications(user_id, request.args))
+
+@app.route('/api/internships', methods=['GET'])
+def search_internships():
+    return respond(handlers.search_internships(request.args))
+
+@app.route('/api/internships/<int:internship_id>', methods=['GET'])
+def get_internship(internship_id):
+    return respond(handlers.get_internship(internship_id))
+
+@app.route('/api/recommendations/<int:user_id>', methods=['GET'])
+def recommend_internships(user_id):
+    return respond(handlers.recommend_internships(user_id, request.args))
 
 @app.route('/api/apply', methods=['POST'])
 def apply_internship():
-    try:
-        data = request.get_json()
-        user_id = data.get('user_id')
-        position = data.get('position')
-        company = data.get('company')
-        
-        if not all([user_id, position, company]):
-            return jsonify({'message': 'All fields are required'}), 400
-        
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'message': 'Database connection failed'}), 500
-        
-        cursor = conn.cursor()
-        
-       
-        cursor.execute("""
-            SELECT id FROM applications 
-            WHERE user_id = ? AND position = ? AND company = ?
-        """, (user_id, position, company))
-        
-        if cursor.fetchone():
-            conn.close()
-            return jsonify({'message': 'Already applied to this internship'}), 400
-        
-        
-        cursor.execute("""
-            INSERT INTO applications (user_id, position, company, status)
-            VALUES (?, ?, ?, ?)
-        """, (user_id, position, company, 'Pending'))
-        
-        conn.commit()
-        application_id = cursor.lastrowid
-        
-        cursor.execute("SELECT * FROM applications WHERE id = ?", (application_id,))
-        application = cursor.fetchone()
-        
-        conn.close()
-        return jsonify(dict(application)), 201
-        
-    except Exception as e:
-        print(f"Apply error: {e}")
-        return jsonify({'message': 'An error occurred while submitting application'}), 500
+    return respond(handlers.apply_internship(request.get_json()))
+
+@app.route('/api/apply/batch', methods=['POST'])
+def apply_internships_batch():
+    return respond(handlers.apply_internships_batch(request.get_json()))
 
 
 @app.route('/admin')
 def admin_dashboard():
     return render_template('admin.html')
 
+@app.route('/admin/stats', methods=['GET'])
+def get_admin_stats():
+    return respond(handlers.admin_stats())
+
 @app.route('/admin/users', methods=['GET'])
 def get_all_users():
-    try:
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'message': 'Database connection failed'}), 500
-        
-        cursor = conn.cursor()
-        cursor.execute("SELECT id, first_name, last_name, email, user_type, created_at FROM users ORDER BY created_at DESC")
-        users = [dict(row) for row in cursor.fetchall()]
-        conn.close()
-        
-        return jsonify(users), 200
-    except Exception as e:
-        print(f"Error fetching users: {e}")
-        return jsonify({'message': 'Error fetching users'}), 500
+    return respond(handlers.admin_users(request.args))
 
 @app.route('/admin/profiles', methods=['GET'])
 def get_all_profiles():
-    try:
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'message': 'Database connection failed'}), 500
-        
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM profiles ORDER BY created_at DESC")
-        profiles = [dict(row) for row in cursor.fetchall()]
-        conn.close()
-        
-        return jsonify(profiles), 200
-    except Exception as e:
-        print(f"Error fetching profiles: {e}")
-        return jsonify({'message': 'Error fetching profiles'}), 500
+    return respond(handlers.admin_profiles(request.args))
+
+@app.route('/admin/users/search', methods=['GET'])
+def search_users():
+    return respond(handlers.search_users(request.args))
+
+@app.route('/admin/profiles/search', methods=['GET'])
+def search_profiles():
+    return respond(handlers.search_profiles(request.args))
+
+@app.route('/admin/profiles/tags', methods=['GET'])
+def search_profiles_by_tags():
+    return respond(handlers.search_profiles_by_tags(request.args))
 
 @app.route('/admin/applications', methods=['GET'])
 def get_all_applications():
-    try:
-        conn = get_db_connection()
-        if not conn:
-            return jsonify({'message': 'Database connection failed'}), 500
-        
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM applications ORDER BY date_applied DESC")
-        applications = [dict(row) for row in cursor.fetchall()]
-        conn.close()
-        
-        return jsonify(applications), 200
-    except Exception as e:
-        print(f"Error fetching applications: {e}")
-        return jsonify({'message': 'Error fetching applications'}), 500
+    return respond(handlers.admin_applications(request.args))
+
+@app.route('/admin/applications/status', methods=['POST'])
+def update_application_statuses():
+    return respond(handlers.update_application_statuses(request.get_json()))
+
+@app.route('/admin/internships/<int:internship_id>/candidates', methods=['GET'])
+def recommend_students(internship_id):
+    return respond(handlers.recommend_students(internship_id, request.args))
+
+@app.route('/admin/events', methods=['GET'])
+def admin_events():
+    """Server-Sent Events: every change to users, profiles and applications."""
+    if not changes.streams.acquire():
+        return respond(handlers.STREAMS_BUSY)
+    last_event_id = changes.parse_event_id(
+        request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    )
+    response = Response(
+        changes.feed(last_event_id),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    # Runs when the server closes the response, even one never iterated.
+    response.call_on_close(changes.streams.release)
+    return response
+
+@app.route('/admin/runtime-stats', methods=['GET'])
+def get_runtime_stats():
+    return jsonify(handlers.runtime_stats()), 200
+
+
+metrics.register_collector(handlers.runtime_metrics)
+
+
+@app.route('/metrics', methods=['GET'])
+def get_metrics():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
 
 
 if __name__ == '__main__':
@@ -572,6 +202,8 @@ if __name__ == '__main__':
     print("  - Review applications")
     print("="*60)
     
+    init_db()
+    
     port = int(os.environ.get('PORT', 5000))
     debug = os.environ.get('FLASK_ENV') != 'production'
     
@@ -0,0 +1,202 @@
+"""
+Moves old applications out of the hot database into the archive file.
+
+Applications older than Config.ARCHIVE_AFTER_DAYS are copied into
+archive.applications (Config.ARCHIVE_DATABASE, ATTACHed to every pooled
+connection by db.py) and deleted from the main table. Each batch of
+Config.ARCHIVE_BATCH rows is its own short transaction, so signups and
+applies only ever wait for one batch. Reads look at the hot table unless
+they pass ?include_archive=1.
+
+Archiving is off unless ARCHIVE_DATABASE is set. The delete triggers
+keep the admin counters and the change log in step, so /admin/stats
+counts the applications still in the hot table. The unique index on
+(user_id, position, company) only covers the hot table, so the apply
+paths look in archive.applications before inserting.
+
+Each batch also drops the moved users' cached /api/applications bodies,
+in the process that archived them; other workers' copies expire after
+Config.READ_CACHE_TTL, as after any write.
+
+migrate() creates archive.applications; so does running this file, in
+case ARCHIVE_DATABASE points at a new file. After moving rows,
+`PRAGMA incremental_vacuum` returns up to Config.VACUUM_PAGES free pages
+to the filesystem. That needs auto_vacuum=INCREMENTAL, which migrate()
+sets only on a brand-new database file. An existing one is switched by
+the --enable-incremental-vacuum maintenance step, a full VACUUM to run
+once while the app is stopped.
+
+Inside the app, an Archiver thread in each worker wakes every
+Config.ARCHIVE_INTERVAL seconds. A file lock lets only one process do a
+pass at a time. It can also be run by hand or from cron:
+
+    python archive.py
+    python archive.py --days 180 --dry-run
+"""
+import argparse
+import fcntl
+import json
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import Config
+import cache
+import dal
+import db
+import migrations
+
+
+def cutoff(days):
+    """The date_applied before which rows are archived, in CURRENT_TIMESTAMP's format."""
+    return (datetime.now(timezone.utc) - timedelta(days=days)).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def move_batch(conn, before, batch_size):
+    """
+    Move up to `batch_size` applications older than `before`; returns
+    (how many moved, ids of the users they belong to).
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        rows = conn.execute(dal.ARCHIVE_IDS_SQL, (before, batch_size)).fetchall()
+        if rows:
+            ids_json = json.dumps([row[0] for row in rows])
+            conn.execute(dal.COPY_TO_ARCHIVE_SQL, (ids_json,))
+            conn.execute(dal.DELETE_ARCHIVED_SQL, (ids_json,))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return len(rows), {row[1] for row in rows}
+
+
+def incremental_vacuum(conn, pages):
+    """Free up to `pages` pages if the database uses auto_vacuum=INCREMENTAL; returns the count."""
+    if conn.execute("PRAGMA main.auto_vacuum").fetchone()[0] != 2:
+        return 0
+    free = conn.execute("PRAGMA main.freelist_count").fetchone()[0]
+    conn.execute(f"PRAGMA main.incremental_vacuum({int(pages)})").fetchall()
+    return free - conn.execute("PRAGMA main.freelist_count").fetchone()[0]
+
+
+class Archiver:
+    """Daemon thread that archives old applications a batch at a time."""
+
+    def __init__(self, interval, days, batch_size, vacuum_pages):
+        self.interval = interval
+        self.days = days
+        self.batch_size = batch_size
+        self.vacuum_pages = vacuum_pages
+        self.moved = 0
+        self.vacuumed_pages = 0
+        self.runs = 0
+        self.skipped = 0
+        self.last_run = None
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def ensure_started(self):
+        # Started on first use rather than at import so it runs in each
+        # forked worker, not only in the parent.
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, daemon=True)
+                    self._thread.start()
+
+    def run_once(self):
+        """One pass over everything due; returns (rows moved, pages freed), or None if another process holds the lock."""
+        with open(Config.DATABASE + '.archive-lock', 'w') as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except BlockingIOError:
+                self.skipped += 1
+                return None
+
+            before = cutoff(self.days)
+            moved = 0
+            with db.get_pool().connection() as conn:
+                while True:
+                    count, user_ids = move_batch(conn, before, self.batch_size)
+                    for user_id in user_ids:
+                        cache.read_cache.invalidate(('applications', user_id))
+                    moved += count
+                    if count < self.batch_size:
+                        break
+                    # Give writers a turn between batches.
+                    time.sleep(0.01)
+                freed = incremental_vacuum(conn, self.vacuum_pages)
+
+        self.moved += moved
+        self.vacuumed_pages += freed
+        self.runs += 1
+        self.last_run = datetime.now(timezone.utc).isoformat(timespec='seconds')
+        return moved, freed
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Archive error: {e}")
+
+    def stats(self):
+        return {
+            'enabled': bool(Config.ARCHIVE_DATABASE and self.interval > 0),
+            'database': Config.ARCHIVE_DATABASE,
+            'after_days': self.days,
+            'runs': self.runs,
+            'skipped': self.skipped,
+            'moved': self.moved,
+            'vacuumed_pages': self.vacuumed_pages,
+            'last_run': self.last_run,
+        }
+
+
+archiver = Archiver(Config.ARCHIVE_INTERVAL, Config.ARCHIVE_AFTER_DAYS, Config.ARCHIVE_BATCH, Config.VACUUM_PAGES)
+
+
+def init_app(app):
+    if Config.ARCHIVE_DATABASE and Config.ARCHIVE_INTERVAL > 0:
+        app.before_request(archiver.ensure_started)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Move old applications to the archive database.')
+    parser.add_argument('--days', type=int, default=Config.ARCHIVE_AFTER_DAYS)
+    parser.add_argument('--batch', type=int, default=Config.ARCHIVE_BATCH)
+    parser.add_argument('--dry-run', action='store_true', help='only count what would move')
+    parser.add_argument('--enable-incremental-vacuum', action='store_true',
+                        help='switch the database to auto_vacuum=INCREMENTAL (runs a full VACUUM)')
+    args = parser.parse_args()
+
+    if not Config.ARCHIVE_DATABASE:
+        print("❌ ARCHIVE_DATABASE is empty; archiving is turned off")
+        raise SystemExit(1)
+
+    with db.get_pool().connection() as conn:
+        migrations.create_archive_schema(conn)
+
+    if args.enable_incremental_vacuum:
+        conn = db.get_pool().connect()
+        conn.execute("PRAGMA main.auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM main")
+        conn.close()
+        print("✓ auto_vacuum is now INCREMENTAL")
+
+    if args.dry_run:
+        with db.get_pool().connection() as conn:
+            count = conn.execute(
+                "SELECT COUNT(*) FROM main.applications WHERE date_applied < ?", (cutoff(args.days),)
+            ).fetchone()[0]
+        print(f"✓ {count} applications are older than {args.days} days")
+    else:
+        result = Archiver(0, args.days, args.batch, Config.VACUUM_PAGES).run_once()
+        if result is None:
+            print("❌ Another process is archiving right now")
+            raise SystemExit(1)
+        moved, freed = result
+        print(f"✓ Moved {moved} applications to {Config.ARCHIVE_DATABASE}")
+        print(f"✓ Freed {freed} pages")
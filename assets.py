@@ -0,0 +1,92 @@
+"""
+Fingerprinted static assets.
+
+build_assets.py copies each file in static/ into Config.ASSET_DIR under a
+content-hashed name (style.3f9c2a1b7d4e.css), with .gz and, when the brotli
+package is installed, .br copies next to it. It also writes manifest.json,
+which maps each original name to its hashed one. Templates link through
+asset_url(). A hashed file never changes, so /assets/ responses are
+immutable for a year. The precompressed copy matching Accept-Encoding is
+sent as-is. asset_file() and asset_headers() are shared with
+async_app.py's /assets/ route.
+
+A checkout that has not run the build has no manifest, and asset_url()
+falls back to the plain /static/ URL. The manifest is read once per
+process.
+"""
+import json
+import mimetypes
+import os
+
+from flask import abort, request, send_from_directory, url_for
+
+import Config
+
+
+MANIFEST = 'manifest.json'
+
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+# Preferred first.
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+
+_manifest = None
+_files = frozenset()
+
+
+def load_manifest():
+    global _manifest, _files
+    if _manifest is None:
+        try:
+            with open(os.path.join(Config.ASSET_DIR, MANIFEST)) as f:
+                manifest = json.load(f)
+            _files = frozenset(os.listdir(Config.ASSET_DIR))
+        except FileNotFoundError:
+            manifest = {}
+        _manifest = manifest
+    return _manifest
+
+
+def asset_url(name, url_for=url_for):
+    """The URL for static/<name>; async_app.py passes Quart's url_for."""
+    hashed = load_manifest().get(name)
+    if hashed is None:
+        return url_for('static', filename=name)
+    return url_for('serve_asset', filename=hashed)
+
+
+def asset_file(filename, accept_encodings):
+    """
+    (file in Config.ASSET_DIR, mimetype, content encoding or None) to send
+    for /assets/<filename>, or None if there is no such asset.
+    """
+    load_manifest()
+    if filename not in _files or filename == MANIFEST:
+        return None
+
+    mimetype = mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+    for encoding, suffix in ENCODINGS:
+        if accept_encodings[encoding] and filename + suffix in _files:
+            return filename + suffix, mimetype, encoding
+    return filename, mimetype, None
+
+
+def asset_headers(response, encoding):
+    if encoding:
+        response.content_encoding = encoding
+    response.vary.add('Accept-Encoding')
+    response.headers['Cache-Control'] = IMMUTABLE
+    return response
+
+
+def serve_asset(filename):
+    found = asset_file(filename, request.accept_encodings)
+    if found is None:
+        abort(404)
+    path, mimetype, encoding = found
+    return asset_headers(send_from_directory(Config.ASSET_DIR, path, mimetype=mimetype), encoding)
+
+
+def init_app(app):
+    app.add_url_rule('/assets/<path:filename>', 'serve_asset', serve_asset)
+    app.context_processor(lambda: {'asset_url': asset_url})
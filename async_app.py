@@ -0,0 +1,456 @@
+"""
+Asyncio serving mode: the same /api/* and /admin/* routes as app.py, on
+Quart and an ASGI server.
+
+    python migrations.py
+    hypercorn async_app:app --bind 0.0.0.0:$PORT --workers 2
+
+A request that is waiting (on a slow client, or for its handler to
+finish) holds a coroutine rather than a thread, so a few processes can
+keep thousands of connections open. The route logic is handlers.py, the
+same code app.py runs; here each handler runs in a worker thread, one of
+Config.ASYNC_THREADS, with a pooled sqlite3 connection lent to it by a
+db.Lease, so SQLite never blocks the event loop. Handlers that wait on
+the hashing pool or the group-commit writer yield the job (see
+run_steps()); the wait is awaited on the loop, and only the code before
+and after it takes a thread. The admin exports, which can take as long
+as the client takes to read them, stream from aiosqlite connections in
+AsyncConnectionPool and hold no thread at all.
+
+The handlers' own SQLite work is still bounded by the thread count:
+requests beyond it queue for a thread rather than a connection.
+
+tests/ runs the same suite against both apps. The sync Flask app is
+still the default (gunicorn.conf.py, render.yaml).
+"""
+import asyncio
+import functools
+import gzip
+import time
+import weakref
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+
+import aiosqlite
+from quart import Quart, Response, abort, g, jsonify, render_template, request, send_from_directory, url_for
+from quart.wrappers.response import DataBody, IterableBody
+from quart_cors import cors
+from hypercorn.middleware import ProxyFixMiddleware
+
+import Config
+import archive
+import assets
+import changes
+import compress
+import db
+import handlers
+import hashing
+import metrics
+import pagination
+
+
+class AsyncConnectionPool:
+    """
+    Fixed set of aiosqlite connections, opened when the server starts and
+    configured like db.ConnectionPool's. Waiting for a free one is an await,
+    not a blocked thread.
+    """
+
+    def __init__(self, database, size=8, timeout=5.0, pragmas=None):
+        self.database = database
+        self.size = size
+        self.timeout = timeout
+        self.pragmas = pragmas or {}
+        self._idle = None
+        self._conns = []
+        self._stats = {
+            'acquired': 0,
+            'waits': 0,
+            'timeouts': 0,
+        }
+
+    async def open(self):
+        self._idle = asyncio.Queue()
+        for _ in range(self.size):
+            # aiosqlite runs the connector on the connection's own thread,
+            # so it is set up (pragmas, archive) exactly as db.py's are.
+            conn = await aiosqlite.Connection(functools.partial(db.connect, self.database, self.pragmas), 64)
+            self._conns.append(conn)
+            self._idle.put_nowait(conn)
+
+    async def close(self):
+        for conn in self._conns:
+            await conn.close()
+        self._conns = []
+
+    @asynccontextmanager
+    async def connection(self):
+        if self._idle.empty():
+            self._stats['waits'] += 1
+        try:
+            conn = await asyncio.wait_for(self._idle.get(), self.timeout)
+        except asyncio.TimeoutError:
+            self._stats['timeouts'] += 1
+            raise db.PoolTimeout(f"No database connection free after {self.timeout}s")
+        self._stats['acquired'] += 1
+        try:
+            yield conn
+        finally:
+            if conn.in_transaction:
+                await conn.rollback()
+            self._idle.put_nowait(conn)
+
+    def stats(self):
+        stats = dict(self._stats)
+        stats['size'] = self.size
+        stats['open'] = len(self._conns)
+        stats['idle'] = self._idle.qsize() if self._idle is not None else 0
+        stats['in_use'] = stats['open'] - stats['idle']
+        return stats
+
+
+pool = AsyncConnectionPool(
+    Config.DATABASE,
+    size=Config.ASYNC_DB_POOL_SIZE,
+    timeout=Config.DB_POOL_TIMEOUT,
+    pragmas=Config.SQLITE_PRAGMAS,
+)
+
+
+async def in_thread(fn, *args):
+    """Run `fn(*args)` in a worker thread, where db.get_db() lends it a pooled connection."""
+    def call():
+        with db.bound_connection():
+            return fn(*args)
+    return await asyncio.to_thread(call)
+
+
+async def run_steps(steps, *args):
+    """
+    Drive a handler's steps (see handlers.py): its code runs in worker
+    threads that share one leased connection, and each job it yields is
+    awaited here, holding no thread.
+    """
+    lease = db.Lease()
+    handler = steps(*args)
+
+    def advance(*sent):
+        with lease.bound():
+            done, value = handlers.step(handler, *sent)
+        if done:
+            lease.close()
+        return done, value
+
+    try:
+        done, value = await asyncio.to_thread(advance)
+        while not done:
+            try:
+                sent = (await value.run_async(), None)
+            except Exception as e:
+                sent = (None, e)
+            done, value = await asyncio.to_thread(advance, *sent)
+        return value
+    finally:
+        # Only left open if the request was cancelled mid-way.
+        lease.close()
+
+
+app = Quart(__name__)
+app = cors(app)
+
+if Config.TRUSTED_PROXY_HOPS:
+    app.asgi_app = ProxyFixMiddleware(app.asgi_app, mode='legacy', trusted_hops=Config.TRUSTED_PROXY_HOPS)
+
+
+@app.before_serving
+async def startup():
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(Config.ASYNC_THREADS, thread_name_prefix='handler')
+    )
+    await pool.open()
+    # needs_rehash() hashes once to learn the current parameters; do that
+    # now rather than on the event loop in the first login.
+    await asyncio.to_thread(hashing.get_pool().needs_rehash, '')
+    if Config.ARCHIVE_DATABASE and Config.ARCHIVE_INTERVAL > 0:
+        archive.archiver.ensure_started()
+    if Config.CHANGE_LOG_PRUNE_INTERVAL > 0:
+        changes.pruner.ensure_started()
+
+
+@app.after_serving
+async def shutdown():
+    await pool.close()
+
+
+app.context_processor(lambda: {'asset_url': functools.partial(assets.asset_url, url_for=url_for)})
+
+
+@app.route('/assets/<path:filename>')
+async def serve_asset(filename):
+    found = assets.asset_file(filename, request.accept_encodings)
+    if found is None:
+        abort(404)
+    path, mimetype, encoding = found
+    return assets.asset_headers(await send_from_directory(Config.ASSET_DIR, path, mimetype=mimetype), encoding)
+
+
+def stream_response(chunks, mimetype, headers=None):
+    """A streamed response, gzipped chunk by chunk as compress.py does in app.py."""
+    gzipped = bool(request.accept_encodings['gzip'])
+    if gzipped:
+        chunks = compress.gzip_stream_async(chunks, Config.COMPRESS_LEVEL)
+    response = Response(chunks, mimetype=mimetype, headers=headers)
+    response.vary.add('Accept-Encoding')
+    if gzipped:
+        response.content_encoding = 'gzip'
+    return response
+
+
+@app.after_request
+async def compress_response(response):
+    # Streamed bodies (the exports, the event feed) are gzipped by
+    # stream_response() or not at all; only in-memory bodies are handled here.
+    if not compress.compressible(response) or not isinstance(response.response, DataBody):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    if not request.accept_encodings['gzip']:
+        return response
+
+    body = await response.get_data()
+    if len(body) < Config.COMPRESS_MIN_SIZE:
+        return response
+    response.set_data(gzip.compress(body, Config.COMPRESS_LEVEL, mtime=0))
+    response.content_encoding = 'gzip'
+    compress.weaken_etag(response)
+    return response
+
+
+if Config.METRICS_ENABLED:
+    @app.before_request
+    async def start_timer():
+        metrics.ensure_flushing()
+        g.started = time.perf_counter()
+
+    @app.after_request
+    async def record_latency(response):
+        started = g.pop('started', None)
+        if started is not None:
+            rule = request.url_rule
+            route = rule.rule if rule is not None else 'unmatched'
+            metrics.REQUEST_LATENCY.labels(route, request.method, str(response.status_code)).observe(
+                time.perf_counter() - started
+            )
+        return response
+
+
+@app.route('/')
+async def serve_index():
+    return await render_template('index.html')
+
+
+async def _export_chunks(sql, fmt):
+    # Holds one pooled connection until the last row has been sent.
+    async with pool.connection() as conn:
+        async with conn.execute(sql) as cursor:
+            columns = [d[0] for d in cursor.description]
+            first = True
+            while True:
+                rows = await cursor.fetchmany(pagination.STREAM_BATCH)
+                if rows or first:
+                    chunk = pagination.export_chunk(columns, rows, fmt, first)
+                    if chunk:
+                        yield chunk
+                if not rows:
+                    break
+                first = False
+
+
+async def respond(handler, *args):
+    """Run `handler(*args)` and build its response; see handlers.py."""
+    steps = getattr(handler, 'steps', None)
+    if steps is not None:
+        result = await run_steps(steps, *args)
+    else:
+        result = await in_thread(handler, *args)
+    payload = result[0]
+    if isinstance(payload, handlers.Export):
+        mimetype, headers = pagination.export_type(payload.fmt, payload.filename)
+        return stream_response(_export_chunks(payload.sql, payload.fmt), mimetype, headers)
+    return handlers.make_response(app, request, result)
+
+
+@app.route('/api/signup', methods=['POST'])
+async def signup():
+    return await respond(handlers.signup, await request.get_json())
+
+@app.route('/api/login', methods=['POST'])
+async def login():
+    return await respond(handlers.login, await request.get_json(), request.remote_addr)
+
+@app.route('/api/forgot-password', methods=['POST'])
+async def forgot_password():
+    return await respond(handlers.forgot_password, await request.get_json(), request.remote_addr)
+
+@app.route('/api/verify-reset-code', methods=['POST'])
+async def verify_reset_code():
+    return await respond(handlers.verify_reset_code, await request.get_json())
+
+@app.route('/api/reset-password', methods=['POST'])
+async def reset_password():
+    return await respond(handlers.reset_password, await request.get_json())
+
+@app.route('/api/profile/<int:user_id>', methods=['GET'])
+async def get_profile(user_id):
+    return await respond(handlers.get_profile, user_id, request.args)
+
+@app.route('/api/profile', methods=['POST'])
+async def save_profile():
+    return await respond(handlers.save_profile, await request.get_json())
+
+@app.route('/api/applications/<int:user_id>', methods=['GET'])
+async def get_applications(user_id):
+    return await respond(handlers.get_applications, user_id, request.args)
+
+@app.route('/api/internships', methods=['GET'])
+async def search_internships():
+    return await respond(handlers.search_internships, request.args)
+
+@app.route('/api/internships/<int:internship_id>', methods=['GET'])
+async def get_internship(internship_id):
+    return await respond(handlers.get_internship, internship_id)
+
+@app.route('/api/recommendations/<int:user_id>', methods=['GET'])
+async def recommend_internships(user_id):
+    return await respond(handlers.recommend_internships, user_id, request.args)
+
+@app.route('/api/apply', methods=['POST'])
+async def apply_internship():
+    return await respond(handlers.apply_internship, await request.get_json())
+
+@app.route('/api/apply/batch', methods=['POST'])
+async def apply_internships_batch():
+    return await respond(handlers.apply_internships_batch, await request.get_json())
+
+
+@app.route('/admin')
+async def admin_dashboard():
+    return await render_template('admin.html')
+
+@app.route('/admin/stats', methods=['GET'])
+async def get_admin_stats():
+    return await respond(handlers.admin_stats)
+
+@app.route('/admin/users', methods=['GET'])
+async def get_all_users():
+    return await respond(handlers.admin_users, request.args)
+
+@app.route('/admin/profiles', methods=['GET'])
+async def get_all_profiles():
+    return await respond(handlers.admin_profiles, request.args)
+
+@app.route('/admin/users/search', methods=['GET'])
+async def search_users():
+    return await respond(handlers.search_users, request.args)
+
+@app.route('/admin/profiles/search', methods=['GET'])
+async def search_profiles():
+    return await respond(handlers.search_profiles, request.args)
+
+@app.route('/admin/profiles/tags', methods=['GET'])
+async def search_profiles_by_tags():
+    return await respond(handlers.search_profiles_by_tags, request.args)
+
+@app.route('/admin/applications', methods=['GET'])
+async def get_all_applications():
+    return await respond(handlers.admin_applications, request.args)
+
+@app.route('/admin/applications/status', methods=['POST'])
+async def update_application_statuses():
+    return await respond(handlers.update_application_statuses, await request.get_json())
+
+@app.route('/admin/internships/<int:internship_id>/candidates', methods=['GET'])
+async def recommend_students(internship_id):
+    return await respond(handlers.recommend_students, internship_id, request.args)
+
+class ClosingBody(IterableBody):
+    """
+    A streamed body that calls `on_close` exactly once: after it has been
+    sent, or when it is dropped unsent because the client left before the
+    response started. Closing a generator that never started would not
+    run its finally block.
+    """
+
+    def __init__(self, iterable, on_close):
+        super().__init__(iterable)
+        self._on_close = weakref.finalize(self, on_close)
+
+    async def __aexit__(self, exc_type, exc_value, tb):
+        try:
+            await super().__aexit__(exc_type, exc_value, tb)
+        finally:
+            self._on_close()
+
+
+async def event_stream(last_event_id):
+    # changes.feed() with the sleep between polls awaited.
+    def resume():
+        return changes.resume_point(db.get_db(), last_event_id)
+
+    def poll(after):
+        return changes.read_events(db.get_db(), after)
+
+    started = last_sent = time.monotonic()
+    after, reload = await in_thread(resume)
+    yield f"retry: {Config.EVENTS_RETRY_MS}\n\n"
+    yield changes.reset_event(after) if reload else f"id: {after}\n\n"
+
+    while time.monotonic() - started < Config.EVENTS_STREAM_SECONDS:
+        text, after = await in_thread(poll, after)
+        if text:
+            yield text
+            last_sent = time.monotonic()
+            continue
+        if time.monotonic() - last_sent >= Config.EVENTS_KEEPALIVE:
+            yield ": keepalive\n\n"
+            last_sent = time.monotonic()
+        await asyncio.sleep(Config.EVENTS_POLL_INTERVAL)
+
+@app.route('/admin/events', methods=['GET'])
+async def admin_events():
+    """Server-Sent Events: every change to users, profiles and applications."""
+    if not changes.streams.acquire():
+        return handlers.make_response(app, request, handlers.STREAMS_BUSY)
+    last_event_id = changes.parse_event_id(
+        request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    )
+    response = Response(
+        ClosingBody(event_stream(last_event_id), changes.streams.release),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+    response.timeout = None
+    return response
+
+@app.route('/admin/runtime-stats', methods=['GET'])
+async def get_runtime_stats():
+    return jsonify({**handlers.runtime_stats(), 'async_db_pool': pool.stats()}), 200
+
+
+def collect_async_pool_metrics():
+    lines = []
+    async_pool = pool.stats()
+    for key in ('open', 'idle', 'in_use'):
+        lines += metrics.gauge(f'internlink_async_db_connections_{key}', f'aiosqlite connections ({key}).', async_pool[key])
+    lines += metrics.gauge('internlink_async_db_pool_waits_total', 'Acquires that had to wait for a connection.', async_pool['waits'], 'counter')
+    lines += metrics.gauge('internlink_async_db_pool_timeouts_total', 'Acquires that gave up waiting.', async_pool['timeouts'], 'counter')
+    return lines
+
+
+metrics.register_collector(handlers.runtime_metrics)
+metrics.register_collector(collect_async_pool_metrics)
+
+
+@app.route('/metrics', methods=['GET'])
+async def get_metrics():
+    return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
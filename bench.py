@@ -0,0 +1,554 @@
+"""
+Load test and benchmark for every route in app.py.
+
+Seeds a throwaway SQLite database, then drives the app either in-process
+through the Flask test client or over HTTP against a local threaded server
+(--http). Two load patterns are run:
+
+  closed  each route on its own, with --concurrency clients that send the
+          next request as soon as the previous one returns
+  open    a weighted mix of all routes arriving at --rate requests/second
+          on a fixed schedule; latency is measured from the scheduled
+          start, so a stalled server cannot hide its queueing delay
+
+Results (throughput, p50/p95/p99) are printed and can be saved with
+--save-baseline and checked against a saved run with --compare, which
+exits 1 when a route's p95 or throughput regresses by more than
+--tolerance.
+
+    python bench.py --users 5000 --save-baseline bench_baseline.json
+    python bench.py --users 5000 --compare bench_baseline.json
+"""
+import argparse
+import contextlib
+import http.client
+import itertools
+import json
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+PASSWORD = 'benchmark-password'
+
+SKILLS = ['python', 'java', 'sql', 'react', 'excel', 'figma', 'django', 'flask', 'aws', 'docker',
+          'statistics', 'marketing', 'writing', 'networking', 'linux', 'kotlin', 'swift', 'c++']
+COMPANIES = ['Safaricom', 'KCB Group', 'Equity Bank', 'Andela', 'Microsoft', 'Google', 'Twiga', 'M-Kopa']
+LOCATIONS = ['Nairobi', 'Mombasa', 'Kisumu', 'Remote']
+DURATIONS = ['3 months', '6 months']
+
+
+def setup_environment(path):
+    # Config reads these at import time, so they must be set before the
+    # app modules are imported.
+    os.environ['DATABASE'] = path
+    os.environ.setdefault('RESET_CODE_STORE', 'sqlite')
+    # So an /admin/events request ends once it has sent its resume point
+    # instead of staying open for minutes.
+    os.environ.setdefault('EVENTS_STREAM_SECONDS', '0')
+
+
+def seed(conn, users, profiles, applications, internships, rng):
+    import dal
+    import hashing
+
+    password = hashing.hash_password(PASSWORD)
+    conn.executemany(
+        "INSERT INTO users (first_name, last_name, email, password, user_type) VALUES (?, ?, ?, ?, 'student')",
+        ((f'First{i}', f'Last{i}', f'user{i}@bench.test', password) for i in range(users))
+    )
+    conn.executemany(
+        """
+        INSERT INTO internships (title, position, company, location, duration, requirements, description)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+        """,
+        (
+            (f'{skill.title()} Intern {i}', f'{skill.title()} Intern', rng.choice(COMPANIES),
+             rng.choice(LOCATIONS), rng.choice(DURATIONS), ', '.join(rng.sample(SKILLS, 3)),
+             f'Work on {skill} projects with the {rng.choice(SKILLS)} team.')
+            for i, skill in ((i, rng.choice(SKILLS)) for i in range(internships))
+        )
+    )
+    conn.executemany(
+        """
+        INSERT INTO profiles (user_id, university, course, year, gpa, skills, interests)
+        VALUES (?, 'University of Nairobi', 'Computer Science', ?, ?, ?, ?)
+        """,
+        (
+            (user_id, rng.randint(1, 4), round(rng.uniform(2.0, 4.0), 2),
+             ', '.join(rng.sample(SKILLS, 4)), ', '.join(rng.sample(SKILLS, 2)))
+            for user_id in range(1, min(profiles, users) + 1)
+        )
+    )
+    dal.sync_skill_tags(conn, conn.execute("SELECT user_id, skills FROM profiles").fetchall())
+    listing_ids = [row[0] for row in conn.execute("SELECT id FROM internships")]
+    conn.executemany(
+        "INSERT OR IGNORE INTO applications (user_id, internship_id, position, company) VALUES (?, ?, ?, ?)",
+        (
+            (rng.randint(1, users), listing_id, f'Position {listing_id}', 'Bench Co')
+            for listing_id in (rng.choice(listing_ids) for _ in range(applications))
+        )
+    )
+    conn.commit()
+    return len(listing_ids)
+
+
+class TestClientDriver:
+    """Calls the app in-process; one Flask test client per thread."""
+
+    def __init__(self, app):
+        self.app = app
+        self._local = threading.local()
+
+    def request(self, method, path, body=None):
+        client = getattr(self._local, 'client', None)
+        if client is None:
+            client = self._local.client = self.app.test_client()
+        response = client.open(path, method=method, json=body)
+        data = response.get_data()
+        return response.status_code, data
+
+
+class HTTPDriver:
+    """Calls a server over keep-alive HTTP connections, one per thread."""
+
+    def __init__(self, host, port):
+        self.host = host
+        self.port = port
+        self._local = threading.local()
+
+    def request(self, method, path, body=None):
+        for attempt in range(2):
+            conn = getattr(self._local, 'conn', None)
+            if conn is None:
+                conn = self._local.conn = http.client.HTTPConnection(self.host, self.port, timeout=30)
+            try:
+                payload = json.dumps(body) if body is not None else None
+                headers = {'Content-Type': 'application/json'} if body is not None else {}
+                conn.request(method, path, payload, headers)
+                response = conn.getresponse()
+                return response.status, response.read()
+            except (http.client.HTTPException, OSError):
+                conn.close()
+                self._local.conn = None
+                if attempt:
+                    raise
+
+
+def start_server(app):
+    from werkzeug.serving import make_server
+
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+class Workload:
+    """
+    The request each scenario sends. `prepare` does any untimed setup (such
+    as requesting a reset code before verifying it) and returns
+    (method, path, body, expected statuses).
+    """
+
+    def __init__(self, driver, users, listings, rng_seed):
+        self.driver = driver
+        self.users = users
+        self.listings = listings
+        self.seed = rng_seed
+        self._serial = itertools.count()
+        self._local = threading.local()
+        # The reset flow changes passwords, so it gets its own users and
+        # always sets the password back to PASSWORD.
+        self.reset_users = max(1, users // 10)
+
+    @property
+    def rng(self):
+        rng = getattr(self._local, 'rng', None)
+        if rng is None:
+            rng = self._local.rng = random.Random(f'{self.seed}-{threading.get_ident()}')
+        return rng
+
+    def user(self):
+        return self.rng.randint(self.reset_users + 1, self.users)
+
+    def reset_user(self):
+        return self.rng.randint(1, self.reset_users)
+
+    def listing(self):
+        return self.rng.randint(1, self.listings)
+
+    def reset_code(self, user):
+        status, data = self.driver.request('POST', '/api/forgot-password', {'email': f'user{user - 1}@bench.test'})
+        return json.loads(data).get('reset_code')
+
+    def index(self):
+        return 'GET', '/', None, {200}
+
+    def signup(self):
+        n = next(self._serial)
+        body = {'first_name': 'New', 'last_name': 'User', 'email': f'new{n}-{os.getpid()}@bench.test', 'password': PASSWORD}
+        return 'POST', '/api/signup', body, {201}
+
+    def login(self):
+        return 'POST', '/api/login', {'email': f'user{self.user() - 1}@bench.test', 'password': PASSWORD}, {200}
+
+    def forgot_password(self):
+        return 'POST', '/api/forgot-password', {'email': f'user{self.reset_user() - 1}@bench.test'}, {200}
+
+    def verify_reset_code(self):
+        user = self.reset_user()
+        body = {'email': f'user{user - 1}@bench.test', 'code': self.reset_code(user)}
+        return 'POST', '/api/verify-reset-code', body, {200, 400}
+
+    def reset_password(self):
+        user = self.reset_user()
+        body = {'email': f'user{user - 1}@bench.test', 'code': self.reset_code(user), 'new_password': PASSWORD}
+        return 'POST', '/api/reset-password', body, {200, 400}
+
+    def get_profile(self):
+        return 'GET', f'/api/profile/{self.user()}', None, {200, 404}
+
+    def save_profile(self):
+        rng = self.rng
+        body = {
+            'user_id': self.user(), 'university': 'Strathmore University', 'course': 'Informatics',
+            'year': rng.randint(1, 4), 'gpa': round(rng.uniform(2.0, 4.0), 2),
+            'skills': ', '.join(rng.sample(SKILLS, 4)), 'interests': ', '.join(rng.sample(SKILLS, 2)),
+        }
+        return 'POST', '/api/profile', body, {200}
+
+    def get_applications(self):
+        return 'GET', f'/api/applications/{self.user()}', None, {200}
+
+    def search_internships(self):
+        return 'GET', f'/api/internships?q={self.rng.choice(SKILLS)}&location={self.rng.choice(LOCATIONS)}', None, {200}
+
+    def get_internship(self):
+        return 'GET', f'/api/internships/{self.listing()}', None, {200}
+
+    def recommendations(self):
+        return 'GET', f'/api/recommendations/{self.user()}', None, {200, 404}
+
+    def apply(self):
+        return 'POST', '/api/apply', {'user_id': self.user(), 'internship_id': self.listing()}, {201, 400}
+
+    def apply_batch(self):
+        items = [{'internship_id': self.listing()} for _ in range(10)]
+        return 'POST', '/api/apply/batch', {'user_id': self.user(), 'applications': items}, {200}
+
+    def admin_page(self):
+        return 'GET', '/admin', None, {200}
+
+    def admin_stats(self):
+        return 'GET', '/admin/stats', None, {200}
+
+    def admin_users(self):
+        return 'GET', '/admin/users?limit=100', None, {200}
+
+    def admin_profiles(self):
+        return 'GET', '/admin/profiles?limit=100', None, {200}
+
+    def admin_profiles_by_tags(self):
+        first, second, third = self.rng.sample(SKILLS, 3)
+        return 'GET', f'/admin/profiles/tags?q={first}+AND+NOT+{second}+OR+{third}&limit=100', None, {200}
+
+    def admin_applications(self):
+        return 'GET', '/admin/applications?limit=100', None, {200}
+
+    def admin_users_search(self):
+        # Seeded names are First<n> Last<n>, so a digit prefix narrows the match.
+        return 'GET', f'/admin/users/search?q=first{self.rng.randint(1, 9)}&sort=last_name&limit=100', None, {200}
+
+    def admin_profiles_search(self):
+        return 'GET', f'/admin/profiles/search?year={self.rng.randint(1, 4)}&sort=-gpa&limit=100', None, {200}
+
+    def admin_status_update(self):
+        # Every application for one listing, as a reviewer would move them.
+        body = {'status': self.rng.choice(['Approved', 'Rejected', 'Pending']), 'filter': {'internship_id': self.listing()}}
+        return 'POST', '/admin/applications/status', body, {200}
+
+    def admin_users_csv(self):
+        return 'GET', '/admin/users?format=csv', None, {200}
+
+    def admin_applications_ndjson(self):
+        return 'GET', '/admin/applications?format=ndjson', None, {200}
+
+    def admin_events(self):
+        # Resuming from an old id checks the log for pruned entries too.
+        return 'GET', '/admin/events?last_event_id=1', None, {200, 503}
+
+    def candidates(self):
+        return 'GET', f'/admin/internships/{self.listing()}/candidates', None, {200}
+
+    def runtime_stats(self):
+        return 'GET', '/admin/runtime-stats', None, {200}
+
+    def metrics(self):
+        return 'GET', '/metrics', None, {200}
+
+
+# Scenario name -> (share of --requests in the closed loop, weight in the
+# open-loop mix). Routes that hash a password are slow by design and get
+# a smaller share; full dumps are rare in real traffic.
+SCENARIOS = {
+    'index': (1.0, 2),
+    'signup': (0.2, 2),
+    'login': (0.2, 10),
+    'forgot_password': (1.0, 1),
+    'verify_reset_code': (1.0, 1),
+    'reset_password': (0.2, 1),
+    'get_profile': (1.0, 20),
+    'save_profile': (1.0, 5),
+    'get_applications': (1.0, 20),
+    'search_internships': (1.0, 15),
+    'get_internship': (1.0, 10),
+    'recommendations': (1.0, 5),
+    'apply': (1.0, 5),
+    'apply_batch': (1.0, 1),
+    'admin_page': (1.0, 1),
+    'admin_stats': (1.0, 2),
+    'admin_users': (1.0, 1),
+    'admin_profiles': (1.0, 1),
+    'admin_profiles_by_tags': (1.0, 1),
+    'admin_applications': (1.0, 1),
+    'admin_users_search': (1.0, 1),
+    'admin_profiles_search': (1.0, 1),
+    'admin_status_update': (1.0, 1),
+    'admin_users_csv': (0.1, 0),
+    'admin_applications_ndjson': (0.1, 0),
+    'admin_events': (1.0, 1),
+    'candidates': (1.0, 1),
+    'runtime_stats': (1.0, 1),
+    'metrics': (1.0, 1),
+}
+
+
+class Recorder:
+
+    def __init__(self):
+        self.latencies = {}
+        self.errors = {}
+        self._lock = threading.Lock()
+
+    def record(self, name, seconds, ok):
+        with self._lock:
+            self.latencies.setdefault(name, []).append(seconds)
+            if not ok:
+                self.errors[name] = self.errors.get(name, 0) + 1
+
+
+def percentile(ordered, q):
+    if not ordered:
+        return 0.0
+    return ordered[min(len(ordered) - 1, max(0, int(round(q * len(ordered) + 0.5)) - 1))]
+
+
+def summarize(latencies, errors, elapsed):
+    ordered = sorted(latencies)
+    return {
+        'requests': len(ordered),
+        'errors': errors,
+        'throughput': round(len(ordered) / elapsed, 2) if elapsed else 0.0,
+        'p50_ms': round(percentile(ordered, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(ordered, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(ordered, 0.99) * 1000, 3),
+        'max_ms': round(ordered[-1] * 1000, 3) if ordered else 0.0,
+    }
+
+
+def send(workload, name, recorder, scheduled=None):
+    method, path, body, expected = getattr(workload, name)()
+    started = time.perf_counter() if scheduled is None else scheduled
+    try:
+        status, _ = workload.driver.request(method, path, body)
+        ok = status in expected
+    except Exception as e:
+        print(f"{name} request error: {e}", file=sys.stderr)
+        ok = False
+    recorder.record(name, time.perf_counter() - started, ok)
+
+
+def closed_loop(workload, name, requests, concurrency):
+    recorder = Recorder()
+    remaining = itertools.count()
+
+    def client():
+        while next(remaining) < requests:
+            send(workload, name, recorder)
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    return summarize(recorder.latencies.get(name, []), recorder.errors.get(name, 0), elapsed)
+
+
+def open_loop(workload, rate, duration, max_in_flight, rng):
+    names = [name for name, (_, weight) in SCENARIOS.items() if weight]
+    weights = [SCENARIOS[name][1] for name in names]
+    recorder = Recorder()
+
+    # Poisson arrivals on a precomputed schedule.
+    schedule = []
+    at = 0.0
+    while at < duration:
+        at += rng.expovariate(rate)
+        schedule.append((at, rng.choices(names, weights)[0]))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=max_in_flight) as pool:
+        for offset, name in schedule:
+            due = started + offset
+            delay = due - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(send, workload, name, recorder, due)
+    elapsed = time.perf_counter() - started
+
+    results = {
+        name: summarize(latencies, recorder.errors.get(name, 0), elapsed)
+        for name, latencies in sorted(recorder.latencies.items())
+    }
+    results['_all'] = summarize(
+        [l for latencies in recorder.latencies.values() for l in latencies],
+        sum(recorder.errors.values()), elapsed
+    )
+    return results
+
+
+def compare(current, baseline, tolerance, min_delta_ms):
+    """Return a list of human-readable regressions of `current` vs `baseline`."""
+    regressions = []
+    for pattern in ('closed', 'open'):
+        for name, now in current.get(pattern, {}).items():
+            before = baseline.get(pattern, {}).get(name)
+            if not before:
+                continue
+            if (now['p95_ms'] > before['p95_ms'] * (1 + tolerance)
+                    and now['p95_ms'] - before['p95_ms'] > min_delta_ms):
+                regressions.append(f"{pattern}/{name}: p95 {before['p95_ms']}ms -> {now['p95_ms']}ms")
+            if pattern == 'closed' and now['throughput'] < before['throughput'] * (1 - tolerance):
+                regressions.append(f"{pattern}/{name}: throughput {before['throughput']}/s -> {now['throughput']}/s")
+            if now['errors'] > before['errors']:
+                regressions.append(f"{pattern}/{name}: errors {before['errors']} -> {now['errors']}")
+    return regressions
+
+
+def print_table(title, results):
+    print(f"\n{title}")
+    print(f"  {'route':<28}{'reqs':>7}{'errs':>6}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}")
+    for name, r in results.items():
+        print(f"  {name:<28}{r['requests']:>7}{r['errors']:>6}{r['throughput']:>10}"
+              f"{r['p50_ms']:>10}{r['p95_ms']:>10}{r['p99_ms']:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark every InternLink route.')
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--profiles', type=int, default=None, help='defaults to --users')
+    parser.add_argument('--applications', type=int, default=10000)
+    parser.add_argument('--internships', type=int, default=500)
+    parser.add_argument('--requests', type=int, default=200, help='closed-loop requests per route')
+    parser.add_argument('--concurrency', type=int, default=4)
+    parser.add_argument('--rate', type=float, default=100.0, help='open-loop arrivals per second')
+    parser.add_argument('--duration', type=float, default=10.0, help='open-loop seconds')
+    parser.add_argument('--max-in-flight', type=int, default=64)
+    parser.add_argument('--only', help='comma-separated scenario names')
+    parser.add_argument('--skip-open', action='store_true')
+    parser.add_argument('--http', action='store_true', help='go through a local HTTP server')
+    parser.add_argument('--seed', type=int, default=1)
+    parser.add_argument('--save-baseline', metavar='PATH')
+    parser.add_argument('--compare', metavar='PATH')
+    parser.add_argument('--tolerance', type=float, default=0.2)
+    parser.add_argument('--min-delta-ms', type=float, default=1.0)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix='internlink-bench-')
+    setup_environment(os.path.join(workdir, 'bench.db'))
+    log_path = os.path.join(workdir, 'app.log')
+    rng = random.Random(args.seed)
+
+    # The app prints a line per reset code and per error; keep that out of
+    # the report.
+    with open(log_path, 'w') as log, contextlib.redirect_stdout(log):
+        import Config
+        import db
+        import migrations
+        with db.get_pool().connection() as conn:
+            migrations.migrate(conn, verbose=False)
+            started = time.perf_counter()
+            listings = seed(conn, args.users, args.profiles or args.users, args.applications, args.internships, rng)
+            seed_seconds = time.perf_counter() - started
+        import app as application
+        Config.THROTTLE_LIMITS = {}
+
+        if args.http:
+            server = start_server(application.app)
+            driver = HTTPDriver('127.0.0.1', server.server_port)
+        else:
+            driver = TestClientDriver(application.app)
+        workload = Workload(driver, args.users, listings, args.seed)
+
+        names = args.only.split(',') if args.only else list(SCENARIOS)
+        unknown = set(names) - set(SCENARIOS)
+        if unknown:
+            parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+        # One untimed pass so lazy state (hash pool, recommender, caches)
+        # is warm before anything is measured.
+        for name in names:
+            send(workload, name, Recorder())
+
+        results = {'closed': {}, 'open': {}}
+        for name in names:
+            requests = max(1, int(args.requests * SCENARIOS[name][0]))
+            results['closed'][name] = closed_loop(workload, name, requests, args.concurrency)
+        if not args.skip_open:
+            results['open'] = open_loop(workload, args.rate, args.duration, args.max_in_flight, rng)
+
+    results['meta'] = {
+        'driver': 'http' if args.http else 'test_client',
+        'users': args.users,
+        'applications': args.applications,
+        'internships': args.internships,
+        'requests': args.requests,
+        'concurrency': args.concurrency,
+        'rate': args.rate,
+        'duration': args.duration,
+        'seed_seconds': round(seed_seconds, 3),
+        'python': sys.version.split()[0],
+        'cpus': os.cpu_count(),
+    }
+
+    print(f"Seeded {args.users} users and {args.applications} applications in {seed_seconds:.2f}s ({workdir})")
+    print_table(f"Closed loop, {args.concurrency} clients per route", results['closed'])
+    if results['open']:
+        print_table(f"Open loop, {args.rate:g} req/s for {args.duration:g}s", results['open'])
+    print(f"\nApp output: {log_path}")
+
+    if args.save_baseline:
+        with open(args.save_baseline, 'w') as f:
+            json.dump(results, f, indent=2, sort_keys=True)
+        print(f"✓ Baseline saved to {args.save_baseline}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.tolerance, args.min_delta_ms)
+        if regressions:
+            print(f"❌ {len(regressions)} regression(s) against {args.compare}:")
+            for regression in regressions:
+                print(f"  {regression}")
+            sys.exit(1)
+        print(f"✓ No regressions against {args.compare}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,81 @@
+"""
+Build fingerprinted, precompressed copies of the files in static/.
+
+    python build_assets.py
+
+Each file is written to Config.ASSET_DIR as name.<hash>.ext, plus .gz
+and, when the optional brotli package is installed, .br. manifest.json
+maps the original names to the hashed ones for assets.asset_url(). Files
+from earlier builds that are no longer in the manifest are removed.
+"""
+import gzip
+import hashlib
+import json
+import os
+
+import Config
+import assets
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+
+STATIC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'static')
+
+EXTENSIONS = ('.css', '.js', '.svg', '.json', '.txt', '.html')
+
+
+def fingerprint(name, data):
+    stem, ext = os.path.splitext(name)
+    return f"{stem}.{hashlib.sha256(data).hexdigest()[:12]}{ext}"
+
+
+def write(path, data):
+    with open(path, 'wb') as f:
+        f.write(data)
+
+
+def build(static_dir=STATIC_DIR, out_dir=None):
+    out_dir = out_dir or Config.ASSET_DIR
+    os.makedirs(out_dir, exist_ok=True)
+    manifest = {}
+
+    for name in sorted(os.listdir(static_dir)):
+        path = os.path.join(static_dir, name)
+        if not os.path.isfile(path) or not name.endswith(EXTENSIONS):
+            continue
+        with open(path, 'rb') as f:
+            data = f.read()
+
+        hashed = fingerprint(name, data)
+        manifest[name] = hashed
+        write(os.path.join(out_dir, hashed), data)
+        # mtime=0 so the same input always gives the same .gz bytes.
+        gzipped = gzip.compress(data, 9, mtime=0)
+        write(os.path.join(out_dir, hashed + '.gz'), gzipped)
+        sizes = f"{len(data)} -> {len(gzipped)} gzip"
+        if brotli:
+            compressed = brotli.compress(data, quality=11)
+            write(os.path.join(out_dir, hashed + '.br'), compressed)
+            sizes += f", {len(compressed)} br"
+        print(f"✓ {name} -> {hashed} ({sizes} bytes)")
+
+    keep = {assets.MANIFEST}
+    for hashed in manifest.values():
+        keep.update((hashed, hashed + '.gz', hashed + '.br'))
+    for name in os.listdir(out_dir):
+        if name not in keep:
+            os.remove(os.path.join(out_dir, name))
+
+    with open(os.path.join(out_dir, assets.MANIFEST), 'w') as f:
+        json.dump(manifest, f, indent=2, sort_keys=True)
+    return manifest
+
+
+if __name__ == '__main__':
+    manifest = build()
+    if not brotli:
+        print("  (brotli is not installed; only .gz copies were written)")
+    print(f"✓ Wrote {len(manifest)} assets to {Config.ASSET_DIR}")
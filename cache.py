@@ -0,0 +1,107 @@
+"""
+Per-process LRU + TTL cache for the student dashboard reads.
+
+Entries hold the finished JSON body together with its ETag, so a hit
+(including a conditional request answered with 304) never touches the
+database. The write routes invalidate their user's entry, but only in the
+process that handled the write; other gunicorn workers see the change once
+their copy expires after Config.READ_CACHE_TTL seconds.
+
+A miss is loaded outside the lock, so a write can invalidate the key
+while the old row is being read. Callers take generation() before
+loading and pass it to put(), which drops the body if the key was
+invalidated in between.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+import Config
+
+
+class CacheEntry:
+
+    def __init__(self, body, status, expires_at):
+        self.body = body
+        self.status = status
+        self.expires_at = expires_at
+        self.etag = hashlib.sha1(body).hexdigest() if status == 200 else None
+        self.last_modified = datetime.now(timezone.utc).replace(microsecond=0)
+
+
+class ReadCache:
+
+    def __init__(self, max_entries=10000, ttl=30.0):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        # Sequence number of each key's latest invalidation. When the map
+        # outgrows max_entries it is cleared and _forgotten remembers the
+        # point up to which any key may have been invalidated.
+        self._seq = 0
+        self._invalidated = {}
+        self._forgotten = 0
+        self._counts = {'hits': 0, 'misses': 0, 'invalidations': 0, 'evictions': 0, 'not_modified': 0, 'stale_puts': 0}
+
+    def get(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at > now:
+                self._entries.move_to_end(key)
+                self._counts['hits'] += 1
+                return entry
+            if entry is not None:
+                del self._entries[key]
+            self._counts['misses'] += 1
+            return None
+
+    def generation(self):
+        """Token for put(), taken before loading the value to cache."""
+        with self._lock:
+            return self._seq
+
+    def put(self, key, body, status=200, generation=None):
+        """
+        Cache `body` and return its entry. With a `generation` token, a key
+        invalidated since the token was taken is left uncached.
+        """
+        entry = CacheEntry(body, status, time.monotonic() + self.ttl)
+        with self._lock:
+            if generation is not None and self._invalidated.get(key, self._forgotten) > generation:
+                self._counts['stale_puts'] += 1
+                return entry
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counts['evictions'] += 1
+        return entry
+
+    def invalidate(self, key):
+        with self._lock:
+            self._seq += 1
+            self._invalidated[key] = self._seq
+            if len(self._invalidated) > self.max_entries:
+                self._invalidated.clear()
+                self._forgotten = self._seq
+            if self._entries.pop(key, None) is not None:
+                self._counts['invalidations'] += 1
+
+    def record_not_modified(self):
+        with self._lock:
+            self._counts['not_modified'] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._counts)
+            stats['size'] = len(self._entries)
+        lookups = stats['hits'] + stats['misses']
+        stats['hit_rate'] = round(stats['hits'] / lookups, 4) if lookups else 0.0
+        return stats
+
+
+read_cache = ReadCache(Config.READ_CACHE_SIZE, Config.READ_CACHE_TTL)
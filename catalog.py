@@ -0,0 +1,110 @@
+"""
+Internship catalog search.
+
+Free text goes through the internships_fts index and is ranked with bm25
+(title matches weigh most); company, location and duration are exact
+filters served by their own indexes. Facet counts are computed over the
+same match set so the UI can show how many listings each filter leaves.
+"""
+import re
+
+
+FILTERS = ('company', 'location', 'duration')
+FACETS = ('company', 'location', 'duration')
+FACET_LIMIT = 20
+DEFAULT_PER_PAGE = 20
+MAX_PER_PAGE = 100
+
+# bm25 weights for title, company, description, location
+RANK = "bm25(internships_fts, 10.0, 5.0, 1.0, 2.0)"
+
+COLUMNS = "i.id, i.title, i.position, i.company, i.location, i.duration, i.requirements, i.description"
+
+
+def match_expression(text):
+    """
+    Turn free text into an FTS5 query: every word must match, as a prefix,
+    and FTS5 operators typed by the user are treated as plain words.
+    """
+    words = re.findall(r'\w+', text or '')
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def _filter_conditions(filters, prefix):
+    conditions, params = [], []
+    for name in FILTERS:
+        if filters.get(name):
+            conditions.append(f"{prefix}{name} = ?")
+            params.append(filters[name])
+    return conditions, params
+
+
+def search(conn, q=None, filters=None, page=1, per_page=DEFAULT_PER_PAGE):
+    filters = filters or {}
+    page = max(1, page)
+    per_page = max(1, min(per_page, MAX_PER_PAGE))
+    match = match_expression(q)
+
+    conditions, params = _filter_conditions(filters, 'i.')
+    where = ''.join(f" AND {condition}" for condition in conditions)
+    if match:
+        sql = f"""
+            SELECT {COLUMNS}, {RANK} AS rank
+            FROM internships_fts JOIN internships i ON i.id = internships_fts.rowid
+            WHERE internships_fts MATCH ?{where}
+            ORDER BY rank, i.id
+            LIMIT ? OFFSET ?
+        """
+        params = [match] + params
+    else:
+        sql = f"""
+            SELECT {COLUMNS} FROM internships i
+            WHERE 1 = 1{where}
+            ORDER BY i.id DESC
+            LIMIT ? OFFSET ?
+        """
+    rows = conn.execute(sql, params + [per_page, (page - 1) * per_page]).fetchall()
+
+    # The total and every facet come from one statement so the full-text
+    # match runs once. Each facet ignores its own filter so every option
+    # stays selectable.
+    base_params = []
+    if match:
+        base = "SELECT company, location, duration FROM internships WHERE id IN (SELECT rowid FROM internships_fts WHERE internships_fts MATCH ?)"
+        base_params.append(match)
+    else:
+        base = "SELECT company, location, duration FROM internships"
+
+    parts, params = [], []
+    conditions, condition_params = _filter_conditions(filters, '')
+    where = ' WHERE ' + ' AND '.join(conditions) if conditions else ''
+    parts.append(f"SELECT 'total', NULL, COUNT(*) FROM m{where}")
+    params.extend(condition_params)
+    for facet in FACETS:
+        others = {name: value for name, value in filters.items() if name != facet}
+        conditions, condition_params = _filter_conditions(others, '')
+        where = ' WHERE ' + ' AND '.join(conditions) if conditions else ''
+        parts.append(f"""
+            SELECT * FROM (
+                SELECT '{facet}', {facet}, COUNT(*) FROM m{where}
+                GROUP BY {facet} ORDER BY COUNT(*) DESC, {facet} LIMIT {FACET_LIMIT}
+            )
+        """)
+        params.extend(condition_params)
+
+    total = 0
+    facets = {facet: [] for facet in FACETS}
+    sql = f"WITH m AS MATERIALIZED ({base}) " + " UNION ALL ".join(parts)
+    for name, value, count in conn.execute(sql, base_params + params):
+        if name == 'total':
+            total = count
+        elif value is not None:
+            facets[name].append({'value': value, 'count': count})
+
+    return {
+        'items': [dict(row) for row in rows],
+        'total': total,
+        'page': page,
+        'per_page': per_page,
+        'facets': facets,
+    }
@@ -0,0 +1,209 @@
+"""
+Server-Sent Events feed of changes to users, profiles and applications.
+
+Triggers added in migration 7 append one change_log row per insert,
+update or delete, so every write path (signup, save-profile, apply,
+batch apply, the async app) is covered without route code. feed() tails
+the log and sends each change as an event whose id is its sequence
+number and whose data carries the row in the same shape as the
+/admin/<listing> pages:
+
+    id: 42
+    event: applications
+    data: {"op":"insert","row":{...}}
+
+After a reconnect the browser sends Last-Event-ID and the feed resumes
+right after it. If those entries have been pruned, or the id is from
+another database, a `reset` event tells the page to reload its tables.
+
+A Pruner thread in each process trims the log whether or not anyone is
+watching, and `streams` caps how many feeds a process serves at once.
+"""
+import json
+import threading
+import time
+
+import Config
+import dal
+import db
+
+
+EVENT_BATCH = 500
+
+# A new stream without Last-Event-ID starts from the newest entry.
+LATEST_SQL = "SELECT seq FROM sqlite_sequence WHERE name = 'change_log'"
+
+OLDEST_SQL = "SELECT MIN(seq) FROM change_log"
+
+PRUNE_SQL = "DELETE FROM change_log WHERE seq <= ?"
+
+
+def parse_event_id(value):
+    try:
+        return max(int(value), 0) if value else None
+    except ValueError:
+        return None
+
+
+def resume_point(conn, last_event_id):
+    """
+    Return (sequence number to read after, whether the client must reload)
+    for a stream opened with `last_event_id` (None on a first connect).
+    """
+    row = conn.execute(LATEST_SQL).fetchone()
+    latest = row[0] if row else 0
+    if last_event_id is None:
+        return latest, False
+    oldest = conn.execute(OLDEST_SQL).fetchone()[0]
+    if last_event_id > latest or (oldest is not None and last_event_id < oldest - 1):
+        return latest, True
+    return last_event_id, False
+
+
+def read_events(conn, after, limit=EVENT_BATCH):
+    """
+    Up to `limit` events after sequence number `after`, formatted for the
+    stream; returns (text, last sequence number sent).
+    """
+    changes = conn.execute(dal.CHANGES_SQL, (after, limit)).fetchall()
+    if not changes:
+        return '', after
+
+    ids = {}
+    for change in changes:
+        ids.setdefault(change['entity'], set()).add(change['row_id'])
+    rows = {}
+    for entity, row_ids in ids.items():
+        for row in conn.execute(dal.CHANGED_ROWS_SQL[entity], (json.dumps(sorted(row_ids)),)):
+            rows[entity, row['id']] = row['json']
+
+    # Rows are read as they are now, so a burst of changes to one row all
+    # carry its latest state. A delete carries only the id, and a row
+    # deleted since its insert or update is sent as null.
+    events = []
+    for change in changes:
+        row = rows.get((change['entity'], change['row_id']), 'null')
+        if change['op'] == 'delete':
+            row = json.dumps({'id': change['row_id']})
+        events.append(
+            f"id: {change['seq']}\nevent: {change['entity']}\n"
+            f"data: {{\"op\":\"{change['op']}\",\"row\":{row}}}\n\n"
+        )
+    return ''.join(events), changes[-1]['seq']
+
+
+def prune(conn, keep=None):
+    """Delete all but the newest `keep` change_log entries; returns the count."""
+    keep = Config.CHANGE_LOG_RETAIN if keep is None else keep
+    row = conn.execute(LATEST_SQL).fetchone()
+    if not row:
+        return 0
+    deleted = conn.execute(PRUNE_SQL, (row[0] - keep,)).rowcount
+    conn.commit()
+    return deleted
+
+
+class Pruner:
+    """Daemon thread that runs prune() every `interval` seconds."""
+
+    def __init__(self, interval):
+        self.interval = interval
+        self.pruned = 0
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def ensure_started(self):
+        # Started on first use rather than at import so it runs in each
+        # forked worker, not only in the parent.
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, daemon=True)
+                    self._thread.start()
+
+    def run_once(self):
+        with db.get_pool().connection() as conn:
+            deleted = prune(conn)
+        self.pruned += deleted
+        return deleted
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Change log prune error: {e}")
+
+
+pruner = Pruner(Config.CHANGE_LOG_PRUNE_INTERVAL)
+
+
+class StreamSlots:
+    """Counts the feeds open in this process against a limit."""
+
+    def __init__(self, limit):
+        self.limit = limit
+        self.open = 0
+        self.refused = 0
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """Take a slot for a new stream; False if all are in use."""
+        with self._lock:
+            if self.open >= self.limit:
+                self.refused += 1
+                return False
+            self.open += 1
+            return True
+
+    def release(self):
+        with self._lock:
+            self.open -= 1
+
+streams = StreamSlots(Config.EVENTS_MAX_STREAMS)
+
+
+def stats():
+    return {
+        'streams': streams.open,
+        'max_streams': streams.limit,
+        'refused': streams.refused,
+        'pruned': pruner.pruned,
+    }
+
+
+def reset_event(seq):
+    return f"id: {seq}\nevent: reset\ndata: {{}}\n\n"
+
+
+def feed(last_event_id):
+    """
+    Generator for the /admin/events response, which must hold one of
+    `streams`' slots. A pooled connection is held only while polling,
+    never across the sleep between polls.
+    """
+    started = last_sent = time.monotonic()
+    with db.get_pool().connection() as conn:
+        after, reload = resume_point(conn, last_event_id)
+    # An id-only message sets the browser's Last-Event-ID without firing
+    # an event, so a quiet stream still resumes from the right place.
+    yield f"retry: {Config.EVENTS_RETRY_MS}\n\n"
+    yield reset_event(after) if reload else f"id: {after}\n\n"
+
+    while time.monotonic() - started < Config.EVENTS_STREAM_SECONDS:
+        with db.get_pool().connection() as conn:
+            text, after = read_events(conn, after)
+        if text:
+            yield text
+            last_sent = time.monotonic()
+            continue
+        if time.monotonic() - last_sent >= Config.EVENTS_KEEPALIVE:
+            yield ": keepalive\n\n"
+            last_sent = time.monotonic()
+        time.sleep(Config.EVENTS_POLL_INTERVAL)
+
+
+def init_app(app):
+    if Config.CHANGE_LOG_PRUNE_INTERVAL > 0:
+        app.before_request(pruner.ensure_started)
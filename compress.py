@@ -0,0 +1,98 @@
+"""
+On-the-fly gzip for API responses.
+
+JSON, NDJSON, CSV and plain-text responses are gzipped when the client
+accepts it and the body is at least Config.COMPRESS_MIN_SIZE bytes; smaller
+bodies are not worth the CPU. Streamed responses (the admin exports) are
+compressed chunk by chunk with a sync flush after each one, so rows still
+reach the client as they are produced. A strong ETag is downgraded to a
+weak one because the bytes on the wire no longer match it; If-None-Match
+uses the weak comparison, so 304s keep working.
+"""
+import gzip
+import zlib
+
+from flask import request
+
+import Config
+
+
+COMPRESSIBLE = frozenset(('application/json', 'application/x-ndjson', 'text/csv', 'text/plain'))
+
+
+class GzipStream:
+    """One gzip member written chunk by chunk, each chunk flushed as it comes."""
+
+    def __init__(self, level):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, chunk):
+        if isinstance(chunk, str):
+            chunk = chunk.encode()
+        return self._compressor.compress(chunk) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self):
+        return self._compressor.flush()
+
+
+def gzip_stream(chunks, level):
+    stream = GzipStream(level)
+    try:
+        for chunk in chunks:
+            data = stream.compress(chunk)
+            if data:
+                yield data
+        yield stream.finish()
+    finally:
+        # Lets stream_with_context release the request's connection.
+        close = getattr(chunks, 'close', None)
+        if close:
+            close()
+
+
+async def gzip_stream_async(chunks, level):
+    """gzip_stream() for an async iterable, as async_app.py streams."""
+    stream = GzipStream(level)
+    async for chunk in chunks:
+        data = stream.compress(chunk)
+        if data:
+            yield data
+    yield stream.finish()
+
+
+def compressible(response):
+    return (response.mimetype in COMPRESSIBLE
+            and response.status_code >= 200 and response.status_code not in (204, 304)
+            and 'Content-Encoding' not in response.headers)
+
+
+def weaken_etag(response):
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+
+
+def compress_response(response):
+    if not compressible(response):
+        return response
+
+    response.vary.add('Accept-Encoding')
+    if not request.accept_encodings['gzip']:
+        return response
+
+    if response.is_streamed:
+        response.response = gzip_stream(response.response, Config.COMPRESS_LEVEL)
+        response.headers.pop('Content-Length', None)
+    else:
+        body = response.get_data()
+        if len(body) < Config.COMPRESS_MIN_SIZE:
+            return response
+        response.set_data(gzip.compress(body, Config.COMPRESS_LEVEL, mtime=0))
+
+    response.content_encoding = 'gzip'
+    weaken_etag(response)
+    return response
+
+
+def init_app(app):
+    app.after_request(compress_response)
@@ -0,0 +1,648 @@
+"""
+Data access for the routes in app.py.
+
+Every statement lives here as a module-level constant with an explicit
+column list. Because the SQL text never changes, sqlite3's per-connection
+statement cache (Config.SQLITE_STATEMENT_CACHE) prepares each statement
+once per connection and reuses it afterwards.
+
+Reads whose rows go straight back to the client select a json_object()
+per row, and the *_json() functions join those into the response body. No
+Python dict is built per row. Keys come out sorted, as jsonify() emits
+them.
+"""
+import json
+import re
+import sqlite3
+
+
+USER_COLUMNS = ('id', 'first_name', 'last_name', 'email', 'user_type')
+
+PROFILE_COLUMNS = (
+    'id', 'user_id', 'phone', 'university', 'course', 'year', 'gpa',
+    'skills', 'interests', 'created_at', 'updated_at',
+)
+
+APPLICATION_COLUMNS = (
+    'id', 'user_id', 'position', 'company', 'status', 'date_applied', 'internship_id',
+    'updated_at',
+)
+
+INTERNSHIP_COLUMNS = (
+    'id', 'title', 'position', 'company', 'location', 'duration',
+    'requirements', 'description', 'created_at',
+)
+
+
+def columns(names, prefix=''):
+    return ', '.join(f"{prefix}{name}" for name in names)
+
+
+def json_object(fields, prefix=''):
+    """
+    SQL for a json_object() with sorted keys. `fields` holds column names
+    (read from `prefix`) or (key, expression) pairs.
+    """
+    pairs = [field if isinstance(field, tuple) else (field, f"{prefix}{field}") for field in fields]
+    return 'json_object(' + ', '.join(f"'{key}', {expr}" for key, expr in sorted(pairs)) + ')'
+
+
+def json_array(rows):
+    """Join rows whose first column is JSON text into one JSON array."""
+    return ('[' + ','.join(row[0] for row in rows) + ']').encode()
+
+
+def json_one(conn, sql, params):
+    row = conn.execute(sql, params).fetchone()
+    return row[0].encode() if row else None
+
+
+# Users
+
+EMAIL_EXISTS_SQL = "SELECT 1 FROM users WHERE email = ?"
+
+INSERT_USER_SQL = """
+    INSERT INTO users (first_name, last_name, email, password, user_type)
+    VALUES (?, ?, ?, ?, ?)
+"""
+
+LOGIN_SQL = f"SELECT {columns(USER_COLUMNS)}, password FROM users WHERE email = ?"
+
+UPDATE_PASSWORD_SQL = "UPDATE users SET password = ? WHERE id = ?"
+
+UPDATE_PASSWORD_BY_EMAIL_SQL = "UPDATE users SET password = ? WHERE email = ?"
+
+
+def email_exists(conn, email):
+    return conn.execute(EMAIL_EXISTS_SQL, (email,)).fetchone() is not None
+
+
+def insert_user(conn, first_name, last_name, email, password_hash, user_type):
+    return conn.execute(INSERT_USER_SQL, (first_name, last_name, email, password_hash, user_type)).lastrowid
+
+
+def user_for_login(conn, email):
+    return conn.execute(LOGIN_SQL, (email,)).fetchone()
+
+
+def update_password(conn, user_id, password_hash):
+    conn.execute(UPDATE_PASSWORD_SQL, (password_hash, user_id))
+
+
+def update_password_by_email(conn, email, password_hash):
+    conn.execute(UPDATE_PASSWORD_BY_EMAIL_SQL, (password_hash, email))
+
+
+# Profiles
+
+PROFILE_JSON_SQL = f"SELECT {json_object(PROFILE_COLUMNS)} FROM profiles WHERE user_id = ?"
+
+UPDATE_PROFILE_SQL = """
+    UPDATE profiles
+    SET phone = ?, university = ?, course = ?, year = ?,
+        gpa = ?, skills = ?, interests = ?, updated_at = ?
+    WHERE user_id = ?
+"""
+
+INSERT_PROFILE_SQL = """
+    INSERT INTO profiles
+    (user_id, phone, university, course, year, gpa, skills, interests)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+PROFILE_SINCE_SQL = f"SELECT {json_object(PROFILE_COLUMNS)}, row_version FROM profiles WHERE user_id = ?"
+
+PROFILE_FIELDS = ('phone', 'university', 'course', 'year', 'gpa', 'skills', 'interests')
+
+
+def profile_json(conn, user_id):
+    return json_one(conn, PROFILE_JSON_SQL, (user_id,))
+
+
+def profile_since(conn, user_id, since):
+    """
+    {"cursor", "profile"} as JSON bytes, with profile null unless it
+    changed after row version `since`; None if the user has no profile.
+    """
+    return profile_since_body(conn.execute(PROFILE_SINCE_SQL, (user_id,)).fetchone(), since)
+
+
+def profile_since_body(row, since):
+    if row is None:
+        return None
+    if row['row_version'] <= since:
+        return b'{"cursor":%d,"profile":null}' % since
+    return b'{"cursor":%d,"profile":%s}' % (row['row_version'], row[0].encode())
+
+
+def save_profile(conn, user_id, data, now):
+    """Update or create the profile and return it as JSON bytes."""
+    values = [data.get(field) for field in PROFILE_FIELDS]
+    if not conn.execute(UPDATE_PROFILE_SQL, (*values, now, user_id)).rowcount:
+        conn.execute(INSERT_PROFILE_SQL, (user_id, *values))
+    sync_skill_tags(conn, [(user_id, data.get('skills'))])
+    return profile_json(conn, user_id)
+
+
+# Skill tags: profiles.skills split into normalized names. profile_tags,
+# keyed (tag_id, profile_id), holds each tag's posting list in profile id
+# order for tags.py to intersect.
+
+TAG_SEPARATORS = re.compile(r'[,;|\n\u2022]')
+
+MAX_TAG_LENGTH = 64
+
+MAX_TAGS_PER_PROFILE = 50
+
+INSERT_TAG_SQL = "INSERT OR IGNORE INTO tags (name) VALUES (?)"
+
+DELETE_STALE_PROFILE_TAGS_SQL = """
+    DELETE FROM profile_tags
+    WHERE profile_id = (SELECT id FROM profiles WHERE user_id = ?)
+    AND tag_id NOT IN (SELECT id FROM tags WHERE name IN (SELECT value FROM json_each(?)))
+"""
+
+INSERT_PROFILE_TAGS_SQL = """
+    INSERT OR IGNORE INTO profile_tags (tag_id, profile_id)
+    SELECT t.id, p.id FROM profiles p, tags t
+    WHERE p.user_id = ? AND t.name IN (SELECT value FROM json_each(?))
+"""
+
+
+def normalize_tag(text):
+    return ' '.join(text.split()).lower().strip('.-* ')
+
+
+def skill_tags(skills):
+    """The distinct tags in a free-text skills field, e.g. "Python, SQL; Team player"."""
+    tags = {}
+    for part in TAG_SEPARATORS.split(skills or ''):
+        name = normalize_tag(part)
+        if name and len(name) <= MAX_TAG_LENGTH:
+            tags[name] = None
+    return list(tags)[:MAX_TAGS_PER_PROFILE]
+
+
+def sync_skill_tags(conn, profiles):
+    """Bring profile_tags in line with the skills of each (user_id, skills) pair."""
+    rows, names = [], set()
+    for user_id, skills in profiles:
+        tags = skill_tags(skills)
+        names.update(tags)
+        rows.append((user_id, json.dumps(tags)))
+    conn.executemany(INSERT_TAG_SQL, [(name,) for name in sorted(names)])
+    conn.executemany(DELETE_STALE_PROFILE_TAGS_SQL, rows)
+    conn.executemany(INSERT_PROFILE_TAGS_SQL, rows)
+
+
+# Applications
+
+APPLICATIONS_JSON_SQL = f"""
+    SELECT {json_object(APPLICATION_COLUMNS)} FROM applications
+    WHERE user_id = ?
+    ORDER BY date_applied DESC
+"""
+
+# Delta reads: rows changed after a row version, oldest change first.
+APPLICATIONS_SINCE_SQL = f"""
+    SELECT {json_object(APPLICATION_COLUMNS)}, row_version FROM applications
+    WHERE user_id = ? AND row_version > ?
+    ORDER BY row_version
+"""
+
+APPLICATION_JSON_SQL = f"SELECT {json_object(APPLICATION_COLUMNS)} FROM applications WHERE id = ?"
+
+INSERT_APPLICATION_SQL = """
+    INSERT INTO applications (user_id, position, company, status, internship_id)
+    VALUES (?, ?, ?, 'Pending', ?)
+"""
+
+APPLICATIONS_BY_PAIRS_SQL = f"""
+    SELECT {columns(APPLICATION_COLUMNS)} FROM applications
+    WHERE user_id = ? AND (position, company) IN (
+        SELECT json_extract(value, '$[0]'), json_extract(value, '$[1]') FROM json_each(?)
+    )
+"""
+
+# The unique index on (user_id, position, company) only covers the hot
+# table, so applies look for an archived application first.
+ARCHIVED_APPLICATIONS_BY_PAIRS_SQL = f"""
+    SELECT {columns(APPLICATION_COLUMNS)} FROM archive.applications
+    WHERE user_id = ? AND (position, company) IN (
+        SELECT json_extract(value, '$[0]'), json_extract(value, '$[1]') FROM json_each(?)
+    )
+"""
+
+ARCHIVED_APPLICATION_EXISTS_SQL = """
+    SELECT 1 FROM archive.applications WHERE user_id = ? AND position = ? AND company = ? LIMIT 1
+"""
+
+
+def applications_json(conn, user_id):
+    return json_array(conn.execute(APPLICATIONS_JSON_SQL, (user_id,)).fetchall())
+
+
+def applications_since(conn, user_id, since):
+    """{"cursor", "items"} as JSON bytes: the applications changed after row version `since`."""
+    return applications_since_body(conn.execute(APPLICATIONS_SINCE_SQL, (user_id, since)).fetchall(), since)
+
+
+def applications_since_body(rows, since):
+    cursor = rows[-1]['row_version'] if rows else since
+    return b'{"cursor":%d,"items":%s}' % (cursor, json_array(rows))
+
+
+def insert_application(conn, user_id, position, company, internship_id, archive=False):
+    """
+    Insert one application and return it as JSON bytes; raises
+    IntegrityError on a duplicate, or, with `archive`, on an archived one.
+    """
+    if archive and conn.execute(ARCHIVED_APPLICATION_EXISTS_SQL, (user_id, position, company)).fetchone():
+        raise sqlite3.IntegrityError('UNIQUE constraint failed: archive.applications')
+    application_id = conn.execute(INSERT_APPLICATION_SQL, (user_id, position, company, internship_id)).lastrowid
+    return json_one(conn, APPLICATION_JSON_SQL, (application_id,))
+
+
+def apply_batch(conn, user_id, pairs, internship_ids, archive=False):
+    """
+    Create an application for each (position, company) in `pairs` that the
+    user does not have yet, in one transaction. With `archive`, archived
+    applications count as existing. Returns (the pairs created,
+    {pair: application dict} for every pair).
+    """
+    pairs_json = json.dumps(pairs)
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        archived = {}
+        if archive:
+            archived = {
+                (row['position'], row['company']): dict(row)
+                for row in conn.execute(ARCHIVED_APPLICATIONS_BY_PAIRS_SQL, (user_id, pairs_json))
+            }
+        existing = {
+            (row['position'], row['company'])
+            for row in conn.execute(APPLICATIONS_BY_PAIRS_SQL, (user_id, pairs_json))
+        }
+        new_pairs = [pair for pair in pairs if pair not in existing and pair not in archived]
+        conn.executemany(INSERT_APPLICATION_SQL, [
+            (user_id, position, company, internship_ids.get((position, company)))
+            for position, company in new_pairs
+        ])
+        rows = {
+            **archived,
+            **{
+                (row['position'], row['company']): dict(row)
+                for row in conn.execute(APPLICATIONS_BY_PAIRS_SQL, (user_id, pairs_json))
+            },
+        }
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return new_pairs, rows
+
+
+def apply_items(conn, user_id, items, archive=False):
+    """
+    The /api/apply/batch write. Each item names an internship_id or a
+    position and company; returns the per-item results and their counts.
+    `archive` is as for apply_batch().
+    """
+    internship_ids = [
+        item['internship_id'] for item in items
+        if isinstance(item, dict) and isinstance(item.get('internship_id'), int)
+    ]
+    internships = internship_pairs(conn, internship_ids)
+    
+    pairs = []
+    pair_internships = {}
+    for item in items:
+        item = item if isinstance(item, dict) else {}
+        internship = internships.get(item.get('internship_id'))
+        if internship:
+            pair = (internship['position'], internship['company'])
+            pair_internships[pair] = internship['id']
+            pairs.append(pair)
+            continue
+        position, company = item.get('position'), item.get('company')
+        if not item.get('internship_id') and position and company \
+                and isinstance(position, str) and isinstance(company, str):
+            pairs.append((position, company))
+        else:
+            pairs.append(None)
+    unique_pairs = list(dict.fromkeys(pair for pair in pairs if pair))
+    
+    # One write transaction for the whole batch: a set-based lookup of
+    # what already exists, one executemany for the rest, one commit.
+    new_pairs, rows = apply_batch(conn, user_id, unique_pairs, pair_internships, archive)
+    
+    created = set(new_pairs)
+    results = []
+    for pair in pairs:
+        if pair is None:
+            results.append({'status': 'invalid', 'message': 'A known internship_id or position and company are required'})
+        elif pair in created:
+            results.append({'status': 'created', 'application': rows[pair]})
+            created.discard(pair)
+        else:
+            results.append({'status': 'already_applied', 'application': rows[pair]})
+    
+    return {
+        'created': len(new_pairs),
+        'already_applied': sum(1 for r in results if r['status'] == 'already_applied'),
+        'invalid': sum(1 for r in results if r['status'] == 'invalid'),
+        'results': results
+    }
+
+
+# Admin status changes. One status_batches row per call; the history
+# keeps only (batch, application, previous status) per changed row.
+
+STATUS_SELECTORS = {
+    'ids': "id IN (SELECT value FROM json_each(?))",
+    'company': "company = ?",
+    'position': "position = ?",
+    'status': "status = ?",
+    'internship_id': "internship_id = ?",
+}
+
+INSERT_STATUS_BATCH_SQL = "INSERT INTO status_batches (to_status) VALUES (?)"
+
+STATUS_HISTORY_SQL = """
+    INSERT INTO application_status_history (batch_id, application_id, from_status)
+    SELECT ?, id, status FROM applications
+    WHERE {where} AND status IS NOT ?
+    LIMIT ?
+"""
+
+APPLY_STATUS_BATCH_SQL = """
+    UPDATE applications SET status = ?
+    WHERE id IN (SELECT application_id FROM application_status_history WHERE batch_id = ?)
+"""
+
+STATUS_BATCH_COUNTS_SQL = """
+    SELECT from_status, COUNT(*) FROM application_status_history
+    WHERE batch_id = ? GROUP BY from_status
+"""
+
+STATUS_BATCH_USERS_SQL = """
+    SELECT DISTINCT user_id FROM applications
+    WHERE id IN (SELECT application_id FROM application_status_history WHERE batch_id = ?)
+"""
+
+FINISH_STATUS_BATCH_SQL = "UPDATE status_batches SET affected = ? WHERE id = ?"
+
+
+class TooManyRows(Exception):
+    pass
+
+
+def status_selectors(ids=None, filters=None):
+    """
+    Check the `ids` list and `filter` object of a status update request and
+    return them as update_statuses() selectors; raises ValueError.
+    """
+    selectors = {}
+    if ids is not None:
+        if not isinstance(ids, list) or not ids or not all(isinstance(i, int) for i in ids):
+            raise ValueError('ids must be a non-empty list of application ids')
+        selectors['ids'] = ids
+    filters = filters or {}
+    if not isinstance(filters, dict):
+        raise ValueError('filter must be an object')
+    for name, value in filters.items():
+        if name not in STATUS_SELECTORS or name == 'ids':
+            raise ValueError(f'Unknown filter: {name}')
+        if isinstance(value, bool) or not isinstance(value, (str, int)) or value == '':
+            raise ValueError(f'Invalid value for filter {name}')
+        selectors[name] = value
+    if not selectors:
+        raise ValueError('ids or a filter is required')
+    return selectors
+
+
+def update_statuses(conn, to_status, selectors, limit):
+    """
+    Move every application matching all of `selectors` (names from
+    STATUS_SELECTORS; 'ids' is a list) to `to_status` with set-based
+    statements in one transaction. Rows already at `to_status` are left
+    alone. Raises TooManyRows, changing nothing, if more than `limit`
+    would change. Returns (summary dict, ids of the users affected).
+    """
+    where = ' AND '.join(STATUS_SELECTORS[name] for name in selectors)
+    params = [json.dumps(value) if name == 'ids' else value for name, value in selectors.items()]
+
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        batch_id = conn.execute(INSERT_STATUS_BATCH_SQL, (to_status,)).lastrowid
+        updated = conn.execute(
+            STATUS_HISTORY_SQL.format(where=where), (batch_id, *params, to_status, limit + 1)
+        ).rowcount
+        if updated > limit:
+            raise TooManyRows(f'More than {limit} applications match; narrow the selection')
+        if not updated:
+            conn.rollback()
+            return {'batch_id': None, 'status': to_status, 'updated': 0, 'previous': {}}, []
+
+        conn.execute(APPLY_STATUS_BATCH_SQL, (to_status, batch_id))
+        previous = dict(conn.execute(STATUS_BATCH_COUNTS_SQL, (batch_id,)).fetchall())
+        user_ids = [row[0] for row in conn.execute(STATUS_BATCH_USERS_SQL, (batch_id,))]
+        conn.execute(FINISH_STATUS_BATCH_SQL, (updated, batch_id))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return {'batch_id': batch_id, 'status': to_status, 'updated': updated, 'previous': previous}, user_ids
+
+
+# Internships
+
+INTERNSHIP_JSON_SQL = f"SELECT {json_object(INTERNSHIP_COLUMNS)} FROM internships WHERE id = ?"
+
+INTERNSHIP_PAIR_SQL = "SELECT position, company FROM internships WHERE id = ?"
+
+INTERNSHIP_PAIRS_SQL = "SELECT id, position, company FROM internships WHERE id IN (SELECT value FROM json_each(?))"
+
+# The ranked ids come in as a JSON array of [id, score]; the array index
+# (json_each.key) keeps the ranking order.
+SCORED_INTERNSHIPS_JSON_SQL = f"""
+    SELECT {json_object([*INTERNSHIP_COLUMNS, ('score', "json_extract(r.value, '$[1]')")], 'i.')}
+    FROM json_each(?) r JOIN internships i ON i.id = json_extract(r.value, '$[0]')
+    ORDER BY r.key
+"""
+
+
+def internship_json(conn, internship_id):
+    return json_one(conn, INTERNSHIP_JSON_SQL, (internship_id,))
+
+
+def internship_pair(conn, internship_id):
+    return conn.execute(INTERNSHIP_PAIR_SQL, (internship_id,)).fetchone()
+
+
+def internship_pairs(conn, internship_ids):
+    return {row['id']: row for row in conn.execute(INTERNSHIP_PAIRS_SQL, (json.dumps(internship_ids),))}
+
+
+def scored_internships_json(conn, matches):
+    """`matches` is [(internship id, score)] best first, as the recommender returns it."""
+    return json_array(conn.execute(SCORED_INTERNSHIPS_JSON_SQL, (json.dumps(matches),)).fetchall())
+
+
+# Admin
+
+ADMIN_USER_COLUMNS = ('id', 'first_name', 'last_name', 'email', 'user_type', 'created_at')
+
+ADMIN_USERS_SQL = f"SELECT {columns(ADMIN_USER_COLUMNS)} FROM users"
+
+ADMIN_USERS_JSON_SQL = f"SELECT {json_object(ADMIN_USER_COLUMNS)} AS json, created_at, id FROM users"
+
+_USER_NAME_FIELDS = [(name, f"u.{name}") for name in ('first_name', 'last_name', 'email')]
+
+ADMIN_PROFILES_SQL = f"""
+    SELECT {columns(PROFILE_COLUMNS, 'p.')}, u.first_name, u.last_name, u.email
+    FROM profiles p LEFT JOIN users u ON u.id = p.user_id
+"""
+
+ADMIN_PROFILES_JSON_SQL = f"""
+    SELECT {json_object([*PROFILE_COLUMNS, *_USER_NAME_FIELDS], 'p.')} AS json, p.created_at, p.id
+    FROM profiles p LEFT JOIN users u ON u.id = p.user_id
+"""
+
+# roster.py's searches: a page of ids and sort keys first, then the JSON
+# for just those rows, so a sort over many matches moves narrow rows.
+# Both select every column the listing can sort on, for the cursor.
+ADMIN_USERS_SEARCH_SQL = "SELECT id, created_at, email, first_name, last_name FROM users"
+
+ADMIN_USERS_SEARCH_JSON_SQL = f"""
+    SELECT {json_object(ADMIN_USER_COLUMNS)} AS json, id, created_at, email, first_name, last_name FROM users
+    WHERE id IN (SELECT value FROM json_each(?))
+"""
+
+ADMIN_PROFILES_SEARCH_SQL = "SELECT p.id, p.created_at, p.gpa, p.year FROM profiles p"
+
+ADMIN_PROFILES_SEARCH_JSON_SQL = f"""
+    SELECT {json_object([*PROFILE_COLUMNS, *_USER_NAME_FIELDS], 'p.')} AS json, p.id, p.created_at, p.gpa, p.year
+    FROM profiles p LEFT JOIN users u ON u.id = p.user_id
+    WHERE p.id IN (SELECT value FROM json_each(?))
+"""
+
+ADMIN_APPLICATIONS_SQL = f"""
+    SELECT {columns(APPLICATION_COLUMNS, 'a.')}, u.first_name, u.last_name, u.email
+    FROM applications a LEFT JOIN users u ON u.id = a.user_id
+"""
+
+ADMIN_APPLICATIONS_JSON_SQL = f"""
+    SELECT {json_object([*APPLICATION_COLUMNS, *_USER_NAME_FIELDS], 'a.')} AS json, a.date_applied, a.id
+    FROM applications a LEFT JOIN users u ON u.id = a.user_id
+"""
+
+# (rows SQL for CSV, JSON SQL for pages and NDJSON, keyset sort columns)
+ADMIN_LISTINGS = {
+    'users': (ADMIN_USERS_SQL, ADMIN_USERS_JSON_SQL, ['created_at', 'id']),
+    'profiles': (ADMIN_PROFILES_SQL, ADMIN_PROFILES_JSON_SQL, ['p.created_at', 'p.id']),
+    'applications': (ADMIN_APPLICATIONS_SQL, ADMIN_APPLICATIONS_JSON_SQL, ['a.date_applied', 'a.id']),
+}
+
+# Archived applications live in the same shape in the attached `archive`
+# database. A UNION ALL of both tables serves ?include_archive=1 reads.
+
+ARCHIVE_COLUMNS = (*APPLICATION_COLUMNS, 'row_version')
+
+ARCHIVE_SCHEMA = [
+    """
+    CREATE TABLE IF NOT EXISTS archive.applications (
+        id INTEGER PRIMARY KEY,
+        user_id INTEGER NOT NULL,
+        position TEXT NOT NULL,
+        company TEXT NOT NULL,
+        status TEXT,
+        date_applied TIMESTAMP,
+        internship_id INTEGER,
+        updated_at TIMESTAMP,
+        row_version INTEGER NOT NULL DEFAULT 0,
+        archived_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+    )
+    """,
+    "CREATE INDEX IF NOT EXISTS archive.idx_archive_applications_user_date ON applications (user_id, date_applied DESC)",
+    "CREATE INDEX IF NOT EXISTS archive.idx_archive_applications_date_applied ON applications (date_applied)",
+]
+
+ARCHIVE_IDS_SQL = "SELECT id, user_id FROM main.applications WHERE date_applied < ? ORDER BY date_applied LIMIT ?"
+
+# OR REPLACE: a batch retried after a crash between the two files'
+# commits copies the same rows again.
+COPY_TO_ARCHIVE_SQL = f"""
+    INSERT OR REPLACE INTO archive.applications ({columns(ARCHIVE_COLUMNS)})
+    SELECT {columns(ARCHIVE_COLUMNS)} FROM main.applications
+    WHERE id IN (SELECT value FROM json_each(?))
+"""
+
+DELETE_ARCHIVED_SQL = "DELETE FROM main.applications WHERE id IN (SELECT value FROM json_each(?))"
+
+# Both sides read (user_id, date_applied DESC) indexes, so the ORDER BY
+# is a merge rather than a sort.
+APPLICATIONS_WITH_ARCHIVE_JSON_SQL = f"""
+    SELECT {json_object(APPLICATION_COLUMNS)} AS json, date_applied FROM main.applications WHERE user_id = ?
+    UNION ALL
+    SELECT {json_object(APPLICATION_COLUMNS)} AS json, date_applied FROM archive.applications WHERE user_id = ?
+    ORDER BY date_applied DESC
+"""
+
+_ARCHIVE_JOIN = "LEFT JOIN users u ON u.id = a.user_id"
+
+# The admin applications listing over both tables; its sort columns are
+# the subquery's, without the a. prefix.
+ARCHIVE_LISTINGS = {
+    'applications': (
+        f"""
+        SELECT * FROM (
+            {ADMIN_APPLICATIONS_SQL}
+            UNION ALL
+            SELECT {columns(APPLICATION_COLUMNS, 'a.')}, u.first_name, u.last_name, u.email
+            FROM archive.applications a {_ARCHIVE_JOIN}
+        )
+        """,
+        f"""
+        SELECT json, date_applied, id FROM (
+            {ADMIN_APPLICATIONS_JSON_SQL}
+            UNION ALL
+            SELECT {json_object([*APPLICATION_COLUMNS, *_USER_NAME_FIELDS], 'a.')} AS json, a.date_applied, a.id
+            FROM archive.applications a {_ARCHIVE_JOIN}
+        )
+        """,
+        ['date_applied', 'id'],
+    ),
+}
+
+
+def applications_with_archive_json(conn, user_id):
+    return json_array(conn.execute(APPLICATIONS_WITH_ARCHIVE_JSON_SQL, (user_id, user_id)).fetchall())
+
+
+# The admin event feed: change_log entries after a sequence number, and
+# each listing's rows by id, in the same shape as its pages.
+CHANGES_SQL = "SELECT seq, entity, op, row_id FROM change_log WHERE seq > ? ORDER BY seq LIMIT ?"
+
+CHANGED_ROWS_SQL = {
+    name: f"{json_sql} WHERE {sort_columns[-1]} IN (SELECT value FROM json_each(?))"
+    for name, (_, json_sql, sort_columns) in ADMIN_LISTINGS.items()
+}
+
+CANDIDATE_FIELDS = [
+    ('user_id', 'p.user_id'), *_USER_NAME_FIELDS, ('university', 'p.university'),
+    ('course', 'p.course'), ('skills', 'p.skills'), ('interests', 'p.interests'),
+    ('score', "json_extract(r.value, '$[1]')"),
+]
+
+SCORED_CANDIDATES_JSON_SQL = f"""
+    SELECT {json_object(CANDIDATE_FIELDS)}
+    FROM json_each(?) r
+    JOIN profiles p ON p.user_id = json_extract(r.value, '$[0]')
+    LEFT JOIN users u ON u.id = p.user_id
+    ORDER BY r.key
+"""
+
+
+def scored_candidates_json(conn, matches):
+    return json_array(conn.execute(SCORED_CANDIDATES_JSON_SQL, (json.dumps(matches),)).fetchall())
@@ -0,0 +1,241 @@
+import sqlite3
+import threading
+import time
+from contextlib import contextmanager
+
+from flask import g
+
+import Config
+import metrics
+
+
+class PoolTimeout(Exception):
+    pass
+
+
+class ConnectionPool:
+    """
+    Bounded pool of SQLite connections shared by the request threads.
+
+    Connections are created lazily, configured once with the pragmas in
+    Config.SQLITE_PRAGMAS and handed back out most-recently-used first.
+    """
+
+    def __init__(self, database, size=8, timeout=5.0, pragmas=None):
+        self.database = database
+        self.size = size
+        self.timeout = timeout
+        self.pragmas = pragmas or {}
+        self._idle = []
+        self._created = 0
+        self._cond = threading.Condition()
+        self._stats = {
+            'acquired': 0,
+            'released': 0,
+            'waits': 0,
+            'wait_time_ms': 0.0,
+            'max_wait_ms': 0.0,
+            'timeouts': 0,
+            'peak_in_use': 0,
+        }
+
+    def connect(self):
+        return connect(self.database, self.pragmas)
+
+    def acquire(self):
+        with self._cond:
+            waited = None
+            while not self._idle and self._created >= self.size:
+                if waited is None:
+                    waited = time.perf_counter()
+                    self._stats['waits'] += 1
+                remaining = self.timeout - (time.perf_counter() - waited)
+                if remaining <= 0 or not self._cond.wait(remaining):
+                    if not self._idle and self._created >= self.size:
+                        self._stats['timeouts'] += 1
+                        raise PoolTimeout(f"No database connection free after {self.timeout}s")
+            if waited is not None:
+                wait_ms = (time.perf_counter() - waited) * 1000
+                self._stats['wait_time_ms'] += wait_ms
+                self._stats['max_wait_ms'] = max(self._stats['max_wait_ms'], wait_ms)
+
+            if self._idle:
+                conn = self._idle.pop()
+            else:
+                self._created += 1
+                try:
+                    conn = self.connect()
+                except Exception:
+                    self._created -= 1
+                    raise
+
+            self._stats['acquired'] += 1
+            in_use = self._created - len(self._idle)
+            self._stats['peak_in_use'] = max(self._stats['peak_in_use'], in_use)
+            return conn
+
+    def release(self, conn):
+        if conn.in_transaction:
+            conn.rollback()
+        with self._cond:
+            self._idle.append(conn)
+            self._stats['released'] += 1
+            self._cond.notify()
+
+    def discard(self, conn):
+        try:
+            conn.close()
+        finally:
+            with self._cond:
+                self._created -= 1
+                self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        conn = self.acquire()
+        try:
+            yield conn
+        except Exception:
+            self.discard(conn)
+            raise
+        else:
+            self.release(conn)
+
+    def close_all(self):
+        with self._cond:
+            idle, self._idle = self._idle, []
+            self._created -= len(idle)
+        for conn in idle:
+            conn.close()
+
+    def stats(self):
+        with self._cond:
+            stats = dict(self._stats)
+            stats['size'] = self.size
+            stats['open'] = self._created
+            stats['idle'] = len(self._idle)
+            stats['in_use'] = self._created - len(self._idle)
+        stats['wait_time_ms'] = round(stats['wait_time_ms'], 3)
+        stats['max_wait_ms'] = round(stats['max_wait_ms'], 3)
+        return stats
+
+
+def connect(database, pragmas):
+    """A new connection set up with `pragmas`, with the archive attached if there is one."""
+    factory = metrics.Connection if Config.METRICS_ENABLED else sqlite3.Connection
+    conn = sqlite3.connect(
+        database, check_same_thread=False, factory=factory,
+        cached_statements=Config.SQLITE_STATEMENT_CACHE
+    )
+    conn.row_factory = sqlite3.Row
+    for name, value in pragmas.items():
+        conn.execute(f"PRAGMA {name} = {value}")
+    if Config.ARCHIVE_DATABASE:
+        attach_archive(conn)
+    return conn
+
+
+def attach_archive(conn):
+    """ATTACH Config.ARCHIVE_DATABASE as `archive`; migrate() creates its table."""
+    conn.execute("ATTACH DATABASE ? AS archive", (Config.ARCHIVE_DATABASE,))
+    conn.execute("PRAGMA archive.journal_mode = WAL")
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    Config.DATABASE,
+                    size=Config.DB_POOL_SIZE,
+                    timeout=Config.DB_POOL_TIMEOUT,
+                    pragmas=Config.SQLITE_PRAGMAS,
+                )
+    return _pool
+
+
+def reset_pool():
+    """Drop the pool without touching its connections, e.g. in a forked child."""
+    global _pool
+    with _pool_lock:
+        _pool = None
+
+
+_bound = threading.local()
+
+
+def get_db():
+    """
+    Return the connection lent to this thread by a Lease, or else the one
+    bound to the current app context.
+    """
+    lease = getattr(_bound, 'lease', None)
+    if lease is not None:
+        if lease.conn is None:
+            lease.conn = get_pool().acquire()
+        return lease.conn
+    if 'db' not in g:
+        g.db = get_pool().acquire()
+    return g.db
+
+
+class Lease:
+    """
+    A pooled connection for get_db() to lend inside bound(), taken on first
+    use and kept until close(), for code that runs outside a Flask app
+    context (the async app's worker threads). One lease can be bound on
+    several threads in turn, so a handler keeps its connection when it
+    resumes on another thread.
+    """
+
+    def __init__(self):
+        self.conn = None
+
+    @contextmanager
+    def bound(self):
+        _bound.lease = self
+        try:
+            yield
+        finally:
+            _bound.lease = None
+
+    def close(self, failed=False):
+        if self.conn is not None:
+            if failed:
+                get_pool().discard(self.conn)
+            else:
+                get_pool().release(self.conn)
+            self.conn = None
+
+
+@contextmanager
+def bound_connection():
+    """Lend a connection to get_db() on this thread until the block exits."""
+    lease = Lease()
+    try:
+        with lease.bound():
+            yield
+    except Exception:
+        lease.close(failed=True)
+        raise
+    else:
+        lease.close()
+
+
+def close_db(exception=None):
+    conn = g.pop('db', None)
+    if conn is None:
+        return
+    if exception is None:
+        get_pool().release(conn)
+    else:
+        get_pool().discard(conn)
+
+
+def init_app(app):
+    app.teardown_appcontext(close_db)
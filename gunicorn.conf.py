@@ -0,0 +1,75 @@
+"""
+Gunicorn settings for production.
+
+    python migrations.py && gunicorn -c gunicorn.conf.py app:app
+
+The schema is migrated once before gunicorn starts, so neither the master
+nor the workers run DDL. The app is imported once in the master
+(preload_app) and forked into the workers. Nothing in app.py opens a
+connection or starts a thread at import time, and post_fork drops any
+connection pool the master might hold anyway.
+
+Every worker writes its metrics to METRICS_DIR and /metrics adds them up,
+so a scrape answered by any worker covers all of them. The directory is
+emptied when gunicorn starts.
+
+Send SIGHUP for a graceful restart of the workers. Because the app is
+preloaded, code changes need a full restart instead.
+"""
+import multiprocessing
+import os
+import tempfile
+
+
+cpus = multiprocessing.cpu_count()
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+
+# gthread workers: requests mostly wait on SQLite or the hashing pool, so a
+# few threads per process help. Keep threads at or below DB_POOL_SIZE.
+worker_class = 'gthread'
+workers = int(os.environ.get('WEB_CONCURRENCY', cpus * 2 + 1))
+threads = int(os.environ.get('GUNICORN_THREADS', 4))
+
+preload_app = True
+
+# Render's proxy keeps idle connections open for longer than gunicorn's
+# default of 2 seconds; a shorter keep-alive would make it reconnect.
+keepalive = int(os.environ.get('GUNICORN_KEEPALIVE', 75))
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = int(os.environ.get('GUNICORN_GRACEFUL_TIMEOUT', 30))
+
+# Recycle workers now and then so slow leaks cannot build up; the jitter
+# keeps them from all restarting at once.
+max_requests = int(os.environ.get('GUNICORN_MAX_REQUESTS', 5000))
+max_requests_jitter = max_requests // 10
+
+# Worker heartbeats go to tmpfs so a slow disk cannot get workers killed.
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG')
+errorlog = '-'
+
+# Settings that only make sense with several processes. The app reads them
+# from Config at import, which happens after this file runs.
+os.environ.setdefault('HASH_POOL_WORKERS', str(max(1, cpus // workers)))
+os.environ.setdefault('THROTTLE_STORE', 'sqlite')
+os.environ.setdefault('METRICS_DIR', os.path.join(
+    '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir(), f'internlink-metrics-{bind.rsplit(":", 1)[1]}'))
+
+
+def on_starting(server):
+    import metrics
+    metrics.clear_snapshots()
+
+
+def post_fork(server, worker):
+    import db
+    db.reset_pool()
+
+
+def worker_exit(server, worker):
+    # Keep this worker's final counts for the scrapes after it is gone.
+    import metrics
+    metrics.write_snapshot()
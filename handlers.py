@@ -0,0 +1,770 @@
+"""
+Route logic shared by app.py (Flask) and async_app.py (Quart).
+
+Each handler takes the request's parsed inputs (the JSON body, the query
+string, the client address) and returns a result in Flask's tuple shape,
+(payload, status) or (payload, status, headers), where the payload is one
+of:
+
+    dict or list    serialized by the app
+    bytes           a body that is already JSON (dal.py's *_json helpers)
+    CacheEntry      a read-cache entry, answered with 304 when the client
+                    has the current copy (see conditional_response)
+    Export          a whole table to stream as CSV or NDJSON
+
+The apps only unpack the request, call the handler and turn the result
+into a response, so both serve the same routes with the same bodies and
+statuses. Handlers are plain blocking code: app.py calls them on the
+request thread and async_app.py in a worker thread. Either way
+connection() lends them a pooled connection on first use.
+
+A handler that waits on the hashing pool or the group-commit writer
+yields the job instead (`hashed = yield hashing.hash_job(password)`) and
+gets its result, or its exception, back from the yield. Calling the
+handler runs it to the end with drive(), waiting on this thread; the
+async app drives handler.steps itself, awaiting each job on the event
+loop so the wait holds no thread.
+"""
+import functools
+import inspect
+import json
+import math
+import os
+import sqlite3
+from datetime import datetime
+
+import Config
+import archive
+import cache
+import catalog
+import changes
+import dal
+import db
+import hashing
+import metrics
+import pagination
+import recommend
+import resetcodes
+import roster
+import stats
+import tags
+import throttle
+import writer
+
+
+SERVER_BUSY = (
+    {'message': 'Server is busy, please try again shortly'},
+    503,
+    {'Retry-After': str(Config.HASH_RETRY_AFTER)}
+)
+
+DB_FAILED = ({'message': 'Database connection failed'}, 500)
+
+STREAMS_BUSY = (
+    {'message': 'Too many live feeds open, please try again shortly'},
+    503,
+    {'Retry-After': str(math.ceil(Config.EVENTS_RETRY_MS / 1000))}
+)
+
+
+class Export:
+    """Result payload for streaming every row of `sql` (already ordered) as `fmt`."""
+
+    def __init__(self, sql, fmt, filename):
+        self.sql = sql
+        self.fmt = fmt
+        self.filename = filename
+
+
+class Ready:
+    """A job that has already run, e.g. a write made on the request's own connection."""
+
+    def __init__(self, value):
+        self.value = value
+
+    def run(self):
+        return self.value
+
+    async def run_async(self):
+        return self.value
+
+
+def step(steps, value=None, error=None):
+    """
+    Resume a handler's steps with the result of its last job, or the error
+    it raised. (True, result) once the handler has returned, else (False,
+    the next job).
+    """
+    try:
+        job = steps.throw(error) if error is not None else steps.send(value)
+    except StopIteration as stop:
+        return True, stop.value
+    return False, job
+
+
+def drive(steps):
+    """Run a handler's steps to the end, waiting for each job on this thread."""
+    done, value = step(steps)
+    while not done:
+        try:
+            sent = (value.run(), None)
+        except Exception as e:
+            sent = (None, e)
+        done, value = step(steps, *sent)
+    return value
+
+
+def guarded(log, message):
+    """
+    Answer a busy hashing pool or write queue with 503, and any other
+    error with a 500 carrying `message` after printing it prefixed by `log`.
+    A handler that yields jobs keeps its generator as `handler.steps`.
+    """
+    def failed(e):
+        if isinstance(e, (hashing.HashPoolBusy, writer.WriterBusy)):
+            return SERVER_BUSY
+        print(f"{log}: {e}")
+        return {'message': message}, 500
+
+    def decorate(handler):
+        if inspect.isgeneratorfunction(handler):
+            @functools.wraps(handler)
+            def steps(*args):
+                try:
+                    return (yield from handler(*args))
+                except Exception as e:
+                    return failed(e)
+
+            @functools.wraps(handler)
+            def guard(*args):
+                return drive(steps(*args))
+            guard.steps = steps
+            return guard
+
+        @functools.wraps(handler)
+        def guard(*args):
+            try:
+                return handler(*args)
+            except Exception as e:
+                return failed(e)
+        return guard
+    return decorate
+
+
+def connection():
+    """This request's pooled connection, or None if one could not be had."""
+    try:
+        return db.get_db()
+    except Exception as e:
+        print(f"Error connecting to database: {e}")
+        return None
+
+
+def unpack(result):
+    """(payload, status, headers) for any handler result."""
+    payload, status, headers = (result + ({},))[:3]
+    return payload, status, headers
+
+
+def not_modified(entry, request):
+    """Whether a conditional request already has the current copy of `entry`."""
+    if request.if_none_match:
+        return request.if_none_match.contains_weak(entry.etag)
+    return request.if_modified_since is not None and entry.last_modified <= request.if_modified_since
+
+
+def make_response(app, request, result):
+    """
+    Build `app`'s response for any result but an Export. Flask's and
+    Quart's responses both come from Werkzeug, so this serves either.
+    """
+    payload, status, headers = unpack(result)
+    if isinstance(payload, cache.CacheEntry):
+        response = conditional_response(app, request, payload)
+    elif isinstance(payload, bytes):
+        response = app.response_class(payload, status=status, mimetype='application/json')
+    else:
+        response = app.json.response(payload)
+        response.status_code = status
+    response.headers.update(headers)
+    return response
+
+
+def conditional_response(app, request, entry):
+    """A cached body with its ETag and Last-Modified, or 304 if the client has it."""
+    if not entry.etag:
+        return app.response_class(entry.body, status=entry.status, mimetype='application/json')
+    if not_modified(entry, request):
+        cache.read_cache.record_not_modified()
+        response = app.response_class(b'', status=304, mimetype='application/json')
+    else:
+        response = app.response_class(entry.body, status=entry.status, mimetype='application/json')
+    response.set_etag(entry.etag)
+    response.last_modified = entry.last_modified
+    response.cache_control.no_cache = True
+    return response
+
+
+def cached(key, load):
+    """
+    Serve `key` from the read cache, calling `load()` for (payload, status)
+    on a miss; payload may be JSON bytes already. 200 responses carry an
+    ETag and Last-Modified.
+    """
+    generation = cache.read_cache.generation()
+    entry = cache.read_cache.get(key)
+    if entry is None:
+        payload, status = load()
+        if status >= 500:
+            return payload, status
+        body = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+        entry = cache.read_cache.put(key, body, status, generation)
+    return entry, entry.status
+
+
+def invalidate_user_cache(kind, user_id):
+    try:
+        cache.read_cache.invalidate((kind, int(user_id)))
+    except (TypeError, ValueError):
+        pass
+
+
+def run_write(fn, *args):
+    """
+    A job for `fn(conn, *args)` in a transaction: queued for the
+    group-commit writer when it is enabled, otherwise run right away on
+    this request's connection.
+    """
+    if Config.WRITE_QUEUE_ENABLED:
+        return writer.get_writer().job(fn, *args)
+    conn = db.get_db()
+    try:
+        result = fn(conn, *args)
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return Ready(result)
+
+
+def throttled(rule, email, ip):
+    """A 429 result if `rule` is over its limit for this email or IP, else None."""
+    wait = throttle.get_throttle().hit(rule, {
+        'email': str(email).strip().lower(),
+        'ip': ip
+    })
+    if not wait:
+        return None
+    return (
+        {'message': 'Too many attempts, please try again later'},
+        429,
+        {'Retry-After': str(math.ceil(wait))}
+    )
+
+
+def since_arg(args):
+    """The ?since= row version of a delta read, or None for a full read."""
+    since = args.get('since')
+    return None if since is None else max(int(since), 0)
+
+
+def include_archive(args):
+    """Whether a read asked for archived applications too (?include_archive=1)."""
+    return bool(Config.ARCHIVE_DATABASE) and args.get('include_archive') in ('1', 'true')
+
+
+def recommendation_limit(args, default):
+    try:
+        return max(1, min(int(args.get('k', default)), 100))
+    except ValueError:
+        return default
+
+
+@guarded('Signup error', 'An error occurred during signup')
+def signup(data):
+    first_name = data.get('first_name')
+    last_name = data.get('last_name')
+    email = data.get('email')
+    password = data.get('password')
+    user_type = 'student'
+
+    if not all([first_name, last_name, email, password]):
+        return {'message': 'All fields are required'}, 400
+
+    conn = connection()
+    if not conn:
+        return DB_FAILED
+
+    if dal.email_exists(conn, email):
+        return {'message': 'Email already registered'}, 400
+
+    hashed_password = yield hashing.hash_job(password)
+
+    user_id = dal.insert_user(conn, first_name, last_name, email, hashed_password, user_type)
+    conn.commit()
+
+    user_data = {
+        'id': user_id,
+        'first_name': first_name,
+        'last_name': last_name,
+        'email': email,
+        'user_type': user_type
+    }
+
+    return {'message': 'Signup successful', 'user': user_data}, 201
+
+
+@guarded('Login error', 'An error occurred during login')
+def login(data, ip):
+    email = data.get('email')
+    password = data.get('password')
+
+    if not all([email, password]):
+        return {'message': 'Email and password are required'}, 400
+
+    limited = throttled('login', email, ip)
+    if limited:
+        return limited
+
+    conn = connection()
+    if not conn:
+        return DB_FAILED
+
+    user = dal.user_for_login(conn, email)
+
+    if not user or not (yield hashing.check_job(user['password'], password)):
+        return {'message': 'Invalid email or password'}, 401
+
+    if user['user_type'] != 'student':
+        return {'message': 'Organization portal coming soon in Phase 2!'}, 403
+
+    pool = hashing.get_pool()
+    if pool.needs_rehash(user['password']):
+        try:
+            dal.update_password(conn, user['id'], (yield pool.hash_job(password)))
+            conn.commit()
+            pool.record_rehash()
+        except hashing.HashPoolBusy:
+            pass
+
+    user_data = {
+        'id': user['id'],
+        'first_name': user['first_name'],
+        'last_name': user['last_name'],
+        'email': user['email'],
+        'user_type': user['user_type']
+    }
+
+    return {'message': 'Login successful', 'user': user_data}, 200
+
+
+@guarded('Forgot password error', 'An error occurred')
+def forgot_password(data, ip):
+    email = data.get('email')
+
+    if not email:
+        return {'message': 'Email is required'}, 400
+
+    limited = throttled('forgot_password', email, ip)
+    if limited:
+        return limited
+
+    conn = connection()
+    if not conn:
+        return DB_FAILED
+
+    if not dal.email_exists(conn, email):
+        return {'message': 'If an account exists with this email, you will receive a reset code.'}, 200
+
+    # Replaces any earlier code for this email
+    reset_code = resetcodes.get_store().issue(email)
+
+    print(f"Reset code for {email}: {reset_code}")
+
+    return {
+        'message': f'Reset code sent! For demo purposes, your code is: {reset_code}',
+        'reset_code': reset_code
+    }, 200
+
+
+@guarded('Verify code error', 'An error occurred')
+def verify_reset_code(data):
+    email = data.get('email')
+    code = data.get('code')
+
+    if not all([email, code]):
+        return {'message': 'Email and code are required'}, 400
+
+    if resetcodes.get_store().check(email, code) == resetcodes.VALID:
+        return {'message': 'Code verified successfully'}, 200
+    return {'message': 'Invalid or expired code'}, 400
+
+
+@guarded('Reset password error', 'An error occurred')
+def reset_password(data):
+    email = data.get('email')
+    code = data.get('code')
+    new_password = data.get('new_password')
+
+    if not all([email, code, new_password]):
+        return {'message': 'All fields are required'}, 400
+
+    if len(new_password) < 8:
+        return {'message': 'Password must be at least 8 characters'}, 400
+
+    conn = connection()
+    if not conn:
+        return DB_FAILED
+
+    store = resetcodes.get_store()
+
+    # Hash before consuming the code so a busy hashing pool does not
+    # burn a valid code.
+    if store.check(email, code) != resetcodes.VALID:
+        return {'message': 'Invalid or expired code'}, 400
+
+    hashed_password = yield hashing.hash_job(new_password)
+
+    # The code is only spent if the new password is committed with it.
+    result = store.redeem(email, code, lambda conn: dal.update_password_by_email(conn, email, hashed_password))
+    if result != resetcodes.VALID:
+        return {'message': 'Invalid or expired code'}, 400
+
+    return {'message': 'Password reset successful'}, 200
+
+
+@guarded('Get profile error', 'An error occurred')
+def get_profile(user_id, args):
+    """The profile, or with ?since=<cursor> only whether it changed since then."""
+    try:
+        since = since_arg(args)
+    except ValueError:
+        return {'message': 'since must be a number'}, 400
+
+    def load():
+        conn = connection()
+        if not conn:
+            return DB_FAILED
+
+        profile = dal.profile_json(conn, user_id)
+        if profile:
+            return profile, 200
+        return {'message': 'Profile not found'}, 404
+
+    if since is None:
+        return cached(('profile', user_id), load)
+
+    conn = connection()
+    if not conn:
+        return DB_FAILED
+    body = dal.profile_since(conn, user_id, since)
+    if body is None:
+        return {'message': 'Profile not found'}, 404
+    return body, 200
+
+
+@guarded('Save profile error', 'An error occurred while saving profile')
+def save_profile(data):
+    user_id = data.get('user_id')
+
+    if not user_id:
+        return {'message': 'User ID is required'}, 400
+    try:
+        user_id = int(user_id)
+    except (TypeError, ValueError):
+        return {'message': 'User ID must be a number'}, 400
+
+    profile = yield run_write(dal.save_profile, user_id, data, datetime.now())
+
+    invalidate_user_cache('profile', user_id)
+    recommend.recommender.update_profile(user_id, data.get('skills'), data.get('interests'))
+
+    return profile, 200
+
+
+@guarded('Get applications error', 'An error occurred')
+def get_applications(user_id, args):
+    """
+    Every application, or with ?since=<cursor> only those changed since
+    then, plus the cursor for the next call. ?include_archive=1 adds the
+    archived ones.
+    """
+    try:
+        since = since_arg(args)
+    except ValueError:
+        return {'message': 'since must be a number'}, 400
+
+    def load():
+        conn = connection()
+        if not conn:
+            return DB_FAILED
+        return dal.applications_json(conn, user_id), 200
+
+    if since is None and not include_archive(args):
+        return cached(('applications', user_id), load)
+
+    conn = connection()
+    if not conn:
+        return DB_FAILED
+    if since is not None:
+        return dal.applications_since(conn, user_id, since), 200
+    return dal.applications_with_archive_json(conn, user_id), 200
+
+
+@guarded('Search internships error', 'An error occurred')
+def search_internships(args):
+    try:
+        page = int(args.get('page', 1))
+        per_page = int(args.get('per_page', catalog.DEFAULT_PER_PAGE))
+    except ValueError:
+        return {'message': 'page and per_page must be numbers'}, 400
+
+    conn = connection()
+    if not conn:
+        return DB_FAILED
+
+    filters = {name: args.get(name) for name in catalog.FILTERS}
+    return catalog.search(conn, args.get('q'), filters, page, per_page), 200
+
+
+@guarded('Get internship error', 'An error occurred')
+def get_internship(internship_id):
+    conn = connection()
+    if not conn:
+        return DB_FAILED
+
+    internship = dal.internship_json(conn, internship_id)
+    if internship:
+        return internship, 200
+    return {'message': 'Internship not found'}, 404
+
+
+@guarded('Recommendations error', 'An error occurred')
+def recommend_internships(user_id, args):
+    conn = connection()
+    if not conn:
+        return DB_FAILED
+
+    matches = recommend.recommender.internships_for_student(conn, user_id, recommendation_limit(args, 10))
+    if matches is None:
+        return {'message': 'Profile not found'}, 404
+
+    return dal.scored_internships_json(conn, matches), 200
+
+
+@guarded('Apply error', 'An error occurred while submitting application')
+def apply_internship(data):
+    user_id = data.get('user_id')
+    internship_id = data.get('internship_id')
+    position = data.get('position')
+    company = data.get('company')
+
+    if not user_id or not (internship_id or (position and company)):
+        return {'message': 'All fields are required'}, 400
+
+    if internship_id:
+        conn = connection()
+        if not conn:
+            return DB_FAILED
+        internship = dal.internship_pair(conn, internship_id)
+        if not internship:
+            return {'message': 'Internship not found'}, 404
+        position, company = internship['position'], internship['company']
+
+    # ux_applications_user_position_company rejects duplicates; archived
+    # applications are looked up first.
+    try:
+        application = yield run_write(
+            dal.insert_application, user_id, position, company, internship_id, bool(Config.ARCHIVE_DATABASE)
+        )
+    except sqlite3.IntegrityError:
+        return {'message': 'Already applied to this internship'}, 400
+
+    invalidate_user_cache('applications', user_id)
+
+    return application, 201
+
+
+@guarded('Batch apply error', 'An error occurred while submitting applications')
+def apply_internships_batch(data):
+    user_id = data.get('user_id')
+    items = data.get('applications')
+
+    if not user_id or not isinstance(items, list) or not items:
+        return {'message': 'User ID and a list of applications are required'}, 400
+
+    if len(items) > Config.APPLY_BATCH_LIMIT:
+        return {'message': f'At most {Config.APPLY_BATCH_LIMIT} applications per request'}, 400
+
+    conn = connection()
+    if not conn:
+        return DB_FAILED
+
+    result = dal.apply_items(conn, user_id, items, bool(Config.ARCHIVE_DATABASE))
+
+    if result['created']:
+        invalidate_user_cache('applications', user_id)
+
+    return result, 200
+
+
+@guarded('Error fetching stats', 'Error fetching stats')
+def admin_stats():
+    conn = connection()
+    if not conn:
+        return DB_FAILED
+    return stats.read_counters(conn), 200
+
+
+def admin_listing(name, args):
+    """
+    One page of an admin table (?limit=&cursor=), or the whole table streamed
+    row by row when ?format=ndjson or ?format=csv is given.
+    """
+    listings = dal.ARCHIVE_LISTINGS if include_archive(args) and name in dal.ARCHIVE_LISTINGS else dal.ADMIN_LISTINGS
+    sql, json_sql, sort_columns = listings[name]
+
+    fmt = args.get('format')
+    if fmt in ('ndjson', 'csv'):
+        export_sql = pagination.order_by(sql if fmt == 'csv' else json_sql, sort_columns)
+        return Export(export_sql, fmt, f'internlink_{name}'), 200
+
+    conn = connection()
+    if not conn:
+        return DB_FAILED
+
+    try:
+        limit, after = pagination.page_args(args)
+        page = pagination.keyset_page_json(conn, json_sql, sort_columns, limit=limit, after=after)
+    except ValueError as e:
+        return {'message': str(e)}, 400
+
+    return page, 200
+
+
+@guarded('Error fetching users', 'Error fetching users')
+def admin_users(args):
+    return admin_listing('users', args)
+
+
+@guarded('Error fetching profiles', 'Error fetching profiles')
+def admin_profiles(args):
+    return admin_listing('profiles', args)
+
+
+@guarded('Error fetching applications', 'Error fetching applications')
+def admin_applications(args):
+    return admin_listing('applications', args)
+
+
+def admin_search(name, args):
+    """
+    One page of users or profiles filtered, searched and sorted in SQL
+    (see roster.py), with the total number of matches.
+    """
+    conn = connection()
+    if not conn:
+        return DB_FAILED
+
+    try:
+        return roster.LISTINGS[name].search_json(conn, args), 200
+    except ValueError as e:
+        return {'message': str(e)}, 400
+
+
+@guarded('Error searching users', 'Error searching users')
+def search_users(args):
+    return admin_search('users', args)
+
+
+@guarded('Error searching profiles', 'Error searching profiles')
+def search_profiles(args):
+    return admin_search('profiles', args)
+
+
+@guarded('Tag search error', 'Error searching profiles')
+def search_profiles_by_tags(args):
+    """Profiles whose skills match ?q=, e.g. `python AND (sql OR postgresql) AND NOT excel`."""
+    conn = connection()
+    if not conn:
+        return DB_FAILED
+
+    try:
+        limit, after = pagination.page_args(args)
+        return tags.search_json(conn, args.get('q'), limit, after), 200
+    except ValueError as e:
+        return {'message': str(e)}, 400
+
+
+@guarded('Status update error', 'An error occurred while updating applications')
+def update_application_statuses(data):
+    """Move every application picked by `ids` and/or `filter` to `status`."""
+    status = data.get('status')
+
+    if status not in Config.APPLICATION_STATUSES:
+        return {'message': f"status must be one of {', '.join(Config.APPLICATION_STATUSES)}"}, 400
+
+    try:
+        selectors = dal.status_selectors(data.get('ids'), data.get('filter'))
+    except ValueError as e:
+        return {'message': str(e)}, 400
+
+    conn = connection()
+    if not conn:
+        return DB_FAILED
+
+    try:
+        summary, user_ids = dal.update_statuses(conn, status, selectors, Config.STATUS_UPDATE_LIMIT)
+    except dal.TooManyRows as e:
+        return {'message': str(e)}, 400
+
+    for user_id in user_ids:
+        invalidate_user_cache('applications', user_id)
+
+    return summary, 200
+
+
+@guarded('Candidates error', 'An error occurred')
+def recommend_students(internship_id, args):
+    conn = connection()
+    if not conn:
+        return DB_FAILED
+
+    matches = recommend.recommender.students_for_internship(conn, internship_id, recommendation_limit(args, 20))
+    if matches is None:
+        return {'message': 'Internship not found'}, 404
+
+    return dal.scored_candidates_json(conn, matches), 200
+
+
+def runtime_stats():
+    return {
+        'pid': os.getpid(),
+        'db_pool': db.get_pool().stats(),
+        'hashing': hashing.get_pool().stats(),
+        'throttle': throttle.get_throttle().stats(),
+        'read_cache': cache.read_cache.stats(),
+        'reset_codes': resetcodes.stats(),
+        'archive': archive.archiver.stats(),
+        'events': changes.stats(),
+        'write_queue': writer.get_writer().stats()
+    }
+
+
+def runtime_metrics():
+    lines = []
+    pool = db.get_pool().stats()
+    for key in ('open', 'idle', 'in_use'):
+        lines += metrics.gauge(f'internlink_db_connections_{key}', f'Pooled SQLite connections ({key}).', pool[key])
+    lines += metrics.gauge('internlink_db_pool_waits_total', 'Acquires that had to wait for a connection.', pool['waits'], 'counter')
+    lines += metrics.gauge('internlink_db_pool_timeouts_total', 'Acquires that gave up waiting.', pool['timeouts'], 'counter')
+    lines += metrics.gauge('internlink_db_pool_wait_seconds_total', 'Time spent waiting for a connection.', pool['wait_time_ms'] / 1000, 'counter')
+
+    hash_pool = hashing.get_pool()
+    lines += hash_pool.latency.render()
+    lines += metrics.gauge('internlink_password_hash_rejected_total', 'Hashing requests refused because the pool was full.', hash_pool.stats()['rejected'], 'counter')
+
+    read_cache = cache.read_cache.stats()
+    for key in ('hits', 'misses', 'not_modified'):
+        lines += metrics.gauge(f'internlink_read_cache_{key}_total', f'Read cache {key.replace("_", " ")}.', read_cache[key], 'counter')
+    return lines
@@ -0,0 +1,203 @@
+"""
+Password hashing off the request thread.
+
+scrypt costs tens of milliseconds of CPU per call and holds the GIL, so
+hashes are computed in a small process pool. At most
+Config.HASH_POOL_MAX_PENDING jobs may be queued or running; past that,
+callers get HashPoolBusy straight away and the route answers 503.
+
+hash_job() and check_job() return a Job for a handler to yield (see
+handlers.py). app.py runs it with run(), which waits on the request
+thread; async_app.py awaits run_async(), which holds no thread while the
+pool works.
+"""
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures import TimeoutError as FutureTimeout
+
+from werkzeug.security import generate_password_hash, check_password_hash
+
+import Config
+from metrics import HistogramFamily
+
+
+class HashPoolBusy(Exception):
+    pass
+
+
+def _hash(password, method):
+    return generate_password_hash(password, method=method)
+
+
+def _check(pwhash, password):
+    return check_password_hash(pwhash, password)
+
+
+class Job:
+
+    def __init__(self, pool, operation, fn, *args):
+        self.pool = pool
+        self.operation = operation
+        self.fn = fn
+        self.args = args
+
+    def run(self):
+        return self.pool._run(self.operation, self.fn, *self.args)
+
+    async def run_async(self):
+        return await self.pool._run_async(self.operation, self.fn, *self.args)
+
+
+class HashPool:
+
+    def __init__(self, method, mode='process', workers=1, max_pending=4, timeout=10.0):
+        self.method = method
+        self.mode = mode
+        self.workers = workers
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._executor = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._method_prefix = None
+        self.latency = HistogramFamily(
+            'internlink_password_hash_duration_seconds',
+            'Password hash and check latency, including queueing.', ('operation',))
+        self._counts = {'rejected': 0, 'timeouts': 0, 'rehashed': 0}
+
+    def _get_executor(self):
+        # A pool inherited through fork() has no live workers; start a new one.
+        if self._executor is None or self._pid != os.getpid():
+            with self._lock:
+                if self._executor is None or self._pid != os.getpid():
+                    # hypercorn runs its workers as daemonic processes,
+                    # which may not start children; they use threads.
+                    if self.mode == 'process' and not multiprocessing.current_process().daemon:
+                        self._executor = ProcessPoolExecutor(max_workers=self.workers)
+                    else:
+                        self._executor = ThreadPoolExecutor(max_workers=self.workers)
+                    self._pid = os.getpid()
+        return self._executor
+
+    def _run(self, operation, fn, *args):
+        started = time.perf_counter()
+        if self.mode == 'inline':
+            result = fn(*args)
+            self.latency.labels(operation).observe(time.perf_counter() - started)
+            return result
+
+        try:
+            future = self._submit(fn, *args)
+            try:
+                return future.result(timeout=self.timeout)
+            except FutureTimeout:
+                future.cancel()
+                self._bump('timeouts')
+                raise HashPoolBusy('Password hashing timed out')
+        finally:
+            self.latency.labels(operation).observe(time.perf_counter() - started)
+
+    async def _run_async(self, operation, fn, *args):
+        started = time.perf_counter()
+        try:
+            if self.mode == 'inline':
+                return fn(*args)
+            future = self._submit(fn, *args)
+            try:
+                return await asyncio.wait_for(asyncio.wrap_future(future), self.timeout)
+            except asyncio.TimeoutError:
+                self._bump('timeouts')
+                raise HashPoolBusy('Password hashing timed out')
+        finally:
+            self.latency.labels(operation).observe(time.perf_counter() - started)
+
+    def _submit(self, fn, *args):
+        if not self._slots.acquire(blocking=False):
+            self._bump('rejected')
+            raise HashPoolBusy('Password hashing pool is saturated')
+        try:
+            future = self._get_executor().submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        # cancel() cannot stop a job that is already running, so a timed out
+        # hash keeps its slot until the worker is actually done with it.
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def hash_job(self, password):
+        return Job(self, 'hash', _hash, password, self.method)
+
+    def check_job(self, pwhash, password):
+        return Job(self, 'check', _check, pwhash, password)
+
+    def hash_password(self, password):
+        return self.hash_job(password).run()
+
+    def check_password(self, pwhash, password):
+        return self.check_job(pwhash, password).run()
+
+    def needs_rehash(self, pwhash):
+        """True if `pwhash` was made with different parameters than `method`."""
+        if self._method_prefix is None:
+            # Werkzeug expands shorthand such as 'scrypt' to its full
+            # parameter list, so compare against a real hash once.
+            self._method_prefix = _hash('', self.method).split('$', 1)[0]
+        return pwhash.split('$', 1)[0] != self._method_prefix
+
+    def record_rehash(self):
+        self._bump('rehashed')
+
+    def _bump(self, name):
+        with self._lock:
+            self._counts[name] += 1
+
+    def stats(self):
+        return {
+            'mode': self.mode,
+            'method': self.method,
+            'workers': self.workers,
+            'max_pending': self.max_pending,
+            **self._counts,
+            'latency': {name: histogram.summary() for (name,), histogram in self.latency.children()},
+        }
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = HashPool(
+                    Config.PASSWORD_HASH_METHOD,
+                    mode=Config.HASH_POOL_MODE,
+                    workers=Config.HASH_POOL_WORKERS,
+                    max_pending=Config.HASH_POOL_MAX_PENDING,
+                    timeout=Config.HASH_TIMEOUT,
+                )
+    return _pool
+
+
+def hash_password(password):
+    return get_pool().hash_password(password)
+
+
+def check_password(pwhash, password):
+    return get_pool().check_password(pwhash, password)
+
+
+def hash_job(password):
+    return get_pool().hash_job(password)
+
+
+def check_job(pwhash, password):
+    return get_pool().check_job(pwhash, password)
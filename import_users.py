@@ -0,0 +1,327 @@
+"""
+Bulk import of student accounts and profiles from CSV or NDJSON.
+
+    python import_users.py cohort.csv
+    python import_users.py cohort.ndjson --workers 8 --batch 5000
+    python import_users.py cohort.csv --offline     # with the app stopped
+
+Each row needs first_name, last_name, email and password. The profile
+fields phone, university, course, year, gpa, skills and interests are
+optional; a profile is created when any of them is set. The file is read
+as a stream, passwords are hashed in parallel in a process pool, and
+every batch is written with executemany in a single transaction.
+
+By default the import is safe to run against the live database: every
+index stays in place, so logins and the admin pages keep their query
+plans while the rows go in. With --offline, for a maintenance window when
+nothing else uses the database, the non-unique indexes on users and
+profiles are dropped for the load and rebuilt once at the end, and the
+connection commits with synchronous=OFF. The unique indexes always stay,
+because they catch duplicate emails.
+
+Progress is checkpointed in import_jobs in the same transaction as each
+batch. Running the same command again after a crash resumes after the
+last committed batch. If an --offline run left the deferred indexes
+dropped, they are rebuilt before the load goes on (at the end with
+--offline, straight away without it). --restart starts the file over. Rows that cannot be
+imported are written to <file>.errors.ndjson with their row number and
+the reason, and the rest of the batch still goes in.
+"""
+import argparse
+import csv
+import functools
+import itertools
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from werkzeug.security import generate_password_hash
+
+import Config
+import dal
+import db
+import migrations
+
+
+REQUIRED = ('first_name', 'last_name', 'email', 'password')
+
+TABLES = ('users', 'profiles')
+
+LOAD_PRAGMAS = {
+    'cache_size': -256000,
+}
+
+OFFLINE_PRAGMAS = {
+    'synchronous': 'OFF',
+}
+
+JOB_SQL = "SELECT rows_done, imported, failed, deferred_indexes, finished_at FROM import_jobs WHERE source = ?"
+
+START_JOB_SQL = """
+    INSERT INTO import_jobs (source) VALUES (?)
+    ON CONFLICT(source) DO UPDATE SET
+        rows_done = 0, imported = 0, failed = 0, started_at = CURRENT_TIMESTAMP, finished_at = NULL
+"""
+
+CHECKPOINT_SQL = "UPDATE import_jobs SET rows_done = ?, imported = imported + ?, failed = failed + ? WHERE source = ?"
+
+DEFER_INDEXES_SQL = "UPDATE import_jobs SET deferred_indexes = ? WHERE source = ?"
+
+RESTORED_INDEXES_SQL = "UPDATE import_jobs SET deferred_indexes = NULL WHERE source = ?"
+
+FINISH_JOB_SQL = "UPDATE import_jobs SET finished_at = CURRENT_TIMESTAMP WHERE source = ?"
+
+SECONDARY_INDEXES_SQL = f"""
+    SELECT name, sql FROM sqlite_master
+    WHERE type = 'index' AND sql IS NOT NULL AND sql NOT LIKE 'CREATE UNIQUE%'
+    AND tbl_name IN ({', '.join('?' * len(TABLES))})
+"""
+
+EXISTING_EMAILS_SQL = "SELECT email FROM users WHERE email IN (SELECT value FROM json_each(?))"
+
+USER_IDS_SQL = "SELECT id, email FROM users WHERE email IN (SELECT value FROM json_each(?))"
+
+
+def read_rows(path, fmt):
+    """Yield (row number, dict or error message) for each record in the file."""
+    with open(path, newline='', encoding='utf-8-sig') as f:
+        if fmt == 'csv':
+            for number, row in enumerate(csv.DictReader(f), 1):
+                yield number, row
+            return
+        for number, line in enumerate(f, 1):
+            if not line.strip():
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError as e:
+                yield number, f'Invalid JSON: {e}'
+                continue
+            yield number, row if isinstance(row, dict) else 'Each line must be a JSON object'
+
+
+def validate(row):
+    """Return (user values, profile values or None) for a row; raises ValueError."""
+    if isinstance(row, str):
+        raise ValueError(row)
+    values = {}
+    for field in REQUIRED:
+        value = row.get(field)
+        if not isinstance(value, str) or not value.strip():
+            raise ValueError(f'{field} is required')
+        values[field] = value if field == 'password' else value.strip()
+    if '@' not in values['email']:
+        raise ValueError('email is not valid')
+
+    profile = {}
+    for field in dal.PROFILE_FIELDS:
+        value = row.get(field)
+        if value not in (None, ''):
+            profile[field] = value
+    try:
+        if 'year' in profile:
+            profile['year'] = int(profile['year'])
+        if 'gpa' in profile:
+            profile['gpa'] = float(profile['gpa'])
+    except (TypeError, ValueError):
+        raise ValueError('year and gpa must be numbers')
+    return values, profile or None
+
+
+class Importer:
+
+    def __init__(self, conn, source, errors, hasher, executor):
+        self.conn = conn
+        self.source = source
+        self.errors = errors
+        self.hasher = hasher
+        self.executor = executor
+
+    def fail(self, number, row, error):
+        email = row.get('email') if isinstance(row, dict) else None
+        self.errors.write(json.dumps({'row': number, 'email': email, 'error': error}) + '\n')
+
+    def drop_registered(self, items, failed, key=lambda item: item):
+        """Report and remove the items whose email already has an account."""
+        emails = json.dumps([key(item)[2]['email'] for item in items])
+        existing = {row[0] for row in self.conn.execute(EXISTING_EMAILS_SQL, (emails,))}
+        kept = []
+        for item in items:
+            number, row, values, _ = key(item)
+            if values['email'] in existing:
+                self.fail(number, row, 'Email already registered')
+                failed += 1
+            else:
+                kept.append(item)
+        return kept, failed
+
+    def run_batch(self, batch):
+        """Validate, hash and insert one batch; returns (imported, failed, last row number)."""
+        valid, failed = [], 0
+        seen = set()
+        for number, row in batch:
+            try:
+                values, profile = validate(row)
+            except ValueError as e:
+                self.fail(number, row, str(e))
+                failed += 1
+                continue
+            if values['email'] in seen:
+                self.fail(number, row, 'Duplicate email in file')
+                failed += 1
+                continue
+            seen.add(values['email'])
+            valid.append((number, row, values, profile))
+
+        rows, failed = self.drop_registered(valid, failed)
+
+        # The slow part: spread across every worker process.
+        hashes = list(self.executor.map(self.hasher, [item[2]['password'] for item in rows], chunksize=16))
+
+        last = batch[-1][0]
+        self.conn.execute("BEGIN IMMEDIATE")
+        try:
+            # Again under the write lock, for signups made while hashing.
+            hashed, failed = self.drop_registered(list(zip(rows, hashes)), failed, lambda pair: pair[0])
+            rows = [item for item, _ in hashed]
+            self.conn.executemany(dal.INSERT_USER_SQL, [
+                (v['first_name'], v['last_name'], v['email'], password_hash, 'student')
+                for (_, _, v, _), password_hash in hashed
+            ])
+            profiles = [item for item in rows if item[3]]
+            if profiles:
+                emails = json.dumps([item[2]['email'] for item in profiles])
+                user_ids = {email: user_id for user_id, email in self.conn.execute(USER_IDS_SQL, (emails,))}
+                self.conn.executemany(dal.INSERT_PROFILE_SQL, [
+                    (user_ids[v['email']], *(p.get(field) for field in dal.PROFILE_FIELDS))
+                    for _, _, v, p in profiles
+                ])
+                dal.sync_skill_tags(self.conn, [(user_ids[v['email']], p.get('skills')) for _, _, v, p in profiles])
+            self.conn.execute(CHECKPOINT_SQL, (last, len(rows), failed, self.source))
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+        self.errors.flush()
+        return len(rows), failed, last
+
+
+def batches(rows, size):
+    while True:
+        batch = list(itertools.islice(rows, size))
+        if not batch:
+            return
+        yield batch
+
+
+def defer_indexes(conn, source, deferred):
+    """Drop the secondary indexes, recording them in the job first."""
+    if deferred is not None:
+        return json.loads(deferred)
+    indexes = conn.execute(SECONDARY_INDEXES_SQL, TABLES).fetchall()
+    statements = [sql for _, sql in indexes]
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        conn.execute(DEFER_INDEXES_SQL, (json.dumps(statements), source))
+        for name, _ in indexes:
+            conn.execute(f"DROP INDEX IF EXISTS {name}")
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return statements
+
+
+def restore_indexes(conn, source, statements):
+    """Recreate the deferred indexes and clear them from the job."""
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        for sql in statements:
+            conn.execute(sql.replace('CREATE INDEX ', 'CREATE INDEX IF NOT EXISTS ', 1))
+        conn.execute(RESTORED_INDEXES_SQL, (source,))
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Import students and profiles from CSV or NDJSON.')
+    parser.add_argument('path')
+    parser.add_argument('--format', choices=('csv', 'ndjson'), help='defaults to the file extension')
+    parser.add_argument('--batch', type=int, default=5000, help='rows per transaction')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='hashing processes')
+    parser.add_argument('--errors', metavar='PATH', help='defaults to <path>.errors.ndjson')
+    parser.add_argument('--restart', action='store_true', help='ignore the checkpoint and start over')
+    parser.add_argument('--offline', action='store_true',
+                        help='the app is stopped: drop secondary indexes and skip fsync during the load')
+    args = parser.parse_args()
+
+    source = os.path.abspath(args.path)
+    fmt = args.format or ('csv' if source.lower().endswith('.csv') else 'ndjson')
+    errors_path = args.errors or source + '.errors.ndjson'
+
+    conn = db.get_pool().connect()
+    migrations.migrate(conn, verbose=False)
+    pragmas = {**LOAD_PRAGMAS, **OFFLINE_PRAGMAS} if args.offline else LOAD_PRAGMAS
+    for name, value in pragmas.items():
+        conn.execute(f"PRAGMA {name} = {value}")
+
+    job = conn.execute(JOB_SQL, (source,)).fetchone()
+    if job is None or args.restart:
+        conn.execute(START_JOB_SQL, (source,))
+        conn.commit()
+        job = conn.execute(JOB_SQL, (source,)).fetchone()
+    rows_done, imported, failed, deferred, finished_at = job
+    if finished_at:
+        print(f"✓ Already imported at {finished_at}: {imported} imported, {failed} failed (use --restart to run it again)")
+        return
+    if rows_done:
+        print(f"✓ Resuming after row {rows_done} ({imported} imported, {failed} failed so far)")
+
+    if args.offline:
+        statements = defer_indexes(conn, source, deferred)
+        print(f"✓ Deferred {len(statements)} indexes until the load finishes")
+    else:
+        statements = []
+        if deferred is not None:
+            restore_indexes(conn, source, json.loads(deferred))
+            print("✓ Rebuilt the indexes an interrupted --offline import left dropped")
+
+    hasher = functools.partial(generate_password_hash, method=Config.PASSWORD_HASH_METHOD)
+    started = time.perf_counter()
+    done = 0
+    try:
+        with open(errors_path, 'w' if not rows_done else 'a') as errors, \
+                ProcessPoolExecutor(max_workers=args.workers) as executor:
+            importer = Importer(conn, source, errors, hasher, executor)
+            rows = itertools.dropwhile(lambda item: item[0] <= rows_done, read_rows(source, fmt))
+            for batch in batches(rows, args.batch):
+                batch_imported, batch_failed, last = importer.run_batch(batch)
+                imported += batch_imported
+                failed += batch_failed
+                done += len(batch)
+                rate = done / (time.perf_counter() - started)
+                print(f"✓ Row {last}: {imported} imported, {failed} failed ({rate:.0f} rows/s)")
+    except Exception as e:
+        print(f"❌ Import stopped: {e}")
+        print("   Run the same command again to resume from the last checkpoint.")
+        sys.exit(1)
+
+    if args.offline:
+        restore_indexes(conn, source, statements)
+        print(f"✓ Rebuilt {len(statements)} indexes")
+    conn.execute(FINISH_JOB_SQL, (source,))
+    conn.commit()
+    conn.execute("PRAGMA optimize")
+    conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
+    conn.close()
+    print(f"✓ Done: {imported} imported, {failed} failed in {time.perf_counter() - started:.1f}s")
+    if failed:
+        print(f"   Errors: {errors_path}")
+
+
+if __name__ == '__main__':
+    main()
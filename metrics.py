@@ -0,0 +1,463 @@
+"""
+Low-overhead instrumentation exposed in the Prometheus text format.
+
+Request latency is recorded per route template, method and status. Every
+SQL statement is timed by the instrumented connection below, once for the
+execute and once per fetchone/fetchmany/fetchall call, which also count
+the rows fetched. Rows read by iterating a cursor are not counted, to
+keep the cost per statement rather than per row. The totals for a request
+are kept in a thread-local and folded into per-route histograms when its
+response is closed, so a streamed export counts the queries that ran
+while it was being sent.
+
+Each process keeps its own registry. With Config.METRICS_DIR set, every
+process writes its rendered samples to <dir>/<pid>-<start>.prom every
+Config.METRICS_FLUSH_INTERVAL seconds (and the one answering a scrape
+writes its own first), and render() adds up the samples of all files.
+Counters and histograms include the workers that have exited, so totals
+never go backwards when gunicorn recycles a worker; gauges only include
+live processes. A scrape folds the files of exited workers into a single
+exited.prom, so the directory holds one file per live process plus that
+one however often workers are recycled. The directory has to be emptied
+when the server starts (gunicorn.conf.py does).
+"""
+import bisect
+import fcntl
+import glob
+import os
+import sqlite3
+import threading
+import time
+
+from flask import request
+
+import Config
+
+
+# Upper bounds in seconds, Prometheus-style (each bucket counts values <= le).
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+class Histogram:
+    """Thread-safe fixed-bucket latency histogram."""
+
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            if value > self._max:
+                self._max = value
+
+    def snapshot(self):
+        """Return (cumulative bucket counts, count, sum, max)."""
+        with self._lock:
+            counts = list(self._counts)
+            total, maximum = self._sum, self._max
+        cumulative = []
+        running = 0
+        for count in counts:
+            running += count
+            cumulative.append(running)
+        return cumulative, running, total, maximum
+
+    def summary(self):
+        cumulative, count, total, maximum = self.snapshot()
+        return {
+            'count': count,
+            'avg_ms': round(total / count * 1000, 3) if count else 0.0,
+            'max_ms': round(maximum * 1000, 3),
+            'buckets': {
+                ('+Inf' if i == len(self.buckets) else str(self.buckets[i])): cumulative[i]
+                for i in range(len(cumulative))
+            },
+        }
+
+
+class HistogramFamily:
+    """Histograms that share a name and differ by label values."""
+
+    def __init__(self, name, help, labelnames=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = buckets
+        self._children = {}
+        self._lock = threading.Lock()
+
+    def labels(self, *values):
+        child = self._children.get(values)
+        if child is None:
+            with self._lock:
+                child = self._children.setdefault(values, Histogram(self.buckets))
+        return child
+
+    def children(self):
+        with self._lock:
+            return sorted(self._children.items())
+
+    def render(self):
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for values, histogram in self.children():
+            labels = _labels(self.labelnames, values)
+            cumulative, count, total, _ = histogram.snapshot()
+            for bound, running in zip(histogram.buckets + ('+Inf',), cumulative):
+                lines.append(f'{self.name}_bucket{{{labels}{"," if labels else ""}le="{bound}"}} {running}')
+            lines.append(f"{self.name}_sum{{{labels}}} {total}")
+            lines.append(f"{self.name}_count{{{labels}}} {count}")
+        return lines
+
+
+class CounterFamily:
+
+    def __init__(self, name, help, labelnames=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, values=(), amount=1):
+        with self._lock:
+            self._values[values] = self._values.get(values, 0) + amount
+
+    def render(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for label_values, value in values:
+            lines.append(f"{self.name}{{{_labels(self.labelnames, label_values)}}} {value}")
+        return lines
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(names, values):
+    return ','.join(f'{name}="{_escape(value)}"' for name, value in zip(names, values))
+
+
+def gauge(name, help, value, kind='gauge'):
+    """Render a single unlabelled sample, e.g. from a stats() dict."""
+    return [f"# HELP {name} {help}", f"# TYPE {name} {kind}", f"{name} {value}"]
+
+
+REQUEST_LATENCY = HistogramFamily(
+    'internlink_http_request_duration_seconds', 'Request latency by route and status.',
+    ('route', 'method', 'status'))
+REQUEST_DB_TIME = HistogramFamily(
+    'internlink_http_request_db_seconds', 'Time spent in SQLite per request.', ('route',))
+QUERY_LATENCY = HistogramFamily(
+    'internlink_db_query_duration_seconds', 'Latency of individual SQL statements by verb.',
+    ('verb',), buckets=(0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.5, 1.0))
+QUERIES = CounterFamily(
+    'internlink_db_queries_total', 'SQL statements executed per route.', ('route',))
+ROWS = CounterFamily(
+    'internlink_db_rows_returned_total', 'Rows fetched from SQLite per route.', ('route',))
+
+_collectors = []
+_local = threading.local()
+
+
+def register_collector(collect):
+    """`collect` is a callable returning a list of text-format lines."""
+    if collect not in _collectors:
+        _collectors.append(collect)
+
+
+def _verb(sql):
+    return sql.lstrip().split(None, 1)[0].upper() if sql.strip() else 'OTHER'
+
+
+def _record_query(sql, elapsed):
+    QUERY_LATENCY.labels(_verb(sql)).observe(elapsed)
+    state = getattr(_local, 'request', None)
+    if state is not None:
+        state[0] += elapsed
+        state[1] += 1
+
+
+def _record_rows(count, elapsed):
+    state = getattr(_local, 'request', None)
+    if state is not None:
+        state[0] += elapsed
+        state[2] += count
+
+
+class Cursor(sqlite3.Cursor):
+    """Cursor that times statements and fetches and counts rows returned."""
+
+    def execute(self, sql, parameters=()):
+        started = time.perf_counter()
+        try:
+            return super().execute(sql, parameters)
+        finally:
+            _record_query(sql, time.perf_counter() - started)
+
+    def executemany(self, sql, seq_of_parameters):
+        started = time.perf_counter()
+        try:
+            return super().executemany(sql, seq_of_parameters)
+        finally:
+            _record_query(sql, time.perf_counter() - started)
+
+    def executescript(self, script):
+        started = time.perf_counter()
+        try:
+            return super().executescript(script)
+        finally:
+            _record_query(script, time.perf_counter() - started)
+
+    def fetchone(self):
+        started = time.perf_counter()
+        row = super().fetchone()
+        _record_rows(row is not None, time.perf_counter() - started)
+        return row
+
+    def fetchmany(self, size=None):
+        started = time.perf_counter()
+        rows = super().fetchmany(self.arraysize if size is None else size)
+        _record_rows(len(rows), time.perf_counter() - started)
+        return rows
+
+    def fetchall(self):
+        started = time.perf_counter()
+        rows = super().fetchall()
+        _record_rows(len(rows), time.perf_counter() - started)
+        return rows
+
+
+class Connection(sqlite3.Connection):
+    """
+    sqlite3.Connection whose shortcut execute methods go through Cursor;
+    the built-in shortcuts bypass any Python-level cursor override.
+    """
+
+    def cursor(self, factory=Cursor):
+        return super().cursor(factory)
+
+    def execute(self, sql, parameters=()):
+        return self.cursor().execute(sql, parameters)
+
+    def executemany(self, sql, seq_of_parameters):
+        return self.cursor().executemany(sql, seq_of_parameters)
+
+    def executescript(self, script):
+        return self.cursor().executescript(script)
+
+
+def _start_request():
+    _local.request = [0.0, 0, 0]
+    _local.started = time.perf_counter()
+
+
+def _record_request(state, started, route, method, status):
+    REQUEST_LATENCY.labels(route, method, status).observe(time.perf_counter() - started)
+    REQUEST_DB_TIME.labels(route).observe(state[0])
+    if state[1]:
+        QUERIES.inc((route,), state[1])
+    if state[2]:
+        ROWS.inc((route,), state[2])
+
+
+def _finish_request(response):
+    state = getattr(_local, 'request', None)
+    if state is None:
+        return response
+    rule = request.url_rule
+    route = rule.rule if rule is not None else 'unmatched'
+    args = (state, _local.started, route, request.method, str(response.status_code))
+
+    def close():
+        # A streamed body runs its queries on this thread after
+        # after_request, so keep counting until the response is closed.
+        if getattr(_local, 'request', None) is state:
+            _local.request = None
+        _record_request(*args)
+
+    if response.is_streamed:
+        response.call_on_close(close)
+    else:
+        close()
+    return response
+
+
+def render_local():
+    """This process's samples in the text format."""
+    lines = []
+    for family in (REQUEST_LATENCY, REQUEST_DB_TIME, QUERY_LATENCY, QUERIES, ROWS):
+        lines.extend(family.render())
+    for collect in _collectors:
+        lines.extend(collect())
+    return '\n'.join(lines) + '\n'
+
+
+_snapshot_name = None
+_flusher_pid = None
+_flusher_lock = threading.Lock()
+
+
+def write_snapshot():
+    """Write this process's samples to Config.METRICS_DIR, replacing its last snapshot."""
+    global _snapshot_name
+    if not Config.METRICS_DIR:
+        return
+    if _snapshot_name is None or not _snapshot_name.startswith(f'{os.getpid()}-'):
+        _snapshot_name = f'{os.getpid()}-{time.time_ns()}.prom'
+    os.makedirs(Config.METRICS_DIR, exist_ok=True)
+    path = os.path.join(Config.METRICS_DIR, _snapshot_name)
+    with open(path + '.tmp', 'w') as f:
+        f.write(render_local())
+    os.replace(path + '.tmp', path)
+
+
+def _flush_forever():
+    while True:
+        time.sleep(Config.METRICS_FLUSH_INTERVAL)
+        try:
+            write_snapshot()
+        except Exception as e:
+            print(f"Metrics flush error: {e}")
+
+
+def ensure_flushing():
+    """Start this process's snapshot thread, once per forked worker."""
+    global _flusher_pid
+    if not Config.METRICS_DIR or _flusher_pid == os.getpid():
+        return
+    with _flusher_lock:
+        if _flusher_pid != os.getpid():
+            threading.Thread(target=_flush_forever, daemon=True).start()
+            _flusher_pid = os.getpid()
+
+
+def clear_snapshots():
+    """Delete every snapshot in Config.METRICS_DIR, e.g. when the server starts."""
+    if not Config.METRICS_DIR:
+        return
+    for pattern in ('*.prom', '*.prom.tmp'):
+        for path in glob.glob(os.path.join(Config.METRICS_DIR, pattern)):
+            os.remove(path)
+
+
+# Counters and histograms of every process that has exited, added up.
+EXITED_SNAPSHOT = 'exited.prom'
+
+
+def _pid(path):
+    """The process a snapshot file belongs to."""
+    return int(os.path.basename(path).split('-', 1)[0])
+
+
+def _alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def _parse(text):
+    """{family: (help, type, {sample: value})} for one snapshot."""
+    families = {}
+    family = None
+    for line in text.splitlines():
+        if line.startswith('# HELP '):
+            name, _, help = line[7:].partition(' ')
+            family = families.setdefault(name, [help, 'untyped', {}])
+        elif line.startswith('# TYPE '):
+            name, _, kind = line[7:].partition(' ')
+            family = families.setdefault(name, ['', kind, {}])
+            family[1] = kind
+        elif line and family is not None:
+            sample, _, value = line.rpartition(' ')
+            family[2][sample] = float(value)
+    return families
+
+
+def _number(value):
+    return int(value) if value.is_integer() else value
+
+
+def merge(texts):
+    """
+    Add up the samples of several snapshots, given as (text, alive)
+    pairs; gauges only count the live ones.
+    """
+    merged = {}
+    for text, alive in texts:
+        for name, (help, kind, samples) in _parse(text).items():
+            if kind == 'gauge' and not alive:
+                continue
+            family = merged.setdefault(name, [help, kind, {}])
+            for sample, value in samples.items():
+                family[2][sample] = family[2].get(sample, 0) + value
+    lines = []
+    for name, (help, kind, samples) in merged.items():
+        lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}"]
+        lines += [f"{sample} {_number(value)}" for sample, value in samples.items()]
+    return '\n'.join(lines) + '\n'
+
+
+def _read(path):
+    try:
+        with open(path) as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+
+def _fold_exited(snapshots):
+    """
+    Merge the (path, text) snapshots of exited processes into
+    EXITED_SNAPSHOT and delete them; returns (text, alive) pairs for merge().
+    """
+    live, exited, folded = [], [], ''
+    for path, text in snapshots:
+        if os.path.basename(path) == EXITED_SNAPSHOT:
+            folded = text
+        elif _alive(_pid(path)):
+            live.append((text, True))
+        else:
+            exited.append((path, text))
+    if exited:
+        folded = merge([(folded, False)] + [(text, False) for _, text in exited])
+        path = os.path.join(Config.METRICS_DIR, EXITED_SNAPSHOT)
+        with open(path + '.tmp', 'w') as f:
+            f.write(folded)
+        os.replace(path + '.tmp', path)
+        for path, _ in exited:
+            os.remove(path)
+    return live + [(folded, False)]
+
+
+def render():
+    """The text served at /metrics: this process, or every process sharing Config.METRICS_DIR."""
+    if not Config.METRICS_DIR:
+        return render_local()
+    write_snapshot()
+    # Scrapes take turns, so none reads a file that another is folding away.
+    with open(os.path.join(Config.METRICS_DIR, '.lock'), 'w') as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        snapshots = []
+        for path in glob.glob(os.path.join(Config.METRICS_DIR, '*.prom')):
+            text = _read(path)
+            if text is not None:
+                snapshots.append((path, text))
+        return merge(_fold_exited(snapshots))
+
+
+def init_app(app):
+    app.before_request(ensure_flushing)
+    app.before_request(_start_request)
+    app.after_request(_finish_request)
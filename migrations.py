@@ -0,0 +1,666 @@
+"""
+Schema migrations for InternLink.
+
+Every migration has a version number; the highest one applied is kept in
+PRAGMA user_version, so running migrate() again only applies what is new.
+A step is either a SQL string or a function that receives the connection.
+"""
+import re
+import sys
+
+import Config
+import dal
+import db
+import pagination
+import tags
+
+
+def _dedupe_applications(conn):
+    conn.execute("""
+        DELETE FROM applications
+        WHERE id NOT IN (
+            SELECT MIN(id) FROM applications
+            GROUP BY user_id, position, company
+        )
+    """)
+
+
+# Migration 11's tag rules, frozen here: later changes to dal.skill_tags()
+# apply to profiles saved from then on, not to this backfill.
+TAG_SEPARATORS_V11 = re.compile(r'[,;|\n\u2022]')
+
+
+def _skill_tags_v11(skills):
+    tags = {}
+    for part in TAG_SEPARATORS_V11.split(skills or ''):
+        name = ' '.join(part.split()).lower().strip('.-* ')
+        if name and len(name) <= 64:
+            tags[name] = None
+    return list(tags)[:50]
+
+
+def _backfill_skill_tags(conn):
+    profiles = conn.execute("SELECT id, skills FROM profiles WHERE skills IS NOT NULL")
+    while True:
+        batch = profiles.fetchmany(5000)
+        if not batch:
+            break
+        rows = [(profile_id, name) for profile_id, skills in batch for name in _skill_tags_v11(skills)]
+        conn.executemany("INSERT OR IGNORE INTO tags (name) VALUES (?)", sorted({(name,) for _, name in rows}))
+        conn.executemany(
+            "INSERT OR IGNORE INTO profile_tags (tag_id, profile_id) SELECT id, ? FROM tags WHERE name = ?",
+            rows
+        )
+
+
+def _retype_profiles(conn):
+    """
+    Rebuild profiles with year INTEGER and gpa REAL. Databases created
+    before migrations existed declared both TEXT, and migration 1's
+    CREATE TABLE IF NOT EXISTS left them that way. Indexes and triggers
+    are recreated from their saved definitions.
+    """
+    types = {row[1]: row[2] for row in conn.execute("PRAGMA table_info(profiles)")}
+    if types['year'] == 'INTEGER' and types['gpa'] == 'REAL':
+        return
+    saved = [row[0] for row in conn.execute(
+        "SELECT sql FROM sqlite_master WHERE tbl_name = 'profiles' AND type IN ('index', 'trigger') AND sql IS NOT NULL"
+    )]
+    conn.execute("""
+        CREATE TABLE profiles_new (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER UNIQUE NOT NULL,
+            phone TEXT,
+            university TEXT,
+            course TEXT,
+            year INTEGER,
+            gpa REAL,
+            skills TEXT,
+            interests TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            row_version INTEGER NOT NULL DEFAULT 0,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+    """)
+    # Values that are not numbers ('', 'third') become NULL rather than 0.
+    conn.execute("""
+        INSERT INTO profiles_new
+        SELECT id, user_id, phone, university, course,
+               CASE WHEN TRIM(year) GLOB '[0-9]*' THEN CAST(TRIM(year) AS INTEGER) END,
+               CASE WHEN TRIM(gpa) GLOB '[0-9]*' OR TRIM(gpa) GLOB '.[0-9]*' THEN CAST(TRIM(gpa) AS REAL) END,
+               skills, interests, created_at, updated_at, row_version
+        FROM profiles
+    """)
+    conn.execute("DROP TABLE profiles")
+    conn.execute("ALTER TABLE profiles_new RENAME TO profiles")
+    for sql in saved:
+        conn.execute(sql)
+
+
+def _change_log_triggers(table, columns):
+    """
+    Triggers that append to change_log on insert, delete and an update of
+    `columns` (so a password change on users is not logged).
+    """
+    return [
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_log_insert AFTER INSERT ON {table}
+        BEGIN
+            INSERT INTO change_log (entity, op, row_id) VALUES ('{table}', 'insert', NEW.id);
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_log_update AFTER UPDATE OF {columns} ON {table}
+        BEGIN
+            INSERT INTO change_log (entity, op, row_id) VALUES ('{table}', 'update', NEW.id);
+        END
+        """,
+        f"""
+        CREATE TRIGGER IF NOT EXISTS trg_{table}_log_delete AFTER DELETE ON {table}
+        BEGIN
+            INSERT INTO change_log (entity, op, row_id) VALUES ('{table}', 'delete', OLD.id);
+        END
+        """,
+    ]
+
+
+def _row_version_triggers(table, columns, also_set=''):
+    """
+    Triggers that give each inserted row, and each update of `columns`,
+    the next row_version. The inner UPDATE only touches row_version (and
+    `also_set`), so it does not fire these triggers again.
+    """
+    bump = f"""
+            UPDATE counters SET value = value + 1 WHERE name = 'row_version';
+            UPDATE {table}
+            SET {also_set}row_version = (SELECT value FROM counters WHERE name = 'row_version')
+            WHERE id = NEW.id;
+    """
+    return [
+        f"CREATE TRIGGER IF NOT EXISTS trg_{table}_version_insert AFTER INSERT ON {table} BEGIN {bump} END",
+        f"CREATE TRIGGER IF NOT EXISTS trg_{table}_version_update AFTER UPDATE OF {columns} ON {table} BEGIN {bump} END",
+    ]
+
+
+MIGRATIONS = [
+    (1, 'baseline schema', [
+        """
+        CREATE TABLE IF NOT EXISTS users (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            first_name TEXT NOT NULL,
+            last_name TEXT NOT NULL,
+            email TEXT UNIQUE NOT NULL,
+            password TEXT NOT NULL,
+            user_type TEXT NOT NULL DEFAULT 'student',
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS profiles (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER UNIQUE NOT NULL,
+            phone TEXT,
+            university TEXT,
+            course TEXT,
+            year INTEGER,
+            gpa REAL,
+            skills TEXT,
+            interests TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS applications (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            position TEXT NOT NULL,
+            company TEXT NOT NULL,
+            status TEXT DEFAULT 'Pending',
+            date_applied TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            FOREIGN KEY (user_id) REFERENCES users (id)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS reset_codes (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            email TEXT NOT NULL,
+            code TEXT NOT NULL,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            used INTEGER DEFAULT 0
+        )
+        """,
+    ]),
+    (2, 'indexes for hot queries', [
+        _dedupe_applications,
+        "CREATE UNIQUE INDEX IF NOT EXISTS ux_applications_user_position_company ON applications (user_id, position, company)",
+        "CREATE INDEX IF NOT EXISTS idx_applications_user_date ON applications (user_id, date_applied DESC)",
+        "CREATE INDEX IF NOT EXISTS idx_applications_date_applied ON applications (date_applied)",
+        "CREATE INDEX IF NOT EXISTS idx_users_created_at ON users (created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_profiles_created_at ON profiles (created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_reset_codes_lookup ON reset_codes (email, code, used, created_at)",
+    ]),
+    (3, 'counter rows for admin stats', [
+        """
+        CREATE TABLE IF NOT EXISTS counters (
+            name TEXT PRIMARY KEY,
+            value INTEGER NOT NULL DEFAULT 0
+        ) WITHOUT ROWID
+        """,
+        """
+        INSERT OR REPLACE INTO counters (name, value)
+        SELECT 'users', COUNT(*) FROM users
+        UNION ALL SELECT 'profiles', COUNT(*) FROM profiles
+        UNION ALL SELECT 'applications', COUNT(*) FROM applications
+        UNION ALL SELECT 'pending_applications', COUNT(*) FROM applications WHERE status = 'Pending'
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_users_count_insert AFTER INSERT ON users
+        BEGIN
+            UPDATE counters SET value = value + 1 WHERE name = 'users';
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_users_count_delete AFTER DELETE ON users
+        BEGIN
+            UPDATE counters SET value = value - 1 WHERE name = 'users';
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_profiles_count_insert AFTER INSERT ON profiles
+        BEGIN
+            UPDATE counters SET value = value + 1 WHERE name = 'profiles';
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_profiles_count_delete AFTER DELETE ON profiles
+        BEGIN
+            UPDATE counters SET value = value - 1 WHERE name = 'profiles';
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_applications_count_insert AFTER INSERT ON applications
+        BEGIN
+            UPDATE counters SET value = value + 1 WHERE name = 'applications';
+            UPDATE counters SET value = value + 1
+            WHERE name = 'pending_applications' AND NEW.status = 'Pending';
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_applications_count_delete AFTER DELETE ON applications
+        BEGIN
+            UPDATE counters SET value = value - 1 WHERE name = 'applications';
+            UPDATE counters SET value = value - 1
+            WHERE name = 'pending_applications' AND OLD.status = 'Pending';
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_applications_count_status AFTER UPDATE OF status ON applications
+        WHEN (OLD.status IS 'Pending') != (NEW.status IS 'Pending')
+        BEGIN
+            UPDATE counters SET value = value + (CASE WHEN NEW.status IS 'Pending' THEN 1 ELSE -1 END)
+            WHERE name = 'pending_applications';
+        END
+        """,
+    ]),
+    (4, 'shared throttle buckets', [
+        """
+        CREATE TABLE IF NOT EXISTS throttle_buckets (
+            key TEXT PRIMARY KEY,
+            tokens REAL NOT NULL,
+            updated_at REAL NOT NULL
+        ) WITHOUT ROWID
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_throttle_buckets_updated_at ON throttle_buckets (updated_at)",
+    ]),
+    (5, 'internship catalog with full-text search', [
+        """
+        CREATE TABLE IF NOT EXISTS internships (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            title TEXT NOT NULL,
+            position TEXT NOT NULL,
+            company TEXT NOT NULL,
+            location TEXT,
+            duration TEXT,
+            requirements TEXT,
+            description TEXT,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_internships_company ON internships (company)",
+        "CREATE INDEX IF NOT EXISTS idx_internships_location ON internships (location)",
+        "CREATE INDEX IF NOT EXISTS idx_internships_duration ON internships (duration)",
+        """
+        CREATE VIRTUAL TABLE IF NOT EXISTS internships_fts USING fts5 (
+            title, company, description, location,
+            content = 'internships', content_rowid = 'id',
+            tokenize = 'unicode61 remove_diacritics 2'
+        )
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_internships_fts_insert AFTER INSERT ON internships
+        BEGIN
+            INSERT INTO internships_fts (rowid, title, company, description, location)
+            VALUES (NEW.id, NEW.title, NEW.company, NEW.description, NEW.location);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_internships_fts_delete AFTER DELETE ON internships
+        BEGIN
+            INSERT INTO internships_fts (internships_fts, rowid, title, company, description, location)
+            VALUES ('delete', OLD.id, OLD.title, OLD.company, OLD.description, OLD.location);
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_internships_fts_update AFTER UPDATE ON internships
+        BEGIN
+            INSERT INTO internships_fts (internships_fts, rowid, title, company, description, location)
+            VALUES ('delete', OLD.id, OLD.title, OLD.company, OLD.description, OLD.location);
+            INSERT INTO internships_fts (rowid, title, company, description, location)
+            VALUES (NEW.id, NEW.title, NEW.company, NEW.description, NEW.location);
+        END
+        """,
+        # The four listings that used to be hard-coded in index.html.
+        """
+        INSERT INTO internships (title, position, company, location, duration, requirements, description)
+        SELECT * FROM (VALUES
+            ('Software Developer Intern', 'Software Developer', 'TechNova Solutions', 'Nairobi', '3 months',
+             'Programming skills, Team player',
+             'Build and test features for our web and mobile products alongside the engineering team. Requires programming skills and being a team player.'),
+            ('Data Analyst Intern', 'Data Analyst', 'DataBridge', 'Mombasa', '4 months',
+             'Excel, SQL, Analytical thinking',
+             'Clean, query and visualise business data to support decision making. Requires Excel, SQL and analytical thinking.'),
+            ('Marketing Intern', 'Marketing', 'BrandWave Agency', 'Nairobi', '3 months',
+             'Social Media, Content Creation',
+             'Plan campaigns and create content for client brands. Requires social media and content creation skills.'),
+            ('Finance Intern', 'Finance', 'Capital Advisors', 'Kisumu', '6 months',
+             'Accounting, Financial Analysis',
+             'Support the advisory team with reporting and analysis. Requires accounting and financial analysis skills.')
+        )
+        WHERE NOT EXISTS (SELECT 1 FROM internships)
+        """,
+        "ALTER TABLE applications ADD COLUMN internship_id INTEGER REFERENCES internships (id)",
+        """
+        UPDATE applications SET internship_id = (
+            SELECT i.id FROM internships i
+            WHERE i.position = applications.position AND i.company = applications.company
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_applications_internship ON applications (internship_id)",
+    ]),
+    (6, 'one expiring reset code per email', [
+        """
+        CREATE TABLE reset_codes_new (
+            email TEXT PRIMARY KEY,
+            code TEXT NOT NULL,
+            expires_at REAL NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        ) WITHOUT ROWID
+        """,
+        # Carry over each email's newest unused code with the default
+        # 15 minute lifetime; older ones come out already expired.
+        """
+        INSERT INTO reset_codes_new (email, code, expires_at, created_at)
+        SELECT email, code, CAST(strftime('%s', created_at) AS REAL) + 900, created_at
+        FROM reset_codes r
+        WHERE used = 0 AND id = (
+            SELECT MAX(id) FROM reset_codes WHERE email = r.email AND used = 0
+        )
+        """,
+        "DROP TABLE reset_codes",
+        "ALTER TABLE reset_codes_new RENAME TO reset_codes",
+        "CREATE INDEX IF NOT EXISTS idx_reset_codes_expires_at ON reset_codes (expires_at)",
+    ]),
+    # AUTOINCREMENT so a sequence number is never reused after
+    # changes.prune() deletes the oldest entries.
+    (7, 'change log for the admin event feed', [
+        """
+        CREATE TABLE IF NOT EXISTS change_log (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            entity TEXT NOT NULL,
+            op TEXT NOT NULL,
+            row_id INTEGER NOT NULL,
+            changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        *_change_log_triggers('users', 'first_name, last_name, email, user_type'),
+        *_change_log_triggers('profiles', 'phone, university, course, year, gpa, skills, interests'),
+        *_change_log_triggers('applications', 'position, company, status, internship_id'),
+    ]),
+    # row_version comes from one counter shared by both tables, bumped by
+    # triggers, so ?since= cursors never go backwards. Existing rows get
+    # their id as a starting version.
+    (8, 'row versions for delta reads', [
+        "ALTER TABLE applications ADD COLUMN updated_at TIMESTAMP",
+        "ALTER TABLE applications ADD COLUMN row_version INTEGER NOT NULL DEFAULT 0",
+        "ALTER TABLE profiles ADD COLUMN row_version INTEGER NOT NULL DEFAULT 0",
+        "UPDATE applications SET updated_at = date_applied, row_version = id",
+        "UPDATE profiles SET row_version = id",
+        """
+        INSERT OR REPLACE INTO counters (name, value)
+        SELECT 'row_version', MAX(
+            (SELECT IFNULL(MAX(id), 0) FROM applications),
+            (SELECT IFNULL(MAX(id), 0) FROM profiles)
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_applications_user_version ON applications (user_id, row_version)",
+        *_row_version_triggers('applications', 'position, company, status, internship_id', 'updated_at = CURRENT_TIMESTAMP, '),
+        *_row_version_triggers('profiles', 'phone, university, course, year, gpa, skills, interests'),
+    ]),
+    (9, 'application status history', [
+        """
+        CREATE TABLE IF NOT EXISTS status_batches (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            to_status TEXT NOT NULL,
+            affected INTEGER NOT NULL DEFAULT 0,
+            changed_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS application_status_history (
+            batch_id INTEGER NOT NULL,
+            application_id INTEGER NOT NULL,
+            from_status TEXT,
+            PRIMARY KEY (batch_id, application_id)
+        ) WITHOUT ROWID
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_status_history_application ON application_status_history (application_id)",
+        # Selectors for the bulk status endpoint.
+        "CREATE INDEX IF NOT EXISTS idx_applications_company_position ON applications (company, position)",
+        "CREATE INDEX IF NOT EXISTS idx_applications_status ON applications (status)",
+    ]),
+    # Checkpoints for import_users.py, committed with each batch.
+    (10, 'bulk import checkpoints', [
+        """
+        CREATE TABLE IF NOT EXISTS import_jobs (
+            source TEXT PRIMARY KEY,
+            rows_done INTEGER NOT NULL DEFAULT 0,
+            imported INTEGER NOT NULL DEFAULT 0,
+            failed INTEGER NOT NULL DEFAULT 0,
+            deferred_indexes TEXT,
+            started_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+            finished_at TIMESTAMP
+        ) WITHOUT ROWID
+        """,
+    ]),
+    # Skill tags for tags.py. `profiles` counts each tag's posting list so
+    # a query can start from the shortest one.
+    (11, 'skill tags', [
+        """
+        CREATE TABLE IF NOT EXISTS tags (
+            id INTEGER PRIMARY KEY,
+            name TEXT NOT NULL UNIQUE,
+            profiles INTEGER NOT NULL DEFAULT 0
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS profile_tags (
+            tag_id INTEGER NOT NULL,
+            profile_id INTEGER NOT NULL,
+            PRIMARY KEY (tag_id, profile_id)
+        ) WITHOUT ROWID
+        """,
+        "CREATE INDEX IF NOT EXISTS idx_profile_tags_profile ON profile_tags (profile_id)",
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_profile_tags_count_insert AFTER INSERT ON profile_tags
+        BEGIN
+            UPDATE tags SET profiles = profiles + 1 WHERE id = NEW.tag_id;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_profile_tags_count_delete AFTER DELETE ON profile_tags
+        BEGIN
+            UPDATE tags SET profiles = profiles - 1 WHERE id = OLD.tag_id;
+        END
+        """,
+        """
+        CREATE TRIGGER IF NOT EXISTS trg_profiles_tags_delete AFTER DELETE ON profiles
+        BEGIN
+            DELETE FROM profile_tags WHERE profile_id = OLD.id;
+        END
+        """,
+        _backfill_skill_tags,
+    ]),
+    # Filters, prefix searches and sorts for roster.py. The NOCASE indexes
+    # serve both `LIKE 'prefix%'` and the case-insensitive sorts.
+    (12, 'admin search indexes', [
+        "CREATE INDEX IF NOT EXISTS idx_users_email_nocase ON users (email COLLATE NOCASE)",
+        "CREATE INDEX IF NOT EXISTS idx_users_first_name_nocase ON users (first_name COLLATE NOCASE)",
+        "CREATE INDEX IF NOT EXISTS idx_users_last_name_nocase ON users (last_name COLLATE NOCASE)",
+        "CREATE INDEX IF NOT EXISTS idx_users_type_created_at ON users (user_type, created_at)",
+        "CREATE INDEX IF NOT EXISTS idx_profiles_university_course_year ON profiles (university COLLATE NOCASE, course COLLATE NOCASE, year)",
+        "CREATE INDEX IF NOT EXISTS idx_profiles_course_year ON profiles (course COLLATE NOCASE, year)",
+        "CREATE INDEX IF NOT EXISTS idx_profiles_year ON profiles (year)",
+        "CREATE INDEX IF NOT EXISTS idx_profiles_gpa ON profiles (gpa)",
+    ]),
+    (13, 'numeric profile year and gpa', [
+        _retype_profiles,
+    ]),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(conn):
+    return conn.execute("PRAGMA user_version").fetchone()[0]
+
+
+def create_archive_schema(conn):
+    """Create archive.applications and its indexes if the archive is attached."""
+    if not any(row[1] == 'archive' for row in conn.execute("PRAGMA database_list")):
+        return
+    for sql in dal.ARCHIVE_SCHEMA:
+        conn.execute(sql)
+    conn.commit()
+
+
+def migrate(conn, verbose=True):
+    """
+    Apply every migration newer than the database's user_version, then
+    create the archive table if it is missing.
+    """
+    version = current_version(conn)
+    if conn.execute("SELECT COUNT(*) FROM main.sqlite_master").fetchone()[0] == 0:
+        # Lets archive.py hand freed pages back to the filesystem. A WAL
+        # file only switches on VACUUM, which is instant while it has no
+        # tables. An existing database switches with
+        # `python archive.py --enable-incremental-vacuum`, a full rebuild
+        # to run while the app is stopped.
+        conn.execute("PRAGMA main.auto_vacuum = INCREMENTAL")
+        conn.execute("VACUUM main")
+    for number, description, steps in MIGRATIONS:
+        if number <= version:
+            continue
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+            conn.execute(f"PRAGMA user_version = {number}")
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        version = number
+        if verbose:
+            print(f"✓ Migrated database to version {number}: {description}")
+    create_archive_schema(conn)
+    return version
+
+
+# The SQL each route runs, with sample parameters, for check_query_plans().
+HOT_QUERIES = {
+    'signup': (dal.EMAIL_EXISTS_SQL, ('a@example.com',)),
+    'login': (dal.LOGIN_SQL, ('a@example.com',)),
+    'verify_reset_code': (
+        "SELECT code, attempts FROM reset_codes WHERE email = ? AND expires_at > ?",
+        ('a@example.com', 0)
+    ),
+    'purge_reset_codes': ("""
+        DELETE FROM reset_codes WHERE email IN (
+            SELECT email FROM reset_codes WHERE expires_at <= ? LIMIT ?
+        )
+    """, (0, 500)),
+    'reset_password': (dal.UPDATE_PASSWORD_BY_EMAIL_SQL, ('x', 'a@example.com')),
+    'get_profile': (dal.PROFILE_JSON_SQL, (1,)),
+    'save_profile': (dal.UPDATE_PROFILE_SQL, (None,) * 8 + (1,)),
+    'get_applications': (dal.APPLICATIONS_JSON_SQL, (1,)),
+    'get_internship': (dal.INTERNSHIP_JSON_SQL, (1,)),
+    'apply_internship': (dal.APPLICATION_JSON_SQL, (1,)),
+    'apply_internships_batch': (dal.APPLICATIONS_BY_PAIRS_SQL, (1, '[]')),
+    'get_all_users': (
+        dal.ADMIN_USERS_JSON_SQL + " WHERE (created_at, id) < (?, ?) ORDER BY created_at DESC, id DESC LIMIT ?",
+        ('2100-01-01', 0, 101)
+    ),
+    'get_all_profiles': (
+        dal.ADMIN_PROFILES_JSON_SQL + " WHERE (p.created_at, p.id) < (?, ?) ORDER BY p.created_at DESC, p.id DESC LIMIT ?",
+        ('2100-01-01', 0, 101)
+    ),
+    'get_all_applications': (
+        dal.ADMIN_APPLICATIONS_JSON_SQL + " WHERE (a.date_applied, a.id) < (?, ?) ORDER BY a.date_applied DESC, a.id DESC LIMIT ?",
+        ('2100-01-01', 0, 101)
+    ),
+    'get_applications_since': (dal.APPLICATIONS_SINCE_SQL, (1, 0)),
+    'get_profile_since': (dal.PROFILE_SINCE_SQL, (1,)),
+    'update_statuses_by_ids': (
+        dal.STATUS_HISTORY_SQL.format(where=dal.STATUS_SELECTORS['ids']), (1, '[1]', 'Approved', 10)
+    ),
+    'update_statuses_by_company': (
+        dal.STATUS_HISTORY_SQL.format(where=dal.STATUS_SELECTORS['company']), (1, 'Acme', 'Approved', 10)
+    ),
+    'apply_status_batch': (dal.APPLY_STATUS_BATCH_SQL, ('Approved', 1)),
+    'admin_events': (dal.CHANGES_SQL, (0, 500)),
+    'admin_events_rows': (dal.CHANGED_ROWS_SQL['applications'], ('[1]',)),
+    'archive_batch': (dal.ARCHIVE_IDS_SQL, ('2000-01-01', 500)),
+    'save_profile_tags': (dal.INSERT_PROFILE_TAGS_SQL, (1, '["python"]')),
+    'save_profile_stale_tags': (dal.DELETE_STALE_PROFILE_TAGS_SQL, (1, '["python"]')),
+    'search_profiles_by_tags': (
+        "SELECT profile_id FROM profile_tags WHERE tag_id = ? AND profile_id < ?"
+        " INTERSECT SELECT profile_id FROM profile_tags WHERE tag_id = ? AND profile_id < ?"
+        " EXCEPT SELECT profile_id FROM profile_tags WHERE tag_id = ? AND profile_id < ?"
+        " ORDER BY profile_id DESC LIMIT ?",
+        (1, 1000, 2, 1000, 3, 1000, 101)
+    ),
+    'search_profiles_by_tags_rows': (tags.PROFILES_BY_ID_SQL, ('[1]',)),
+    'search_users_by_type': pagination.keyset_sql(
+        dal.ADMIN_USERS_SEARCH_SQL, ['created_at', 'id'], ['student'], limit=50, after=['2100-01-01', 0], where="user_type = ?"
+    ),
+    'search_users_by_last_name': pagination.keyset_sql(
+        dal.ADMIN_USERS_SEARCH_SQL, ['last_name COLLATE NOCASE', 'id'], ['ka%'], limit=50, after=['ka', 0],
+        where="last_name LIKE ? ESCAPE '\\'", descending=False
+    ),
+    'search_users_rows': (dal.ADMIN_USERS_SEARCH_JSON_SQL, ('[1]',)),
+    'count_profiles_by_university_course': (
+        "SELECT COUNT(*) FROM profiles p WHERE p.university = ? COLLATE NOCASE AND p.course = ? COLLATE NOCASE",
+        ('JKUAT', 'Law')
+    ),
+    'search_profiles_by_gpa': pagination.keyset_sql(
+        dal.ADMIN_PROFILES_SEARCH_SQL, ['p.gpa', 'p.id'], limit=50, after=[4.0, 0], where="p.gpa IS NOT NULL"
+    ),
+    'search_profiles_rows': (dal.ADMIN_PROFILES_SEARCH_JSON_SQL, ('[1]',)),
+}
+
+if Config.ARCHIVE_DATABASE:
+    HOT_QUERIES['apply_internship_archived'] = (dal.ARCHIVED_APPLICATION_EXISTS_SQL, (1, 'x', 'y'))
+    HOT_QUERIES['apply_internships_batch_archived'] = (dal.ARCHIVED_APPLICATIONS_BY_PAIRS_SQL, (1, '[]'))
+    HOT_QUERIES['get_applications_with_archive'] = (dal.APPLICATIONS_WITH_ARCHIVE_JSON_SQL, (1, 1))
+    HOT_QUERIES['get_all_applications_with_archive'] = (
+        dal.ARCHIVE_LISTINGS['applications'][1]
+        + " WHERE (date_applied, id) < (?, ?) ORDER BY date_applied DESC, id DESC LIMIT ?",
+        ('2100-01-01', 0, 101)
+    )
+
+_FULL_SCAN = re.compile(r'^SCAN \w+$')
+
+
+def check_query_plans(conn, queries=None):
+    """
+    Run EXPLAIN QUERY PLAN for each hot query and return a list of
+    (name, plan detail) pairs for every full table scan or temp sort.
+    """
+    problems = []
+    for name, (sql, params) in (queries or HOT_QUERIES).items():
+        for row in conn.execute("EXPLAIN QUERY PLAN " + sql, params):
+            detail = row[3]
+            if _FULL_SCAN.match(detail) or 'USE TEMP B-TREE' in detail:
+                problems.append((name, detail))
+    return problems
+
+
+if __name__ == '__main__':
+    problems = []
+    with db.get_pool().connection() as conn:
+        migrate(conn)
+        if '--check' in sys.argv:
+            problems = check_query_plans(conn)
+            for name, detail in problems:
+                print(f"❌ {name}: {detail}")
+            if not problems:
+                print(f"✓ All {len(HOT_QUERIES)} queries use an index")
+    if problems:
+        sys.exit(1)
@@ -0,0 +1,169 @@
+import base64
+import csv
+import io
+import json
+
+from flask import Response, stream_with_context
+
+
+DEFAULT_LIMIT = 100
+MAX_LIMIT = 1000
+STREAM_BATCH = 500
+
+
+def encode_cursor(values):
+    raw = json.dumps(list(values), separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    padded = token + '=' * (-len(token) % 4)
+    try:
+        values = json.loads(base64.urlsafe_b64decode(padded))
+    except Exception:
+        raise ValueError('Invalid cursor')
+    if not isinstance(values, list):
+        raise ValueError('Invalid cursor')
+    return values
+
+
+def page_args(args):
+    """Read ?limit= and ?cursor= from the query string."""
+    try:
+        limit = int(args.get('limit', DEFAULT_LIMIT))
+    except ValueError:
+        raise ValueError('limit must be a number')
+    limit = max(1, min(limit, MAX_LIMIT))
+    token = args.get('cursor')
+    return limit, decode_cursor(token) if token else None
+
+
+def _split_collation(column):
+    """'u.last_name COLLATE NOCASE' -> ('u.last_name', ' COLLATE NOCASE')."""
+    name, _, collation = column.partition(' ')
+    return name, f' {collation}' if collation else ''
+
+
+def keyset_sql(sql, sort_columns, params=(), limit=DEFAULT_LIMIT, after=None, where=None, descending=True):
+    """Add the keyset WHERE, ORDER BY and LIMIT to `sql`; returns (sql, params)."""
+    conditions = [where] if where else []
+    params = list(params)
+    if after is not None:
+        if len(after) != len(sort_columns):
+            raise ValueError('Invalid cursor')
+        # A collation goes on the placeholders: on the column side SQLite
+        # would no longer use the index for the range.
+        split = [_split_collation(column) for column in sort_columns]
+        names = ', '.join(name for name, _ in split)
+        placeholders = ', '.join(f'?{collation}' for _, collation in split)
+        conditions.append(f"({names}) {'<' if descending else '>'} ({placeholders})")
+        params.extend(after)
+    if conditions:
+        sql += ' WHERE ' + ' AND '.join(conditions)
+    sql = order_by(sql, sort_columns, descending) + ' LIMIT ?'
+    params.append(limit + 1)
+    return sql, params
+
+
+def _trim_page(rows, sort_columns, limit):
+    # One extra row was fetched to tell whether another page follows.
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        keys = [_split_collation(column)[0].split('.')[-1] for column in sort_columns]
+        next_cursor = encode_cursor(rows[-1][key] for key in keys)
+    return rows, next_cursor
+
+
+def json_page_body(rows, sort_columns, limit):
+    """The keyset_page_json() body for rows already fetched with keyset_sql()."""
+    rows, next_cursor = _trim_page(rows, sort_columns, limit)
+    items = ','.join(row[0] for row in rows)
+    return f'{{"items":[{items}],"next_cursor":{json.dumps(next_cursor)}}}'.encode()
+
+
+def keyset_page(conn, sql, sort_columns, params=(), limit=DEFAULT_LIMIT, after=None, where=None, descending=True):
+    """
+    Fetch one page of `sql` ordered by `sort_columns`, descending unless
+    `descending` is False.
+
+    `sql` is a SELECT without WHERE/ORDER BY; `where` is an optional extra
+    condition. The last column in `sort_columns` must be unique (the id) so
+    the cursor always points at exactly one row.
+    """
+    rows = conn.execute(*keyset_sql(sql, sort_columns, params, limit, after, where, descending)).fetchall()
+    rows, next_cursor = _trim_page(rows, sort_columns, limit)
+    return {'items': [dict(row) for row in rows], 'next_cursor': next_cursor}
+
+
+def keyset_page_json(conn, sql, sort_columns, params=(), limit=DEFAULT_LIMIT, after=None, where=None, descending=True):
+    """
+    keyset_page() for a query whose first column, `json`, is each item
+    already serialized by SQLite; returns the response body as bytes.
+    The sort columns must be selected too, for the cursor.
+    """
+    rows = conn.execute(*keyset_sql(sql, sort_columns, params, limit, after, where, descending)).fetchall()
+    return json_page_body(rows, sort_columns, limit)
+
+
+def ndjson_batch(columns, rows):
+    # A first column named `json` is already serialized by SQLite.
+    if columns[0] == 'json':
+        return ''.join(row[0] + '\n' for row in rows)
+    return ''.join(json.dumps(dict(zip(columns, row)), default=str) + '\n' for row in rows)
+
+
+def csv_batch(rows, columns=None):
+    """CSV text for `rows`, preceded by a header line when `columns` is given."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    if columns:
+        writer.writerow(columns)
+    writer.writerows(tuple(row) for row in rows)
+    return buffer.getvalue()
+
+
+def export_chunk(columns, rows, fmt, first):
+    """
+    One chunk of a CSV or NDJSON export; the first CSV chunk starts with
+    the header, even when there are no rows.
+    """
+    if fmt == 'csv':
+        return csv_batch(rows, columns if first else None)
+    return ndjson_batch(columns, rows) if rows else ''
+
+
+def export_type(fmt, filename):
+    """(mimetype, headers) of a CSV or NDJSON export."""
+    if fmt == 'csv':
+        return 'text/csv', {'Content-Disposition': f'attachment; filename={filename}.csv'}
+    return 'application/x-ndjson', {}
+
+
+def _export_chunks(cursor, fmt):
+    columns = [d[0] for d in cursor.description]
+    first = True
+    while True:
+        rows = cursor.fetchmany(STREAM_BATCH)
+        if rows or first:
+            chunk = export_chunk(columns, rows, fmt, first)
+            if chunk:
+                yield chunk
+        if not rows:
+            break
+        first = False
+
+
+def order_by(sql, sort_columns, descending=True):
+    """`sql` in the order keyset_page() uses."""
+    direction = 'DESC' if descending else 'ASC'
+    return sql + ' ORDER BY ' + ', '.join(f"{column} {direction}" for column in sort_columns)
+
+
+def stream_rows(cursor, fmt, filename):
+    """
+    Stream an executed cursor as NDJSON or CSV a batch at a time, so memory
+    stays flat however many rows the query returns.
+    """
+    mimetype, headers = export_type(fmt, filename)
+    return Response(stream_with_context(_export_chunks(cursor, fmt)), mimetype=mimetype, headers=headers)
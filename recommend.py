@@ -0,0 +1,279 @@
+"""
+Skill-match recommendations between student profiles and internships.
+
+Profiles (skills + interests) and internships (title, requirements,
+description) are tokenised into TF-IDF vectors held in a term-major sparse
+layout, i.e. one posting array per term. Scoring a query is a single
+gather over the query's postings plus one np.bincount, with no per-document
+Python loop; cosine similarity falls out because every row is L2-normalised.
+
+A saved profile goes into a small overlay that is scored the same way and
+masks the row's stale copy in the compiled arrays; the overlay is merged
+back once it grows past COMPACT_RATIO of the index. Each process also
+rebuilds from the database in the background every
+Config.RECOMMENDER_REFRESH seconds to pick up writes made by other workers.
+"""
+import re
+import threading
+import time
+
+import numpy as np
+
+import Config
+import db
+
+
+TOKEN_RE = re.compile(r"[a-z0-9][a-z0-9+#]*")
+
+STOPWORDS = frozenset("""
+    a an and are as at be by for from in into is it of on or our the to with
+    skills skill experience good strong basic knowledge interest interested
+    intern internship requires required requirements team work working
+""".split())
+
+COMPACT_RATIO = 0.05
+MIN_COMPACT = 256
+
+
+def tokenize(*texts):
+    terms = []
+    for text in texts:
+        if text:
+            terms.extend(t for t in TOKEN_RE.findall(str(text).lower()) if t not in STOPWORDS)
+    return terms
+
+
+class Vocabulary:
+
+    def __init__(self):
+        self._ids = {}
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._ids)
+
+    def encode(self, terms):
+        """Return (term ids, counts) for a bag of words, adding new terms."""
+        if not terms:
+            return np.empty(0, np.int32), np.empty(0, np.float32)
+        with self._lock:
+            ids = [self._ids.setdefault(term, len(self._ids)) for term in terms]
+        term_ids, counts = np.unique(np.asarray(ids, np.int32), return_counts=True)
+        return term_ids, counts.astype(np.float32)
+
+    def lookup(self, terms):
+        """Like encode() but ignores terms the vocabulary has never seen."""
+        ids = [self._ids[term] for term in terms if term in self._ids]
+        if not ids:
+            return np.empty(0, np.int32), np.empty(0, np.float32)
+        term_ids, counts = np.unique(np.asarray(ids, np.int32), return_counts=True)
+        return term_ids, counts.astype(np.float32)
+
+
+class SparseIndex:
+    """TF-IDF rows keyed by document id, scored against sparse queries."""
+
+    def __init__(self, vocabulary):
+        self.vocabulary = vocabulary
+        self._docs = {}
+        self._overlay = {}
+        self._overlay_arrays = None
+        self._lock = threading.Lock()
+        self._compile()
+
+    def __len__(self):
+        return len(self._docs)
+
+    def load(self, docs):
+        """Replace the whole index from an iterable of (doc_id, terms)."""
+        with self._lock:
+            self._docs = {doc_id: self.vocabulary.encode(terms) for doc_id, terms in docs}
+            self._overlay = {}
+            self._overlay_arrays = None
+            self._compile()
+
+    def upsert(self, doc_id, terms):
+        with self._lock:
+            self._docs[doc_id] = self.vocabulary.encode(terms)
+            if len(self._overlay) >= max(MIN_COMPACT, COMPACT_RATIO * len(self._docs)):
+                self._overlay = {}
+                self._compile()
+            else:
+                self._overlay[doc_id] = self.weigh(*self._docs[doc_id])
+            self._overlay_arrays = None
+
+    def raw(self, doc_id):
+        """The (term ids, term counts) of a stored document, or None."""
+        return self._docs.get(doc_id)
+
+    def _compile(self):
+        doc_ids = list(self._docs)
+        n = len(doc_ids)
+        lengths = np.fromiter((len(self._docs[d][0]) for d in doc_ids), np.int64, n)
+        if lengths.sum():
+            terms = np.concatenate([self._docs[d][0] for d in doc_ids])
+            tfs = np.concatenate([self._docs[d][1] for d in doc_ids])
+        else:
+            terms, tfs = np.empty(0, np.int32), np.empty(0, np.float32)
+        rows = np.repeat(np.arange(n, dtype=np.int32), lengths)
+
+        vocab_size = max(len(self.vocabulary), int(terms.max()) + 1 if len(terms) else 0)
+        term_counts = np.bincount(terms, minlength=vocab_size)
+        self._idf = (np.log((1 + n) / (1 + term_counts)) + 1).astype(np.float32)
+
+        weights = (1 + np.log(tfs)) * self._idf[terms]
+        norms = np.sqrt(np.bincount(rows, weights * weights, minlength=n))
+        weights = weights / np.where(norms[rows] > 0, norms[rows], 1)
+
+        order = np.argsort(terms, kind='stable')
+        self._rows = rows[order]
+        self._weights = weights[order].astype(np.float32)
+        self._term_ptr = np.zeros(vocab_size + 1, np.int64)
+        np.cumsum(term_counts, out=self._term_ptr[1:])
+        self._row_doc_ids = np.asarray(doc_ids, np.int64)
+        self._row_of = {doc_id: row for row, doc_id in enumerate(doc_ids)}
+
+    def weigh(self, term_ids, tfs):
+        """L2-normalised TF-IDF weights for a bag of terms under this index's idf."""
+        # Terms first seen after the last compile get the rarest-term idf.
+        idf = np.full(len(term_ids), np.log(1 + len(self._row_doc_ids)) + 1, np.float32)
+        known = term_ids < len(self._idf)
+        idf[known] = self._idf[term_ids[known]]
+        weights = (1 + np.log(tfs)) * idf
+        norm = np.sqrt(np.dot(weights, weights))
+        return term_ids, (weights / norm if norm else weights).astype(np.float32)
+
+    def _overlay_snapshot(self):
+        # Row-major arrays for the overlay, rebuilt after each upsert.
+        if self._overlay_arrays is None:
+            ids = list(self._overlay)
+            vectors = [self._overlay[d] for d in ids]
+            lengths = [len(v[0]) for v in vectors]
+            self._overlay_arrays = (
+                np.asarray([self._row_of[d] for d in ids if d in self._row_of], np.int64),
+                np.asarray(ids, np.int64),
+                np.repeat(np.arange(len(ids), dtype=np.int32), lengths),
+                np.concatenate([v[0] for v in vectors]) if ids else np.empty(0, np.int32),
+                np.concatenate([v[1] for v in vectors]) if ids else np.empty(0, np.float32),
+            )
+        return self._overlay_arrays
+
+    def top_k(self, query, k=10, exclude=()):
+        """Return [(doc_id, score)] for the k best matches to a weighed query."""
+        term_ids, query_weights = query
+        with self._lock:
+            rows, weights, term_ptr = self._rows, self._weights, self._term_ptr
+            row_doc_ids, row_of = self._row_doc_ids, self._row_of
+            stale_rows, overlay_ids, overlay_rows, overlay_terms, overlay_weights = self._overlay_snapshot()
+
+        # Gather the postings of every query term in one shot.
+        known = term_ids < len(term_ptr) - 1
+        starts, ends = term_ptr[term_ids[known]], term_ptr[term_ids[known] + 1]
+        lengths = ends - starts
+        total = int(lengths.sum())
+        if total:
+            positions = np.repeat(starts - np.cumsum(lengths) + lengths, lengths) + np.arange(total)
+            contributions = weights[positions] * np.repeat(query_weights[known], lengths)
+            scores = np.bincount(rows[positions], contributions, minlength=len(row_doc_ids))
+        else:
+            scores = np.zeros(len(row_doc_ids))
+
+        scores[stale_rows] = 0
+        excluded = [row_of[d] for d in exclude if d in row_of]
+        if excluded:
+            scores[excluded] = 0
+
+        candidate_ids = row_doc_ids
+        if len(overlay_ids):
+            dense_query = np.zeros(max(len(self.vocabulary), int(overlay_terms.max(initial=0)) + 1), np.float32)
+            dense_query[term_ids] = query_weights
+            overlay_scores = np.bincount(
+                overlay_rows, overlay_weights * dense_query[overlay_terms], minlength=len(overlay_ids)
+            )
+            overlay_scores[np.isin(overlay_ids, list(exclude))] = 0
+            scores = np.concatenate([scores, overlay_scores])
+            candidate_ids = np.concatenate([row_doc_ids, overlay_ids])
+
+        k = min(k, int(np.count_nonzero(scores > 0)))
+        if k <= 0:
+            return []
+        best = np.argpartition(-scores, k - 1)[:k]
+        best = best[np.argsort(-scores[best], kind='stable')]
+        return [(int(candidate_ids[i]), round(float(scores[i]), 4)) for i in best]
+
+
+def profile_terms(skills, interests):
+    return tokenize(skills, interests)
+
+
+def internship_terms(title, requirements, description):
+    return tokenize(title, requirements, description)
+
+
+class Recommender:
+
+    def __init__(self, refresh_seconds=300):
+        self.refresh_seconds = refresh_seconds
+        self.vocabulary = Vocabulary()
+        self.profiles = SparseIndex(self.vocabulary)
+        self.internships = SparseIndex(self.vocabulary)
+        self._loaded_at = None
+        self._refreshing = False
+        self._lock = threading.Lock()
+
+    def ensure_loaded(self, conn):
+        """
+        Build the indexes on first use. Later refreshes run in a background
+        thread while queries keep using the current arrays.
+        """
+        if self._loaded_at is None:
+            with self._lock:
+                if self._loaded_at is None:
+                    self._load(conn)
+        elif time.monotonic() - self._loaded_at >= self.refresh_seconds and not self._refreshing:
+            with self._lock:
+                if self._refreshing:
+                    return
+                self._refreshing = True
+            threading.Thread(target=self._refresh, daemon=True).start()
+
+    def _refresh(self):
+        try:
+            with db.get_pool().connection() as conn:
+                self._load(conn)
+        except Exception as e:
+            print(f"Recommendation refresh error: {e}")
+        finally:
+            self._refreshing = False
+
+    def _load(self, conn):
+        self.internships.load(
+            (row[0], internship_terms(row[1], row[2], row[3]))
+            for row in conn.execute("SELECT id, title, requirements, description FROM internships")
+        )
+        self.profiles.load(
+            (row[0], profile_terms(row[1], row[2]))
+            for row in conn.execute("SELECT user_id, skills, interests FROM profiles")
+        )
+        self._loaded_at = time.monotonic()
+
+    def update_profile(self, user_id, skills, interests):
+        if self._loaded_at is not None:
+            self.profiles.upsert(int(user_id), profile_terms(skills, interests))
+
+    def internships_for_student(self, conn, user_id, k=10):
+        self.ensure_loaded(conn)
+        profile = self.profiles.raw(user_id)
+        if profile is None:
+            return None
+        return self.internships.top_k(self.internships.weigh(*profile), k)
+
+    def students_for_internship(self, conn, internship_id, k=20):
+        self.ensure_loaded(conn)
+        internship = self.internships.raw(internship_id)
+        if internship is None:
+            return None
+        return self.profiles.top_k(self.profiles.weigh(*internship), k)
+
+
+recommender = Recommender(Config.RECOMMENDER_REFRESH)
@@ -0,0 +1,255 @@
+"""
+Password reset codes with a real expiry and an attempt limit.
+
+Each email has at most one live code, so every lookup is a single key
+lookup however many codes have ever been issued. Codes expire after
+Config.RESET_CODE_TTL seconds and are burned after
+Config.RESET_CODE_MAX_ATTEMPTS wrong guesses. redeem() spends a code in
+the same transaction as the write it authorizes.
+
+MemoryStore keeps codes in a dict and expires them with a hashed timer
+wheel; it suits a single process. SQLiteStore keeps them in the
+reset_codes table so every worker sees the same codes. A background
+thread purges expired codes in small batches.
+"""
+import hmac
+import random
+import string
+import threading
+import time
+
+import Config
+import db
+
+
+VALID = 'valid'
+INVALID = 'invalid'
+
+
+def generate_code():
+    return ''.join(random.SystemRandom().choices(string.digits, k=6))
+
+
+class MemoryStore:
+
+    def __init__(self, ttl, max_attempts, tick=1.0, slots=512):
+        self.ttl = ttl
+        self.max_attempts = max_attempts
+        self.tick = tick
+        self.slots = slots
+        self._codes = {}
+        self._wheel = [set() for _ in range(slots)]
+        self._last_tick = int(time.time() / tick)
+        self._lock = threading.Lock()
+
+    def issue(self, email, now=None):
+        now = now or time.time()
+        code = generate_code()
+        expires_at = now + self.ttl
+        with self._lock:
+            self._codes[email] = [code, expires_at, 0]
+            self._wheel[int(expires_at / self.tick) % self.slots].add(email)
+        return code
+
+    def _live(self, email, now):
+        entry = self._codes.get(email)
+        if entry and entry[1] <= now:
+            del self._codes[email]
+            return None
+        return entry
+
+    def _check(self, email, code, now):
+        entry = self._live(email, now)
+        if not entry:
+            return INVALID
+        if not hmac.compare_digest(entry[0], str(code)):
+            entry[2] += 1
+            if entry[2] >= self.max_attempts:
+                del self._codes[email]
+            return INVALID
+        return VALID
+
+    def check(self, email, code, now=None):
+        now = now or time.time()
+        with self._lock:
+            return self._check(email, code, now)
+
+    def redeem(self, email, code, write, now=None):
+        """
+        Consume a valid code and commit write(conn) with it; if write
+        raises, the code stays usable.
+        """
+        now = now or time.time()
+        with self._lock:
+            result = self._check(email, code, now)
+            if result == VALID:
+                conn = db.get_db()
+                try:
+                    write(conn)
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                del self._codes[email]
+            return result
+
+    def purge(self, batch_size, now=None):
+        """Advance the timer wheel to `now`, dropping codes that expired."""
+        now = now or time.time()
+        removed = 0
+        with self._lock:
+            current = int(now / self.tick)
+            for tick in range(self._last_tick, min(current, self._last_tick + self.slots) + 1):
+                bucket = self._wheel[tick % self.slots]
+                for email in list(bucket):
+                    entry = self._codes.get(email)
+                    if entry is None or entry[1] <= now:
+                        bucket.discard(email)
+                        if entry is not None:
+                            del self._codes[email]
+                            removed += 1
+                    elif int(entry[1] / self.tick) % self.slots != tick % self.slots:
+                        # Re-issued since; the new expiry lives in another slot.
+                        bucket.discard(email)
+            self._last_tick = current
+        return removed
+
+    def __len__(self):
+        return len(self._codes)
+
+
+class SQLiteStore:
+
+    def __init__(self, ttl, max_attempts):
+        self.ttl = ttl
+        self.max_attempts = max_attempts
+
+    def issue(self, email, now=None):
+        now = now or time.time()
+        code = generate_code()
+        conn = db.get_db()
+        conn.execute("""
+            INSERT INTO reset_codes (email, code, expires_at, attempts) VALUES (?, ?, ?, 0)
+            ON CONFLICT (email) DO UPDATE
+            SET code = excluded.code, expires_at = excluded.expires_at, attempts = 0,
+                created_at = CURRENT_TIMESTAMP
+        """, (email, code, now + self.ttl))
+        conn.commit()
+        return code
+
+    def check(self, email, code, now=None):
+        return self._run(email, code, None, now)
+
+    def redeem(self, email, code, write, now=None):
+        """
+        Consume a valid code and run write(conn) in the same transaction;
+        if write raises, the code stays usable.
+        """
+        return self._run(email, code, write, now)
+
+    def _run(self, email, code, write, now):
+        now = now or time.time()
+        conn = db.get_db()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute(
+                "SELECT code, attempts FROM reset_codes WHERE email = ? AND expires_at > ?",
+                (email, now)
+            ).fetchone()
+            if not row:
+                result = INVALID
+            elif not hmac.compare_digest(row['code'], str(code)):
+                result = INVALID
+                if row['attempts'] + 1 >= self.max_attempts:
+                    conn.execute("DELETE FROM reset_codes WHERE email = ?", (email,))
+                else:
+                    conn.execute("UPDATE reset_codes SET attempts = attempts + 1 WHERE email = ?", (email,))
+            else:
+                result = VALID
+                if write is not None:
+                    conn.execute("DELETE FROM reset_codes WHERE email = ?", (email,))
+                    write(conn)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return result
+
+    def purge(self, batch_size, now=None):
+        now = now or time.time()
+        with db.get_pool().connection() as conn:
+            cursor = conn.execute("""
+                DELETE FROM reset_codes WHERE email IN (
+                    SELECT email FROM reset_codes WHERE expires_at <= ? LIMIT ?
+                )
+            """, (now, batch_size))
+            conn.commit()
+            return cursor.rowcount
+
+
+class Purger:
+    """Daemon thread that purges expired codes a batch at a time."""
+
+    def __init__(self, store, interval, batch_size):
+        self.store = store
+        self.interval = interval
+        self.batch_size = batch_size
+        self.purged = 0
+        self._thread = None
+        self._lock = threading.Lock()
+
+    def ensure_started(self):
+        # Started on first use rather than at import so it runs in each
+        # forked worker, not only in the parent.
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._run, daemon=True)
+                    self._thread.start()
+
+    def run_once(self):
+        total = 0
+        while True:
+            removed = self.store.purge(self.batch_size)
+            total += removed
+            if removed < self.batch_size:
+                break
+            # Give writers a turn between batches.
+            time.sleep(0.01)
+        self.purged += total
+        return total
+
+    def _run(self):
+        while True:
+            time.sleep(self.interval)
+            try:
+                self.run_once()
+            except Exception as e:
+                print(f"Reset code purge error: {e}")
+
+
+_store = None
+_purger = None
+_store_lock = threading.Lock()
+
+
+def get_store():
+    global _store, _purger
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                if Config.RESET_CODE_STORE == 'memory':
+                    store = MemoryStore(Config.RESET_CODE_TTL, Config.RESET_CODE_MAX_ATTEMPTS)
+                else:
+                    store = SQLiteStore(Config.RESET_CODE_TTL, Config.RESET_CODE_MAX_ATTEMPTS)
+                _purger = Purger(store, Config.RESET_CODE_PURGE_INTERVAL, Config.RESET_CODE_PURGE_BATCH)
+                _store = store
+    _purger.ensure_started()
+    return _store
+
+
+def stats():
+    return {
+        'store': Config.RESET_CODE_STORE,
+        'purged': _purger.purged if _purger else 0,
+    }
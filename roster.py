@@ -0,0 +1,158 @@
+"""
+Server-side search for the admin users and profiles tables.
+
+Every filter becomes part of the WHERE clause and is served by an index
+from migration 12:
+
+    q           case-insensitive prefix of the email, first name or last
+                name; two or more words match first name + last name, so
+                "ali kam" finds Ali Kamau
+    user_type   users only
+    university, course, year
+                profiles only; text is compared case-insensitively
+
+?sort= names an indexed column, ascending, or descending with a leading
+"-" (the default is -created_at). Sorting profiles by gpa or year leaves
+out the profiles without one, because keyset paging cannot step past
+NULLs. Results are keyset pages in the /admin/<table> shape plus "total",
+a COUNT(*) over the same conditions that SQLite answers from a covering
+index; with no conditions it is read from the counters table.
+"""
+import json
+
+import dal
+import pagination
+import stats
+
+
+DEFAULT_SORT = '-created_at'
+
+# LIKE treats these as wildcards; a prefix search must match them literally.
+LIKE_ESCAPES = str.maketrans({'\\': '\\\\', '%': '\\%', '_': '\\_'})
+
+
+def _like(column):
+    return f"{column} LIKE ? ESCAPE '\\'"
+
+
+def name_condition(q):
+    """The users condition for ?q=, with its parameters; None for an empty q."""
+    words = (q or '').split()
+    if not words:
+        return None, []
+    prefixes = [word.translate(LIKE_ESCAPES) + '%' for word in words]
+    if len(words) > 1:
+        last = ' '.join(words[1:]).translate(LIKE_ESCAPES) + '%'
+        return f"{_like('first_name')} AND {_like('last_name')}", [prefixes[0], last]
+    if '@' in words[0]:
+        return _like('email'), prefixes
+    return f"({_like('email')} OR {_like('first_name')} OR {_like('last_name')})", prefixes * 3
+
+
+class Listing:
+    """How one admin table is searched: its page SQL, filters and sorts."""
+
+    def __init__(self, name, keys_sql, json_sql, table_sql, filters, sorts, user_column):
+        self.name = name
+        self.keys_sql = keys_sql
+        self.json_sql = json_sql
+        self.table_sql = table_sql
+        self.filters = filters
+        self.sorts = sorts
+        self.user_column = user_column
+
+    def conditions(self, args):
+        """(conditions, params) for the filters in `args`; raises ValueError."""
+        conditions, params = [], []
+        condition, q_params = name_condition(args.get('q'))
+        if condition:
+            if self.user_column == 'id':
+                conditions.append(condition)
+            else:
+                conditions.append(f"{self.user_column} IN (SELECT id FROM users WHERE {condition})")
+            params.extend(q_params)
+        for name, (sql, convert) in self.filters.items():
+            value = args.get(name)
+            if value in (None, ''):
+                continue
+            try:
+                params.append(convert(value))
+            except ValueError:
+                raise ValueError(f'{name} must be a number')
+            conditions.append(sql)
+        return conditions, params
+
+    def sort(self, value):
+        """(sort columns, descending, extra condition) for ?sort=."""
+        value = value or DEFAULT_SORT
+        descending = value.startswith('-')
+        key = value.lstrip('-')
+        if key not in self.sorts:
+            raise ValueError(f"sort must be one of {', '.join(sorted(self.sorts))}, optionally prefixed with -")
+        columns, condition = self.sorts[key]
+        return columns, descending, condition
+
+    def count(self, conn, conditions, params):
+        if not conditions:
+            return stats.read_counters(conn)[self.name]
+        sql = f"SELECT COUNT(*) FROM {self.table_sql} WHERE " + ' AND '.join(conditions)
+        return conn.execute(sql, params).fetchone()[0]
+
+    def search_json(self, conn, args):
+        """One page for the query string `args`, with "total"; raises ValueError."""
+        limit, after = pagination.page_args(args)
+        conditions, params = self.conditions(args)
+        sort_columns, descending, sort_condition = self.sort(args.get('sort'))
+        if sort_condition:
+            conditions.append(sort_condition)
+
+        where = ' AND '.join(conditions) or None
+        sql, page_params = pagination.keyset_sql(
+            self.keys_sql, sort_columns, params, limit=limit, after=after, where=where, descending=descending
+        )
+        ids = [row['id'] for row in conn.execute(sql, page_params)]
+        rows = []
+        if ids:
+            sql = pagination.order_by(self.json_sql, sort_columns, descending)
+            rows = conn.execute(sql, (json.dumps(ids),)).fetchall()
+        body = pagination.json_page_body(rows, sort_columns, limit)
+        return b'{"total":%d,%s' % (self.count(conn, conditions, params), body[1:])
+
+
+def _text(value):
+    return value.strip()
+
+
+LISTINGS = {
+    'users': Listing(
+        'users',
+        dal.ADMIN_USERS_SEARCH_SQL,
+        dal.ADMIN_USERS_SEARCH_JSON_SQL,
+        'users',
+        {'user_type': ("user_type = ?", _text)},
+        {
+            'created_at': (['created_at', 'id'], None),
+            'email': (['email COLLATE NOCASE', 'id'], None),
+            'first_name': (['first_name COLLATE NOCASE', 'id'], None),
+            'last_name': (['last_name COLLATE NOCASE', 'id'], None),
+        },
+        'id',
+    ),
+    'profiles': Listing(
+        'profiles',
+        dal.ADMIN_PROFILES_SEARCH_SQL,
+        dal.ADMIN_PROFILES_SEARCH_JSON_SQL,
+        'profiles p',
+        {
+            'university': ("p.university = ? COLLATE NOCASE", _text),
+            'course': ("p.course = ? COLLATE NOCASE", _text),
+            'year': ("p.year = ?", int),
+        },
+        {
+            'created_at': (['p.created_at', 'p.id'], None),
+            'gpa': (['p.gpa', 'p.id'], "p.gpa IS NOT NULL"),
+            'year': (['p.year', 'p.id'], "p.year IS NOT NULL"),
+        },
+        'p.user_id',
+    ),
+}
@@ -0,0 +1,349 @@
+const API_URL = window.location.origin;
+let allUsers = [];
+let allProfiles = [];
+let allApplications = [];
+const nextCursors = { users: null, profiles: null, applications: null };
+// Query strings for the search forms; while one is set, that table pages
+// through /admin/<type>/search, where the server filters and sorts.
+const filters = { users: '', profiles: '' };
+
+async function fetchPage(type) {
+    const params = new URLSearchParams(filters[type] || '');
+    if (nextCursors[type]) {
+        params.set('cursor', nextCursors[type]);
+    }
+    const path = filters[type] ? `/admin/${type}/search` : `/admin/${type}`;
+    const query = params.toString();
+    const response = await fetch(`${API_URL}${path}${query ? '?' + query : ''}`);
+    const page = await response.json();
+    nextCursors[type] = page.next_cursor;
+    const total = document.getElementById(`${type}-total`);
+    if (total) {
+        total.textContent = filters[type] ? `${page.total} found` : '';
+    }
+    return page.items;
+}
+
+async function applyFilters(event, type) {
+    event.preventDefault();
+    const params = new URLSearchParams();
+    for (const [name, value] of new FormData(event.target)) {
+        if (value.trim() && !(name === 'sort' && value === '-created_at')) {
+            params.set(name, value.trim());
+        }
+    }
+    filters[type] = params.toString();
+    nextCursors[type] = null;
+    try {
+        const items = await fetchPage(type);
+        if (type === 'users') {
+            allUsers = items;
+        } else {
+            allProfiles = items;
+        }
+        tables[type].display();
+    } catch (error) {
+        console.error('Error searching:', error);
+    }
+}
+
+async function loadData() {
+    try {
+        nextCursors.users = nextCursors.profiles = nextCursors.applications = null;
+        filters.users = filters.profiles = '';
+        document.querySelectorAll('.filters').forEach(form => form.reset());
+        [allUsers, allProfiles, allApplications] = await Promise.all([
+            fetchPage('users'),
+            fetchPage('profiles'),
+            fetchPage('applications')
+        ]);
+
+        updateStats();
+        displayUsers();
+        displayProfiles();
+        displayApplications();
+    } catch (error) {
+        console.error('Error loading data:', error);
+        document.getElementById('users-content').innerHTML = '<div class="error">Failed to load data. Please refresh the page.</div>';
+    }
+}
+
+async function loadMore(type) {
+    try {
+        const items = await fetchPage(type);
+        if (type === 'users') {
+            allUsers = allUsers.concat(items);
+            displayUsers();
+        } else if (type === 'profiles') {
+            allProfiles = allProfiles.concat(items);
+            displayProfiles();
+        } else {
+            allApplications = allApplications.concat(items);
+            displayApplications();
+        }
+    } catch (error) {
+        console.error('Error loading more rows:', error);
+    }
+}
+
+function loadMoreButton(type) {
+    return nextCursors[type]
+        ? `<button class="export-btn" style="margin-top: 1rem;" onclick="loadMore('${type}')">Load more</button>`
+        : '';
+}
+
+async function updateStats() {
+    try {
+        const response = await fetch(`${API_URL}/admin/stats`);
+        const stats = await response.json();
+        document.getElementById('total-users').textContent = stats.users;
+        document.getElementById('total-profiles').textContent = stats.profiles;
+        document.getElementById('total-applications').textContent = stats.applications;
+        document.getElementById('pending-applications').textContent = stats.pending_applications;
+    } catch (error) {
+        console.error('Error loading stats:', error);
+    }
+}
+
+function userRow(user) {
+    return `
+        <tr id="users-row-${user.id}">
+            <td>${user.id}</td>
+            <td>${user.first_name}</td>
+            <td>${user.last_name}</td>
+            <td>${user.email}</td>
+            <td>${user.user_type}</td>
+            <td>${new Date(user.created_at).toLocaleDateString()}</td>
+        </tr>
+    `;
+}
+
+function profileRow(profile) {
+    return `
+        <tr id="profiles-row-${profile.id}">
+            <td>${profile.user_id}</td>
+            <td>${profile.first_name ? profile.first_name + ' ' + profile.last_name : 'N/A'}</td>
+            <td>${profile.phone || 'N/A'}</td>
+            <td>${profile.university || 'N/A'}</td>
+            <td>${profile.course || 'N/A'}</td>
+            <td>Year ${profile.year || 'N/A'}</td>
+            <td>${profile.gpa || 'N/A'}</td>
+            <td>${profile.skills || 'N/A'}</td>
+        </tr>
+    `;
+}
+
+function applicationRow(app) {
+    return `
+        <tr id="applications-row-${app.id}">
+            <td>${app.id}</td>
+            <td>${app.first_name ? app.first_name + ' ' + app.last_name : 'Unknown'}</td>
+            <td>${app.position}</td>
+            <td>${app.company}</td>
+            <td>${new Date(app.date_applied).toLocaleDateString()}</td>
+            <td>
+                <span class="status-badge status-${app.status.toLowerCase()}">
+                    ${app.status}
+                </span>
+            </td>
+        </tr>
+    `;
+}
+
+function displayUsers() {
+    const content = document.getElementById('users-content');
+    
+    if (allUsers.length === 0) {
+        const message = filters.users ? 'No users match this search.' : 'No users registered yet.';
+        content.innerHTML = `<p style="text-align: center; color: #666; padding: 2rem;">${message}</p>`;
+        return;
+    }
+
+    content.innerHTML = `
+        <table>
+            <thead>
+                <tr>
+                    <th>ID</th>
+                    <th>First Name</th>
+                    <th>Last Name</th>
+                    <th>Email</th>
+                    <th>User Type</th>
+                    <th>Registered On</th>
+                </tr>
+            </thead>
+            <tbody id="users-rows">
+                ${allUsers.map(userRow).join('')}
+            </tbody>
+        </table>
+        ${loadMoreButton('users')}
+    `;
+}
+
+function displayProfiles() {
+    const content = document.getElementById('profiles-content');
+    
+    if (allProfiles.length === 0) {
+        const message = filters.profiles ? 'No profiles match this search.' : 'No profiles completed yet.';
+        content.innerHTML = `<p style="text-align: center; color: #666; padding: 2rem;">${message}</p>`;
+        return;
+    }
+
+    content.innerHTML = `
+        <table>
+            <thead>
+                <tr>
+                    <th>User ID</th>
+                    <th>Name</th>
+                    <th>Phone</th>
+                    <th>University</th>
+                    <th>Course</th>
+                    <th>Year</th>
+                    <th>GPA</th>
+                    <th>Skills</th>
+                </tr>
+            </thead>
+            <tbody id="profiles-rows">
+                ${allProfiles.map(profileRow).join('')}
+            </tbody>
+        </table>
+        ${loadMoreButton('profiles')}
+    `;
+}
+
+function displayApplications() {
+    const content = document.getElementById('applications-content');
+    
+    if (allApplications.length === 0) {
+        content.innerHTML = '<p style="text-align: center; color: #666; padding: 2rem;">No applications submitted yet.</p>';
+        return;
+    }
+
+    content.innerHTML = `
+        <table>
+            <thead>
+                <tr>
+                    <th>ID</th>
+                    <th>Applicant</th>
+                    <th>Position</th>
+                    <th>Company</th>
+                    <th>Date Applied</th>
+                    <th>Status</th>
+                </tr>
+            </thead>
+            <tbody id="applications-rows">
+                ${allApplications.map(applicationRow).join('')}
+            </tbody>
+        </table>
+        ${loadMoreButton('applications')}
+    `;
+}
+
+const tables = {
+    users: { rows: () => allUsers, render: userRow, display: displayUsers },
+    profiles: { rows: () => allProfiles, render: profileRow, display: displayProfiles },
+    applications: { rows: () => allApplications, render: applicationRow, display: displayApplications }
+};
+
+// Apply one change from /admin/events to the loaded rows and the DOM,
+// touching only the affected <tr>. New rows go on top, matching the
+// newest-first order of the pages.
+function applyChange(type, op, row) {
+    const table = tables[type];
+    if (!row) {
+        return;
+    }
+    const rows = table.rows();
+    const index = rows.findIndex(item => item.id === row.id);
+    const element = document.getElementById(`${type}-row-${row.id}`);
+
+    if (op === 'delete') {
+        if (index !== -1) {
+            rows.splice(index, 1);
+        }
+        if (element) {
+            element.remove();
+        }
+        return;
+    }
+
+    if (index !== -1) {
+        rows[index] = row;
+    } else if (filters[type]) {
+        // A new row may not match the search, so leave it out.
+        return;
+    } else {
+        rows.unshift(row);
+    }
+
+    const body = document.getElementById(`${type}-rows`);
+    if (element) {
+        element.outerHTML = table.render(row);
+    } else if (body) {
+        body.insertAdjacentHTML('afterbegin', table.render(row));
+    } else {
+        table.display();
+    }
+}
+
+let statsTimer = null;
+
+function scheduleStatsUpdate() {
+    // One /admin/stats call per burst of events.
+    if (!statsTimer) {
+        statsTimer = setTimeout(() => {
+            statsTimer = null;
+            updateStats();
+        }, 1000);
+    }
+}
+
+// Id of the last change applied, for reopening a feed the server refused.
+let lastEventId = null;
+
+const FEED_RETRY_MS = 5000;
+
+function listenForChanges() {
+    // EventSource reconnects by itself and sends Last-Event-ID, so the
+    // feed resumes where it left off.
+    const resume = lastEventId ? `?last_event_id=${encodeURIComponent(lastEventId)}` : '';
+    const events = new EventSource(`${API_URL}/admin/events${resume}`);
+    Object.keys(tables).forEach(type => {
+        events.addEventListener(type, event => {
+            lastEventId = event.lastEventId;
+            const change = JSON.parse(event.data);
+            applyChange(type, change.op, change.row);
+            scheduleStatsUpdate();
+        });
+    });
+    // The changes since Last-Event-ID are gone from the log.
+    events.addEventListener('reset', event => {
+        lastEventId = event.lastEventId;
+        loadData();
+    });
+    // It gives up for good when the server refuses the stream (503 when
+    // every feed slot is taken), so open a new one a little later.
+    events.addEventListener('error', () => {
+        if (events.readyState === EventSource.CLOSED) {
+            setTimeout(listenForChanges, FEED_RETRY_MS);
+        }
+    });
+}
+
+function showTab(tabName) {
+    document.querySelectorAll('.tab').forEach(tab => tab.classList.remove('active'));
+    document.querySelectorAll('.section').forEach(section => section.classList.remove('active'));
+    
+    event.target.classList.add('active');
+    document.getElementById(`${tabName}-section`).classList.add('active');
+}
+
+function exportToCSV(type) {
+    // The server streams the whole table, so the export is never
+    // limited to the pages loaded so far.
+    window.location.href = `${API_URL}/admin/${type}?format=csv`;
+}
+
+// Subscribe first so nothing committed while the pages load is missed;
+// applying a change twice is harmless.
+listenForChanges();
+loadData();
@@ -1,6 +1,10 @@
 let currentUser = null;
 let userProfile = null;
 let userApplications = [];
+// Row-version cursors for the ?since= delta reads; 0 fetches everything.
+let profileCursor = 0;
+let applicationsCursor = 0;
+let internships = [];
 let resetStep = 1; 
 let resetEmail = '';
 let resetCode = '';
@@ -13,6 +17,16 @@ document.addEventListener('DOMContentLoaded', function() {
     checkLoginStatus();
 });
 
+// Text from the server goes into innerHTML templates only through this.
+function escapeHtml(value) {
+    return String(value ?? '')
+        .replace(/&/g, '&amp;')
+        .replace(/</g, '&lt;')
+        .replace(/>/g, '&gt;')
+        .replace(/"/g, '&quot;')
+        .replace(/'/g, '&#39;');
+}
+
 // Mobile Menu Toggle Function - Updated to work properly
 function setupMobileMenu() {
     const hamburger = document.querySelector('.hamburger');
@@ -332,6 +346,8 @@ function logout() {
     currentUser = null;
     userProfile = null;
     userApplications = [];
+    profileCursor = 0;
+    applicationsCursor = 0;
     sessionStorage.removeItem('currentUser');
     showLoginForm();
     document.getElementById('login-form').reset();
@@ -377,6 +393,9 @@ function showSection(sectionName) {
         displayProfile();
     } else if (sectionName === 'applications') {
         displayApplications();
+        syncApplications().then(displayApplications);
+    } else if (sectionName === 'internships' && internships.length === 0) {
+        searchInternships();
     }
 }
 
@@ -384,34 +403,57 @@ async function loadUserData() {
     if (!currentUser) return;
     
     try {
-        const profileResponse = await fetch(`${API_URL}/api/profile/${currentUser.id}`);
-        if (profileResponse.ok) {
-            userProfile = await profileResponse.json();
-            
-            if (userProfile) {
-                document.getElementById('firstName').value = currentUser.first_name;
-                document.getElementById('lastName').value = currentUser.last_name;
-                document.getElementById('email').value = currentUser.email;
-                document.getElementById('phone').value = userProfile.phone || '';
-                document.getElementById('university').value = userProfile.university || '';
-                document.getElementById('course').value = userProfile.course || '';
-                document.getElementById('year').value = userProfile.year || '';
-                document.getElementById('gpa').value = userProfile.gpa || '';
-                document.getElementById('skills').value = userProfile.skills || '';
-                document.getElementById('interests').value = userProfile.interests || '';
-            }
-        }
-        
-        const appsResponse = await fetch(`${API_URL}/api/applications/${currentUser.id}`);
-        if (appsResponse.ok) {
-            userApplications = await appsResponse.json();
-        }
-        
+        await syncProfile();
+        await syncApplications();
     } catch (error) {
         console.error('Error loading user data:', error);
     }
 }
 
+async function syncProfile() {
+    const response = await fetch(`${API_URL}/api/profile/${currentUser.id}?since=${profileCursor}`);
+    if (!response.ok) return;
+    
+    const delta = await response.json();
+    profileCursor = delta.cursor;
+    if (!delta.profile) return;
+    
+    userProfile = delta.profile;
+    document.getElementById('firstName').value = currentUser.first_name;
+    document.getElementById('lastName').value = currentUser.last_name;
+    document.getElementById('email').value = currentUser.email;
+    document.getElementById('phone').value = userProfile.phone || '';
+    document.getElementById('university').value = userProfile.university || '';
+    document.getElementById('course').value = userProfile.course || '';
+    document.getElementById('year').value = userProfile.year || '';
+    document.getElementById('gpa').value = userProfile.gpa || '';
+    document.getElementById('skills').value = userProfile.skills || '';
+    document.getElementById('interests').value = userProfile.interests || '';
+}
+
+async function syncApplications() {
+    // Only applications added or changed since the last sync come back,
+    // so polling costs next to nothing when nothing has changed.
+    try {
+        const response = await fetch(`${API_URL}/api/applications/${currentUser.id}?since=${applicationsCursor}`);
+        if (!response.ok) return;
+        
+        const delta = await response.json();
+        delta.items.forEach(item => {
+            const index = userApplications.findIndex(app => app.id === item.id);
+            if (index === -1) {
+                userApplications.push(item);
+            } else {
+                userApplications[index] = item;
+            }
+        });
+        userApplications.sort((a, b) => b.date_applied.localeCompare(a.date_applied));
+        applicationsCursor = delta.cursor;
+    } catch (error) {
+        console.error('Error syncing applications:', error);
+    }
+}
+
 async function registerStudent(event) {
     event.preventDefault();
     
@@ -450,7 +492,58 @@ async function registerStudent(event) {
     }
 }
 
-async function applyInternship(position, company) {
+async function searchInternships(event) {
+    if (event) event.preventDefault();
+    
+    const grid = document.getElementById('internships-grid');
+    const params = new URLSearchParams();
+    const query = document.getElementById('internship-query').value.trim();
+    const location = document.getElementById('internship-location').value;
+    if (query) params.set('q', query);
+    if (location) params.set('location', location);
+    
+    try {
+        const response = await fetch(`${API_URL}/api/internships?${params}`);
+        const data = await response.json();
+        internships = data.items;
+        displayInternships();
+        updateLocationFacet(data.facets.location, location);
+    } catch (error) {
+        console.error('Error loading internships:', error);
+        grid.innerHTML = '<p style="text-align: center; color: #999; padding: 2rem;">Unable to load internships.</p>';
+    }
+}
+
+function updateLocationFacet(options, selected) {
+    const select = document.getElementById('internship-location');
+    select.innerHTML = '<option value="">All locations</option>' + options.map(option => `
+        <option value="${escapeHtml(option.value)}" ${option.value === selected ? 'selected' : ''}>
+            ${escapeHtml(option.value)} (${option.count})
+        </option>
+    `).join('');
+}
+
+function displayInternships() {
+    const grid = document.getElementById('internships-grid');
+    
+    if (internships.length === 0) {
+        grid.innerHTML = '<p style="text-align: center; color: #999; padding: 2rem;">No internships match your search.</p>';
+        return;
+    }
+    
+    grid.innerHTML = internships.map(internship => `
+        <div class="card">
+            <h3>${escapeHtml(internship.title)}</h3>
+            <p class="company"><b>Company:</b> ${escapeHtml(internship.company)}</p>
+            <p class="location"><b>Location:</b> ${escapeHtml(internship.location || 'N/A')}</p>
+            <p><b>Duration:</b> ${escapeHtml(internship.duration || 'N/A')}</p>
+            <p><b>Requirements:</b> ${escapeHtml(internship.requirements || 'N/A')}</p>
+            <button onclick="applyInternship(${Number(internship.id)})">Apply Now</button>
+        </div>
+    `).join('');
+}
+
+async function applyInternship(internshipId) {
     if (!currentUser) {
         alert('Please login to apply for internships');
         return;
@@ -462,8 +555,10 @@ async function applyInternship(position, company) {
         return;
     }
     
+    const internship = internships.find(item => item.id === internshipId);
     const alreadyApplied = userApplications.some(
-        app => app.position === position && app.company === company
+        app => app.internship_id === internshipId ||
+            (internship && app.position === internship.position && app.company === internship.company)
     );
     
     if (alreadyApplied) {
@@ -479,8 +574,7 @@ async function applyInternship(position, company) {
             },
             body: JSON.stringify({
                 user_id: currentUser.id,
-                position: position,
-                company: company
+                internship_id: internshipId
             })
         });
         
@@ -546,8 +640,8 @@ function displayApplications() {
     
     tbody.innerHTML = userApplications.map(app => `
         <tr>
-            <td>${app.position}</td>
-            <td>${app.company}</td>
+            <td>${escapeHtml(app.position)}</td>
+            <td>${escapeHtml(app.company)}</td>
             <td>${new Date(app.date_applied).toLocaleDateString()}</td>
             <td>
                 <span class="status-${app.status.toLowerCase()}">
@@ -0,0 +1,66 @@
+"""
+Admin dashboard counters.
+
+The counters table is kept current by the triggers added in migration 3,
+so reading the stats is a single primary-key scan of four rows. reconcile()
+recomputes every counter from the base tables to detect and repair drift.
+"""
+import sys
+
+import db
+
+
+COUNTER_QUERIES = {
+    'users': "SELECT COUNT(*) FROM users",
+    'profiles': "SELECT COUNT(*) FROM profiles",
+    'applications': "SELECT COUNT(*) FROM applications",
+    'pending_applications': "SELECT COUNT(*) FROM applications WHERE status = 'Pending'",
+}
+
+
+def read_counters(conn):
+    counters = {name: 0 for name in COUNTER_QUERIES}
+    for row in conn.execute("SELECT name, value FROM counters"):
+        # counters also holds row_version (migration 8), which is not a count.
+        if row[0] in counters:
+            counters[row[0]] = row[1]
+    return counters
+
+
+def reconcile(conn, fix=True):
+    """
+    Recount every counter from scratch and return {name: (stored, actual)}
+    for the ones that drifted. With fix=True the stored values are replaced
+    in the same transaction the recount ran in.
+    """
+    conn.execute("BEGIN IMMEDIATE")
+    try:
+        stored = read_counters(conn)
+        drift = {}
+        for name, sql in COUNTER_QUERIES.items():
+            actual = conn.execute(sql).fetchone()[0]
+            if stored[name] != actual:
+                drift[name] = (stored[name], actual)
+                if fix:
+                    conn.execute(
+                        "INSERT OR REPLACE INTO counters (name, value) VALUES (?, ?)",
+                        (name, actual)
+                    )
+        conn.commit()
+    except Exception:
+        conn.rollback()
+        raise
+    return drift
+
+
+if __name__ == '__main__':
+    dry_run = '--dry-run' in sys.argv
+    with db.get_pool().connection() as conn:
+        drift = reconcile(conn, fix=not dry_run)
+    if not drift:
+        print("✓ All counters match the tables")
+    for name, (stored, actual) in drift.items():
+        action = "would fix" if dry_run else "fixed"
+        print(f"❌ {name}: stored {stored}, actual {actual} ({action})")
+    if drift and dry_run:
+        sys.exit(1)
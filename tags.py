@@ -0,0 +1,221 @@
+"""
+Boolean search over the skill tags in profile_tags.
+
+A query names tags joined with AND, OR and NOT, grouped with parentheses:
+
+    python AND (sql OR postgresql) AND NOT excel
+    "machine learning" OR data analysis
+
+Words between operators form one tag, so quotes are only needed for a tag
+that contains an operator word. Each tag becomes its posting list, a range
+of the (tag_id, profile_id) primary key, and the operators become
+INTERSECT, UNION and EXCEPT. Every list is read in profile id order, so
+SQLite merges them and stops once a page is full; the cursor bound is
+applied inside each list rather than after the merge. AND starts from the
+shortest list, using the per-tag counts kept by migration 11's triggers.
+
+Pages are newest profile first, in the /admin/profiles shape, with the
+total number of matches.
+"""
+import json
+import re
+
+import dal
+import pagination
+
+
+MAX_TAGS = 20
+
+SORT_COLUMNS = ['p.id']
+
+TOKEN_RE = re.compile(r'\s*(?:([()])|"([^"]*)"|([^\s()"]+))')
+
+OPERATORS = ('AND', 'OR', 'NOT')
+
+TAG_IDS_SQL = "SELECT name, id, profiles FROM tags WHERE name IN (SELECT value FROM json_each(?))"
+
+PROFILES_BY_ID_SQL = dal.CHANGED_ROWS_SQL['profiles'] + " ORDER BY p.id DESC"
+
+
+def tokenize(query):
+    tokens, pos = [], 0
+    query = query.rstrip()
+    while pos < len(query):
+        match = TOKEN_RE.match(query, pos)
+        if not match:
+            raise ValueError('Unbalanced quotes in query')
+        paren, quoted, word = match.groups()
+        if paren:
+            tokens.append(paren)
+        elif quoted is not None:
+            tokens.append(('tag', quoted))
+        elif word.upper() in OPERATORS:
+            tokens.append(word.upper())
+        else:
+            tokens.append(('word', word))
+        pos = match.end()
+    return tokens
+
+
+class Parser:
+    """
+    Recursive descent over the tokens. NOT binds tightest, then AND, then
+    OR. Produces ('tag', name), ('not', node), ('and', [nodes]) and
+    ('or', [nodes]).
+    """
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.pos = 0
+        self.tags = set()
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def take(self):
+        token = self.peek()
+        self.pos += 1
+        return token
+
+    def parse(self):
+        if not self.tokens:
+            raise ValueError('q is required')
+        node = self.parse_or()
+        if self.peek() is not None:
+            raise ValueError(f'Unexpected {self.describe(self.peek())} in query')
+        return node
+
+    def parse_or(self):
+        nodes = [self.parse_and()]
+        while self.peek() == 'OR':
+            self.take()
+            nodes.append(self.parse_and())
+        return nodes[0] if len(nodes) == 1 else ('or', nodes)
+
+    def parse_and(self):
+        nodes = [self.parse_not()]
+        while self.peek() == 'AND':
+            self.take()
+            nodes.append(self.parse_not())
+        return nodes[0] if len(nodes) == 1 else ('and', nodes)
+
+    def parse_not(self):
+        if self.peek() == 'NOT':
+            self.take()
+            return ('not', self.parse_not())
+        return self.parse_term()
+
+    def parse_term(self):
+        token = self.take()
+        if token == '(':
+            node = self.parse_or()
+            if self.take() != ')':
+                raise ValueError('Missing ) in query')
+            return node
+        if isinstance(token, tuple) and token[0] == 'tag':
+            return self.tag(token[1])
+        if isinstance(token, tuple):
+            words = [token[1]]
+            while isinstance(self.peek(), tuple) and self.peek()[0] == 'word':
+                words.append(self.take()[1])
+            return self.tag(' '.join(words))
+        raise ValueError(f'Expected a tag but found {self.describe(token)}')
+
+    def tag(self, text):
+        name = dal.normalize_tag(text)
+        if not name:
+            raise ValueError('Empty tag in query')
+        self.tags.add(name)
+        if len(self.tags) > MAX_TAGS:
+            raise ValueError(f'A query can name at most {MAX_TAGS} tags')
+        return ('tag', name)
+
+    @staticmethod
+    def describe(token):
+        return 'the end' if token is None else f'"{token}"' if isinstance(token, str) else f'"{token[1]}"'
+
+
+def parse(query):
+    """Parse a query; returns (tree, set of tag names). Raises ValueError."""
+    parser = Parser(tokenize(query or ''))
+    return parser.parse(), parser.tags
+
+
+class Compiler:
+    """
+    Turns a parsed query into one SELECT of matching profile ids. `before`
+    is the keyset bound of the page (profile ids below it), or None.
+    """
+
+    def __init__(self, tag_ids, sizes, before):
+        self.tag_ids = tag_ids
+        self.sizes = sizes
+        self.before = before
+        self.params = []
+
+    def bound(self, column):
+        if self.before is None:
+            return ''
+        self.params.append(self.before)
+        return f" AND {column} < ?"
+
+    def posting_list(self, name):
+        # A tag nobody has gets id 0, which matches no rows.
+        self.params.append(self.tag_ids.get(name, 0))
+        return "SELECT profile_id FROM profile_tags WHERE tag_id = ?" + self.bound('profile_id')
+
+    def all_profiles(self):
+        return "SELECT id AS profile_id FROM profiles WHERE 1 = 1" + self.bound('id')
+
+    def size(self, node):
+        if node[0] == 'tag':
+            return self.sizes.get(node[1], 0)
+        return float('inf')
+
+    def select(self, node):
+        kind = node[0]
+        if kind == 'tag':
+            return self.posting_list(node[1])
+        if kind == 'or':
+            return ' UNION '.join(self.operand(child) for child in node[1])
+        children = node[1] if kind == 'and' else [node]
+        included = sorted((child for child in children if child[0] != 'not'), key=self.size)
+        excluded = [child[1] for child in children if child[0] == 'not']
+        # Compound operators associate left to right, so A INTERSECT B
+        # EXCEPT C is (A and B) minus C.
+        sql = ' INTERSECT '.join(self.operand(child) for child in included) if included else self.all_profiles()
+        return sql + ''.join(' EXCEPT ' + self.operand(child) for child in excluded)
+
+    def operand(self, node):
+        sql = self.select(node)
+        if node[0] == 'tag':
+            return sql
+        # SQLite has no parentheses between compound operators.
+        return f"SELECT profile_id FROM ({sql})"
+
+
+def search_json(conn, query, limit=pagination.DEFAULT_LIMIT, after=None):
+    """
+    One page of profiles matching `query`, newest first, as the
+    /admin/profiles page body plus "total"; raises ValueError for a bad
+    query or cursor.
+    """
+    tree, names = parse(query)
+    if after is not None and (len(after) != 1 or not isinstance(after[0], int)):
+        raise ValueError('Invalid cursor')
+
+    tag_ids, sizes = {}, {}
+    for name, tag_id, profiles in conn.execute(TAG_IDS_SQL, (json.dumps(sorted(names)),)):
+        tag_ids[name], sizes[name] = tag_id, profiles
+
+    page = Compiler(tag_ids, sizes, after[0] if after else None)
+    sql = page.select(tree) + " ORDER BY profile_id DESC LIMIT ?"
+    ids = [row[0] for row in conn.execute(sql, page.params + [limit + 1])]
+
+    total = Compiler(tag_ids, sizes, None)
+    count_sql = f"SELECT COUNT(*) FROM ({total.select(tree)})"
+    count = conn.execute(count_sql, total.params).fetchone()[0]
+
+    rows = conn.execute(PROFILES_BY_ID_SQL, (json.dumps(ids),)).fetchall() if ids else []
+    body = pagination.json_page_body(rows, SORT_COLUMNS, limit)
+    return b'{"total":%d,%s' % (count, body[1:])
@@ -0,0 +1,165 @@
+"""
+Fixtures for the test suite. The environment is set before any module of
+the app is imported, so Config points at a throwaway database, hashes
+passwords cheaply on the calling thread, leaves the background threads
+idle and ends an /admin/events stream as soon as it has started.
+
+The `client` fixture runs every test that uses it twice, against the
+Flask app and the Quart app, through the same small interface.
+"""
+import asyncio
+import json
+import os
+import tempfile
+import uuid
+
+import pytest
+
+_tmp = tempfile.mkdtemp(prefix='internlink-tests-')
+os.environ.update({
+    'DATABASE': os.path.join(_tmp, 'internlink.db'),
+    'ARCHIVE_DATABASE': os.path.join(_tmp, 'internlink_archive.db'),
+    'ARCHIVE_INTERVAL': '0',
+    'CHANGE_LOG_PRUNE_INTERVAL': '0',
+    'EVENTS_STREAM_SECONDS': '0',
+    'HASH_POOL_MODE': 'inline',
+    'PASSWORD_HASH_METHOD': 'pbkdf2:sha256:1000',
+    'METRICS_DIR': '',
+})
+
+import db  # noqa: E402
+import migrations  # noqa: E402
+
+
+@pytest.fixture(scope='session', autouse=True)
+def database():
+    with db.get_pool().connection() as conn:
+        migrations.migrate(conn, verbose=False)
+    yield
+
+
+@pytest.fixture
+def conn():
+    with db.get_pool().connection() as conn:
+        yield conn
+
+
+class Result:
+    """The parts of a response the tests look at, read the same way from either app."""
+
+    def __init__(self, status_code, headers, data):
+        self.status_code = status_code
+        self.headers = headers
+        self.data = data
+
+    def get_json(self):
+        return json.loads(self.data)
+
+
+class FlaskClient:
+    name = 'flask'
+
+    def __init__(self, app):
+        self.app = app
+        self.client = app.test_client()
+
+    def open(self, method, path, **kwargs):
+        response = self.client.open(path, method=method, **kwargs)
+        data = response.get_data()
+        # As a WSGI server would once the body is sent.
+        response.close()
+        return Result(response.status_code, response.headers, data)
+
+    def close(self):
+        pass
+
+
+class QuartClient:
+    """Drives the Quart test client from synchronous tests, on a loop of its own."""
+
+    name = 'quart'
+
+    def __init__(self, app):
+        self.loop = asyncio.new_event_loop()
+        self.test_app = app.test_app()
+        self.loop.run_until_complete(self.test_app.startup())
+        self.client = self.test_app.test_client()
+
+    def open(self, method, path, **kwargs):
+        async def call():
+            response = await self.client.open(path, method=method, **kwargs)
+            return Result(response.status_code, response.headers, await response.get_data())
+        return self.loop.run_until_complete(call())
+
+    def close(self):
+        self.loop.run_until_complete(self.test_app.shutdown())
+        self.loop.close()
+
+
+@pytest.fixture(scope='session')
+def flask_app():
+    import app
+    return app.app
+
+
+@pytest.fixture(scope='session')
+def quart_app():
+    import async_app
+    return async_app.app
+
+
+@pytest.fixture(params=['flask', 'quart'])
+def client(request):
+    if request.param == 'flask':
+        client = FlaskClient(request.getfixturevalue('flask_app'))
+    else:
+        client = QuartClient(request.getfixturevalue('quart_app'))
+    yield client
+    client.close()
+
+
+@pytest.fixture
+def make_student(client):
+    """Sign up a student; returns (user_id, email, password)."""
+    def make(first_name='Ada', last_name='Lovelace', profile=None):
+        email = f'student-{uuid.uuid4().hex[:12]}@example.com'
+        password = 'correct horse battery'
+        response = client.open('POST', '/api/signup', json={
+            'email': email,
+            'password': password,
+            'first_name': first_name,
+            'last_name': last_name,
+        })
+        assert response.status_code == 201, response.data
+        user_id = response.get_json()['user']['id']
+        if profile is not None:
+            response = client.open('POST', '/api/profile', json={'user_id': user_id, **profile})
+            assert response.status_code == 200, response.data
+        return user_id, email, password
+    return make
+
+
+@pytest.fixture
+def student(make_student):
+    """A freshly signed-up student: (user_id, email, password)."""
+    return make_student()
+
+
+@pytest.fixture
+def walk(client):
+    """Every item of a keyset-paged listing, following next_cursor; returns (items, pages)."""
+    def walk(path, limit):
+        items, pages, cursor = [], 0, None
+        while True:
+            separator = '&' if '?' in path else '?'
+            url = f'{path}{separator}limit={limit}' + (f'&cursor={cursor}' if cursor else '')
+            response = client.open('GET', url)
+            assert response.status_code == 200, response.data
+            page = response.get_json()
+            assert len(page['items']) <= limit
+            items += page['items']
+            pages += 1
+            cursor = page['next_cursor']
+            if cursor is None:
+                return items, pages
+    return walk
@@ -0,0 +1,66 @@
+"""POST /api/apply/batch: one transaction for the whole batch."""
+import Config
+
+
+def apply_batch(client, user_id, items):
+    return client.open('POST', '/api/apply/batch', json={'user_id': user_id, 'applications': items})
+
+
+def applications(client, user_id):
+    return client.open('GET', f'/api/applications/{user_id}').get_json()
+
+
+def test_results_follow_the_items(client, student):
+    user_id = student[0]
+    assert applications(client, user_id) == []
+
+    response = apply_batch(client, user_id, [
+        {'internship_id': 1},
+        {'internship_id': 1},
+        {'position': 'Data Intern', 'company': 'Acme'},
+        {'position': 'No company'},
+        {'internship_id': 999999},
+        'not an object',
+    ])
+    assert response.status_code == 200
+    body = response.get_json()
+    assert [r['status'] for r in body['results']] == [
+        'created', 'already_applied', 'created', 'invalid', 'invalid', 'invalid',
+    ]
+    assert (body['created'], body['already_applied'], body['invalid']) == (2, 1, 3)
+    assert body['results'][0]['application']['id'] == body['results'][1]['application']['id']
+
+    # The cached list was dropped.
+    assert len(applications(client, user_id)) == 2
+
+    body = apply_batch(client, user_id, [{'internship_id': 1}, {'internship_id': 2}]).get_json()
+    assert [r['status'] for r in body['results']] == ['already_applied', 'created']
+
+
+def test_a_failing_insert_rolls_back_the_whole_batch(client, student, conn):
+    user_id = student[0]
+    conn.execute("""
+        CREATE TRIGGER test_refuse_company BEFORE INSERT ON applications
+        WHEN NEW.company = 'Refused Ltd' BEGIN SELECT RAISE(ABORT, 'refused'); END
+    """)
+    conn.commit()
+    try:
+        response = apply_batch(client, user_id, [
+            {'internship_id': 1},
+            {'position': 'Intern', 'company': 'Refused Ltd'},
+        ])
+        assert response.status_code == 500
+    finally:
+        conn.execute("DROP TRIGGER test_refuse_company")
+        conn.commit()
+
+    assert conn.execute("SELECT COUNT(*) FROM applications WHERE user_id = ?", (user_id,)).fetchone()[0] == 0
+    assert apply_batch(client, user_id, [{'internship_id': 1}]).get_json()['created'] == 1
+
+
+def test_batch_limits(client, student):
+    user_id = student[0]
+    assert apply_batch(client, user_id, []).status_code == 400
+    too_many = [{'internship_id': 1}] * (Config.APPLY_BATCH_LIMIT + 1)
+    assert apply_batch(client, user_id, too_many).status_code == 400
+    assert client.open('POST', '/api/apply/batch', json={'user_id': user_id}).status_code == 400
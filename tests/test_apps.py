@@ -0,0 +1,155 @@
+"""
+The Flask and Quart apps serve the same routes from handlers.py; every
+test here runs against both (see the `client` fixture).
+"""
+import gzip
+import os
+import re
+
+import pytest
+
+import Config
+import assets
+import build_assets
+import hashing
+
+
+def rules(app):
+    return {
+        (rule.rule, frozenset(rule.methods - {'HEAD', 'OPTIONS'}))
+        for rule in app.url_map.iter_rules()
+    }
+
+
+def test_apps_serve_the_same_routes(flask_app, quart_app):
+    assert rules(flask_app) == rules(quart_app)
+
+
+def test_signup_and_login(client, student):
+    user_id, email, password = student
+
+    response = client.open('POST', '/api/login', json={'email': email, 'password': password})
+    assert response.status_code == 200
+    assert response.get_json()['user'] == {
+        'id': user_id,
+        'first_name': 'Ada',
+        'last_name': 'Lovelace',
+        'email': email,
+        'user_type': 'student',
+    }
+
+    response = client.open('POST', '/api/login', json={'email': email, 'password': 'wrong'})
+    assert response.status_code == 401
+
+    response = client.open('POST', '/api/signup', json={
+        'email': email, 'password': password, 'first_name': 'A', 'last_name': 'B'
+    })
+    assert response.status_code == 400
+
+
+def test_missing_fields(client):
+    response = client.open('POST', '/api/signup', json={'email': 'someone@example.com'})
+    assert response.status_code == 400
+    assert response.headers['Content-Type'] == 'application/json'
+
+
+def test_profile_rejects_a_non_numeric_user_id(client, conn):
+    before = conn.execute("SELECT COUNT(*) FROM profiles").fetchone()[0]
+    response = client.open('POST', '/api/profile', json={'user_id': 'abc', 'university': 'Nairobi'})
+    assert response.status_code == 400
+    assert conn.execute("SELECT COUNT(*) FROM profiles").fetchone()[0] == before
+
+
+def test_cached_read_answers_304(client, student):
+    user_id = student[0]
+    response = client.open('POST', '/api/profile', json={'user_id': user_id, 'university': 'Nairobi', 'year': 2})
+    assert response.status_code == 200
+
+    response = client.open('GET', f'/api/profile/{user_id}')
+    assert response.status_code == 200
+    assert response.get_json()['university'] == 'Nairobi'
+    etag = response.headers['ETag']
+
+    response = client.open('GET', f'/api/profile/{user_id}', headers={'If-None-Match': etag})
+    assert response.status_code == 304
+    # Werkzeug drops Content-Type from a 304; Quart keeps the JSON one.
+    assert response.headers.get('Content-Type', 'application/json') == 'application/json'
+    assert response.headers['ETag'] == etag
+    assert response.data == b''
+
+    client.open('POST', '/api/profile', json={'user_id': user_id, 'university': 'Strathmore'})
+    response = client.open('GET', f'/api/profile/{user_id}', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.get_json()['university'] == 'Strathmore'
+
+
+def test_large_bodies_are_gzipped(client):
+    plain = client.open('GET', '/api/internships?per_page=50')
+    assert plain.status_code == 200
+    assert 'Content-Encoding' not in plain.headers
+
+    zipped = client.open('GET', '/api/internships?per_page=50', headers={'Accept-Encoding': 'gzip'})
+    assert zipped.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in zipped.headers['Vary']
+    assert gzip.decompress(zipped.data) == plain.data
+
+
+@pytest.mark.parametrize('fmt, mimetype', [('csv', 'text/csv'), ('ndjson', 'application/x-ndjson')])
+def test_exports_stream_every_row(client, student, fmt, mimetype):
+    response = client.open('GET', f'/admin/users?format={fmt}')
+    assert response.status_code == 200
+    assert response.headers['Content-Type'].startswith(mimetype)
+    assert student[1].encode() in response.data
+
+    zipped = client.open('GET', f'/admin/users?format={fmt}', headers={'Accept-Encoding': 'gzip'})
+    assert zipped.headers['Content-Encoding'] == 'gzip'
+    assert gzip.decompress(zipped.data) == response.data
+
+
+def test_hashing_pool_and_write_queue(client, monkeypatch):
+    monkeypatch.setattr(Config, 'WRITE_QUEUE_ENABLED', True)
+    monkeypatch.setattr(hashing, '_pool', hashing.HashPool(Config.PASSWORD_HASH_METHOD, mode='thread'))
+    account = {'email': f'queued-{client.name}@example.com', 'password': 'correct horse battery'}
+
+    response = client.open('POST', '/api/signup', json={**account, 'first_name': 'Ada', 'last_name': 'L'})
+    assert response.status_code == 201
+    user_id = response.get_json()['user']['id']
+    assert client.open('POST', '/api/login', json=account).status_code == 200
+    assert client.open('POST', '/api/login', json={**account, 'password': 'wrong'}).status_code == 401
+
+    response = client.open('POST', '/api/profile', json={'user_id': user_id, 'university': 'Nairobi'})
+    assert response.status_code == 200
+    assert response.get_json()['university'] == 'Nairobi'
+    assert client.open('POST', '/api/apply', json={'user_id': user_id, 'internship_id': 1}).status_code == 201
+    assert client.open('POST', '/api/apply', json={'user_id': user_id, 'internship_id': 1}).status_code == 400
+
+
+@pytest.fixture
+def built_assets(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'ASSET_DIR', str(tmp_path))
+    monkeypatch.setattr(assets, '_manifest', None)
+    monkeypatch.setattr(assets, '_files', frozenset())
+    return build_assets.build(out_dir=str(tmp_path))
+
+
+def test_fingerprinted_assets(client, built_assets):
+    page = client.open('GET', '/').data.decode()
+    url = f"/assets/{built_assets['style.css']}"
+    assert re.search(rf'href="{re.escape(url)}"', page)
+
+    response = client.open('GET', url, headers={'Accept-Encoding': 'gzip'})
+    assert response.status_code == 200
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert response.headers['Cache-Control'] == assets.IMMUTABLE
+    assert response.headers['Content-Type'].startswith('text/css')
+    with open(os.path.join(build_assets.STATIC_DIR, 'style.css'), 'rb') as f:
+        assert gzip.decompress(response.data) == f.read()
+
+    assert 'Content-Encoding' not in client.open('GET', url).headers
+    assert client.open('GET', f'/assets/{assets.MANIFEST}').status_code == 404
+
+
+def test_error_statuses(client):
+    assert client.open('GET', '/api/internships/999999').status_code == 404
+    assert client.open('GET', '/api/internships?page=x').status_code == 400
+    assert client.open('GET', '/admin/users?cursor=nonsense').status_code == 400
@@ -0,0 +1,59 @@
+"""archive.py: moving old applications to the attached archive database."""
+import archive
+import Config
+
+
+def apply(client, user_id, internship_id):
+    response = client.open('POST', '/api/apply', json={'user_id': user_id, 'internship_id': internship_id})
+    assert response.status_code == 201
+    return response.get_json()
+
+
+def test_new_database_uses_incremental_vacuum(conn):
+    assert conn.execute("PRAGMA main.auto_vacuum").fetchone()[0] == 2
+    assert conn.execute("SELECT COUNT(*) FROM archive.sqlite_master WHERE name = 'applications'").fetchone()[0] == 1
+
+
+def test_old_applications_move_to_the_archive(client, student, conn):
+    user_id = student[0]
+    old = apply(client, user_id, 1)
+    new = apply(client, user_id, 2)
+    conn.execute("UPDATE applications SET date_applied = '2001-01-01 00:00:00' WHERE id = ?", (old['id'],))
+    conn.commit()
+
+    # Cached before the move; the archiver must drop it.
+    assert len(client.open('GET', f'/api/applications/{user_id}').get_json()) == 2
+
+    moved, _ = archive.Archiver(0, Config.ARCHIVE_AFTER_DAYS, Config.ARCHIVE_BATCH, 0).run_once()
+    assert moved == 1
+
+    hot = client.open('GET', f'/api/applications/{user_id}').get_json()
+    assert [item['id'] for item in hot] == [new['id']]
+
+    both = client.open('GET', f'/api/applications/{user_id}?include_archive=1').get_json()
+    assert sorted(item['id'] for item in both) == sorted([old['id'], new['id']])
+    assert conn.execute("SELECT user_id FROM archive.applications WHERE id = ?", (old['id'],)).fetchone()[0] == user_id
+
+
+def test_move_batch_reports_the_users(conn):
+    assert archive.move_batch(conn, '1900-01-01 00:00:00', 10) == (0, set())
+
+
+def test_archived_application_still_counts(client, student, conn):
+    user_id = student[0]
+    old = apply(client, user_id, 3)
+    conn.execute("UPDATE applications SET date_applied = '2001-01-01 00:00:00' WHERE id = ?", (old['id'],))
+    conn.commit()
+    archive.Archiver(0, Config.ARCHIVE_AFTER_DAYS, Config.ARCHIVE_BATCH, 0).run_once()
+
+    response = client.open('POST', '/api/apply', json={'user_id': user_id, 'internship_id': 3})
+    assert response.status_code == 400
+
+    response = client.open('POST', '/api/apply/batch', json={
+        'user_id': user_id, 'applications': [{'internship_id': 3}, {'internship_id': 4}],
+    })
+    assert response.status_code == 200
+    results = response.get_json()['results']
+    assert results[0]['status'] == 'already_applied'
+    assert results[0]['application']['id'] == old['id']
+    assert results[1]['status'] == 'created'
@@ -0,0 +1,44 @@
+"""async_app.py: hashing and write-queue waits are awaited, not held in a thread."""
+import asyncio
+import threading
+
+import Config
+import hashing
+
+
+def test_hash_wait_holds_no_worker_thread(quart_app, monkeypatch):
+    monkeypatch.setattr(Config, 'ASYNC_THREADS', 1)
+    monkeypatch.setattr(hashing, '_pool', hashing.HashPool(Config.PASSWORD_HASH_METHOD, mode='thread'))
+    started, release = threading.Event(), threading.Event()
+    check = hashing._check
+
+    def slow_check(pwhash, password):
+        started.set()
+        release.wait(30)
+        return check(pwhash, password)
+
+    async def scenario():
+        test_app = quart_app.test_app()
+        await test_app.startup()
+        client = test_app.test_client()
+        try:
+            account = {'email': 'waiting@example.com', 'password': 'correct horse battery'}
+            response = await client.post('/api/signup', json={**account, 'first_name': 'Ada', 'last_name': 'L'})
+            assert response.status_code == 201
+
+            monkeypatch.setattr(hashing, '_check', slow_check)
+            login = asyncio.ensure_future(client.post('/api/login', json=account))
+            while not started.is_set():
+                await asyncio.sleep(0.01)
+
+            # The only worker thread is free while the login waits on the hash.
+            response = await asyncio.wait_for(client.get('/api/internships/1'), 2)
+            assert response.status_code == 200
+
+            release.set()
+            assert (await login).status_code == 200
+        finally:
+            release.set()
+            await test_app.shutdown()
+
+    asyncio.run(scenario())
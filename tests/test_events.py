@@ -0,0 +1,52 @@
+"""The /admin/events feed: resume points, the per-process stream cap and pruning."""
+import asyncio
+import gc
+
+import Config
+import changes
+
+
+def latest(conn):
+    return conn.execute(changes.LATEST_SQL).fetchone()[0]
+
+
+def test_feed_starts_at_the_newest_change(client, student, conn):
+    response = client.open('GET', '/admin/events')
+    assert response.status_code == 200
+    assert response.headers['Content-Type'].startswith('text/event-stream')
+    assert response.data.decode() == f"retry: {Config.EVENTS_RETRY_MS}\n\nid: {latest(conn)}\n\n"
+    assert changes.streams.open == 0
+
+
+def test_unknown_event_id_resets(client, conn):
+    response = client.open('GET', f'/admin/events?last_event_id={latest(conn) + 1000}')
+    assert changes.reset_event(latest(conn)) in response.data.decode()
+
+
+def test_streams_over_the_limit_are_refused(client, monkeypatch):
+    monkeypatch.setattr(changes.streams, 'limit', 0)
+    refused = changes.streams.refused
+
+    response = client.open('GET', '/admin/events')
+    assert response.status_code == 503
+    assert response.headers['Retry-After'] == '2'
+    assert changes.streams.refused == refused + 1
+    assert changes.streams.open == 0
+
+
+def test_pruner_keeps_the_newest_entries(client, student, conn, monkeypatch):
+    monkeypatch.setattr(Config, 'CHANGE_LOG_RETAIN', 1)
+    changes.pruner.run_once()
+    assert [row[0] for row in conn.execute("SELECT seq FROM change_log")] == [latest(conn)]
+
+
+def test_unsent_feed_gives_its_slot_back(quart_app):
+    async def drop_unsent():
+        async with quart_app.test_request_context('/admin/events'):
+            response = await quart_app.view_functions['admin_events']()
+            assert changes.streams.open == 1
+        del response
+        gc.collect()
+
+    asyncio.run(drop_unsent())
+    assert changes.streams.open == 0
@@ -0,0 +1,24 @@
+"""hashing.py: the bounded password hashing pool."""
+import threading
+
+import pytest
+
+import hashing
+
+
+def test_timed_out_job_keeps_its_slot_until_it_finishes():
+    pool = hashing.HashPool('pbkdf2:sha256:1000', mode='thread', max_pending=1, timeout=0.05)
+    release = threading.Event()
+    with pytest.raises(hashing.HashPoolBusy, match='timed out'):
+        pool._run('hash', release.wait)
+
+    # The job is still running, so the only slot is still taken.
+    with pytest.raises(hashing.HashPoolBusy, match='saturated'):
+        pool._run('hash', release.wait)
+
+    release.set()
+    assert pool._slots.acquire(timeout=5)
+    pool._slots.release()
+    assert pool.hash_password('secret').startswith('pbkdf2:sha256:1000$')
+    assert pool.stats()['timeouts'] == 1
+    assert pool.stats()['rejected'] == 1
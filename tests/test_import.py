@@ -0,0 +1,96 @@
+"""import_users.py: bulk loads, error reporting, checkpoints and indexes."""
+import csv
+import json
+import sys
+import uuid
+
+import pytest
+
+import import_users
+
+
+INDEXES_SQL = "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name IN ('users', 'profiles') ORDER BY name"
+
+
+def write_csv(path, rows):
+    fields = ['first_name', 'last_name', 'email', 'password', 'university', 'year', 'gpa', 'skills']
+    with open(path, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fields)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def run(monkeypatch, *args):
+    monkeypatch.setattr(sys, 'argv', ['import_users.py', *map(str, args), '--workers', '1', '--batch', '2'])
+    import_users.main()
+
+
+@pytest.fixture
+def cohort(tmp_path, student):
+    tag = uuid.uuid4().hex[:8]
+    rows = [
+        {'first_name': 'Imani', 'last_name': 'Njeri', 'email': f'imani-{tag}@example.com', 'password': 'pw-123456',
+         'university': 'Moi University', 'year': '2', 'gpa': '3.4', 'skills': f'python, import-{tag}'},
+        {'first_name': 'Baraka', 'last_name': 'Mwangi', 'email': f'baraka-{tag}@example.com', 'password': 'pw-123456'},
+        {'first_name': '', 'last_name': 'Nobody', 'email': f'nobody-{tag}@example.com', 'password': 'pw'},
+        {'first_name': 'Again', 'last_name': 'Student', 'email': student[1], 'password': 'pw-123456'},
+        {'first_name': 'Year', 'last_name': 'Typo', 'email': f'typo-{tag}@example.com', 'password': 'pw', 'year': 'two'},
+    ]
+    path = tmp_path / 'cohort.csv'
+    write_csv(path, rows)
+    return path, tag
+
+
+def test_import_loads_rows_and_reports_errors(client, conn, cohort, monkeypatch):
+    path, tag = cohort
+    indexes = conn.execute(INDEXES_SQL).fetchall()
+    run(monkeypatch, path)
+
+    user = conn.execute("SELECT id, first_name FROM users WHERE email = ?", (f'imani-{tag}@example.com',)).fetchone()
+    assert user['first_name'] == 'Imani'
+    profile = client.open('GET', f"/api/profile/{user['id']}").get_json()
+    assert (profile['university'], profile['year'], profile['gpa']) == ('Moi University', 2, 3.4)
+    assert client.open('GET', f'/admin/profiles/tags?q=import-{tag}').get_json()['total'] == 1
+
+    baraka = conn.execute("SELECT id FROM users WHERE email = ?", (f'baraka-{tag}@example.com',)).fetchone()
+    assert client.open('GET', f"/api/profile/{baraka['id']}").status_code == 404
+
+    errors = [json.loads(line) for line in open(f'{path}.errors.ndjson')]
+    assert sorted((error['row'], error['error']) for error in errors) == [
+        (3, 'first_name is required'),
+        (4, 'Email already registered'),
+        (5, 'year and gpa must be numbers'),
+    ]
+
+    job = conn.execute(import_users.JOB_SQL, (str(path),)).fetchone()
+    assert tuple(job)[:4] == (5, 2, 3, None)
+    assert job['finished_at'] is not None
+    assert conn.execute(INDEXES_SQL).fetchall() == indexes
+
+
+def test_finished_import_is_not_repeated(conn, cohort, monkeypatch, capsys):
+    path, _ = cohort
+    run(monkeypatch, path)
+    run(monkeypatch, path)
+    assert 'Already imported' in capsys.readouterr().out
+
+
+def test_offline_import_rebuilds_the_deferred_indexes(conn, cohort, monkeypatch, capsys):
+    path, _ = cohort
+    indexes = conn.execute(INDEXES_SQL).fetchall()
+    run(monkeypatch, path, '--offline')
+    assert f'Deferred {len(indexes) - 2} indexes' in capsys.readouterr().out
+    assert conn.execute(INDEXES_SQL).fetchall() == indexes
+
+
+def test_interrupted_offline_import_restores_indexes_first(conn, cohort, monkeypatch, capsys):
+    path, _ = cohort
+    indexes = conn.execute(INDEXES_SQL).fetchall()
+    conn.execute(import_users.START_JOB_SQL, (str(path),))
+    conn.commit()
+    import_users.defer_indexes(conn, str(path), None)
+    assert len(conn.execute(INDEXES_SQL).fetchall()) < len(indexes)
+
+    run(monkeypatch, path)
+    assert 'left dropped' in capsys.readouterr().out
+    assert conn.execute(INDEXES_SQL).fetchall() == indexes
@@ -0,0 +1,45 @@
+"""metrics.py: adding up the snapshots of several processes."""
+import os
+import subprocess
+
+import Config
+import metrics
+
+
+def dead_pid():
+    process = subprocess.Popen(['true'])
+    process.wait()
+    return process.pid
+
+
+def snapshot(directory, pid, jobs, busy):
+    with open(os.path.join(directory, f'{pid}-1.prom'), 'w') as f:
+        f.write(
+            "# HELP test_jobs_total Jobs.\n# TYPE test_jobs_total counter\n"
+            f"test_jobs_total{{kind=\"a\"}} {jobs}\n"
+            "# HELP test_busy Busy threads.\n# TYPE test_busy gauge\n"
+            f"test_busy {busy}\n"
+        )
+
+
+def sample(text, name):
+    return [line for line in text.splitlines() if line.startswith(name)]
+
+
+def test_exited_snapshots_are_folded_into_one_file(tmp_path, monkeypatch):
+    monkeypatch.setattr(Config, 'METRICS_DIR', str(tmp_path))
+    monkeypatch.setattr(metrics, '_snapshot_name', None)
+    snapshot(tmp_path, dead_pid(), 3, 1)
+    snapshot(tmp_path, dead_pid(), 4, 1)
+
+    text = metrics.render()
+    assert sample(text, 'test_jobs_total') == ['test_jobs_total{kind="a"} 7']
+    assert sample(text, 'test_busy') == []
+    assert sorted(os.listdir(tmp_path)) == sorted(['.lock', metrics.EXITED_SNAPSHOT, metrics._snapshot_name])
+
+    snapshot(tmp_path, dead_pid(), 5, 1)
+    assert sample(metrics.render(), 'test_jobs_total') == ['test_jobs_total{kind="a"} 12']
+    assert len(os.listdir(tmp_path)) == 3
+
+    metrics.clear_snapshots()
+    assert os.listdir(tmp_path) == ['.lock']
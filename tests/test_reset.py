@@ -0,0 +1,90 @@
+"""Password reset: codes from resetcodes.py and the reset endpoints."""
+import time
+
+import pytest
+
+import Config
+import dal
+import db
+import resetcodes
+import throttle
+
+
+@pytest.fixture(autouse=True)
+def fresh_throttle(monkeypatch):
+    # forgot-password allows few requests per IP; keep these off the shared buckets.
+    monkeypatch.setattr(throttle, '_throttle', throttle.Throttle(Config.THROTTLE_LIMITS, throttle.MemoryStore()))
+
+
+def request_code(client, email):
+    response = client.open('POST', '/api/forgot-password', json={'email': email})
+    assert response.status_code == 200
+    return response.get_json()['reset_code']
+
+
+def reset(client, email, code, new_password='new-password-1'):
+    return client.open('POST', '/api/reset-password',
+                       json={'email': email, 'code': code, 'new_password': new_password})
+
+
+def login(client, email, password):
+    return client.open('POST', '/api/login', json={'email': email, 'password': password})
+
+
+def test_failed_update_keeps_the_code(client, student, monkeypatch):
+    _, email, password = student
+    code = request_code(client, email)
+
+    def fail(conn, email, password_hash):
+        raise RuntimeError('disk full')
+
+    with monkeypatch.context() as patch:
+        patch.setattr(dal, 'update_password_by_email', fail)
+        assert reset(client, email, code).status_code == 500
+    assert login(client, email, password).status_code == 200
+
+    assert reset(client, email, code).status_code == 200
+    assert login(client, email, 'new-password-1').status_code == 200
+    assert reset(client, email, code, 'another-password').status_code == 400
+
+
+def verify(client, email, code):
+    return client.open('POST', '/api/verify-reset-code', json={'email': email, 'code': code})
+
+
+def test_wrong_guesses_burn_the_code(client, student):
+    _, email, _ = student
+    code = request_code(client, email)
+    wrong = '000000' if code != '000000' else '111111'
+    for _ in range(Config.RESET_CODE_MAX_ATTEMPTS):
+        assert verify(client, email, wrong).status_code == 400
+
+    assert verify(client, email, code).status_code == 400
+    assert reset(client, email, code).status_code == 400
+
+
+def test_a_new_code_replaces_the_old_one(client, student):
+    _, email, _ = student
+    old = request_code(client, email)
+    new = request_code(client, email)
+    if old != new:
+        assert verify(client, email, old).status_code == 400
+    assert verify(client, email, new).status_code == 200
+
+
+@pytest.mark.parametrize('store', [
+    resetcodes.MemoryStore(ttl=600, max_attempts=3),
+    resetcodes.SQLiteStore(ttl=600, max_attempts=3),
+], ids=['memory', 'sqlite'])
+def test_codes_expire(store):
+    email = f'expiry-{type(store).__name__}@example.com'
+    now = time.time()
+    with db.bound_connection():
+        code = store.issue(email, now=now)
+        assert store.check(email, code, now=now + 599) == resetcodes.VALID
+        assert store.check(email, code, now=now + 600) == resetcodes.INVALID
+        assert store.redeem(email, code, lambda conn: None, now=now + 600) == resetcodes.INVALID
+
+        code = store.issue(email, now=now)
+        assert store.purge(100, now=now + 600) >= 1
+        assert store.check(email, code, now=now) == resetcodes.INVALID
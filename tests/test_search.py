@@ -0,0 +1,59 @@
+"""/admin/users/search and /admin/profiles/search: filters, sorts and totals."""
+import uuid
+
+import pytest
+
+
+def unique(prefix):
+    return f'{prefix}{uuid.uuid4().hex[:8]}'
+
+
+def test_user_search_by_prefix_and_full_name(client, make_student, walk):
+    last = unique('Zed')
+    ids = {make_student('Wanjiru', last)[0], make_student('Otieno', last)[0], make_student('Wambui', last)[0]}
+
+    response = client.open('GET', f'/admin/users/search?q={last.lower()}')
+    page = response.get_json()
+    assert page['total'] == 3
+    assert {item['id'] for item in page['items']} == ids
+
+    page = client.open('GET', f'/admin/users/search?q=wa+{last}').get_json()
+    assert sorted(item['first_name'] for item in page['items']) == ['Wambui', 'Wanjiru']
+
+    items, pages = walk(f'/admin/users/search?q={last}&sort=first_name', limit=2)
+    assert [item['first_name'] for item in items] == ['Otieno', 'Wambui', 'Wanjiru']
+    assert pages == 2
+
+    items, _ = walk(f'/admin/users/search?q={last}&sort=-first_name', limit=1)
+    assert [item['first_name'] for item in items] == ['Wanjiru', 'Wambui', 'Otieno']
+
+
+def test_user_search_escapes_like_wildcards(client, make_student):
+    last = unique('Pct')
+    make_student('Amina', last)
+    assert client.open('GET', '/admin/users/search?q=%25').get_json()['total'] == 0
+    assert client.open('GET', f'/admin/users/search?q={last[:3]}_').get_json()['total'] == 0
+
+
+def test_profile_search_filters_and_sorts(client, make_student, walk):
+    university = unique('University ')
+    for year, gpa in [(2, 3.1), (2, 3.8), (3, 3.5), (2, None)]:
+        profile = {'university': university, 'course': 'Informatics', 'year': year}
+        if gpa is not None:
+            profile['gpa'] = gpa
+        make_student(profile=profile)
+
+    base = f'/admin/profiles/search?university={university.upper()}'
+    assert client.open('GET', base).get_json()['total'] == 4
+    assert client.open('GET', base + '&year=2').get_json()['total'] == 3
+
+    items, _ = walk(base + '&year=2&sort=-gpa', limit=1)
+    assert [item['gpa'] for item in items] == [3.8, 3.1]
+
+    items, _ = walk(base + '&sort=year', limit=3)
+    assert [item['year'] for item in items] == [2, 2, 2, 3]
+
+
+@pytest.mark.parametrize('query', ['sort=name', 'year=second', 'sort=-bogus'])
+def test_profile_search_rejects_bad_arguments(client, query):
+    assert client.open('GET', f'/admin/profiles/search?{query}').status_code == 400
@@ -0,0 +1,58 @@
+"""?since= delta reads of /api/profile/<id> and /api/applications/<id>."""
+
+
+def get(client, path):
+    response = client.open('GET', path)
+    assert response.status_code == 200, response.data
+    return response.get_json()
+
+
+def test_profile_since(client, student):
+    user_id = student[0]
+    assert client.open('GET', f'/api/profile/{user_id}?since=0').status_code == 404
+
+    client.open('POST', '/api/profile', json={'user_id': user_id, 'university': 'Nairobi'})
+    first = get(client, f'/api/profile/{user_id}?since=0')
+    assert first['profile']['university'] == 'Nairobi'
+    cursor = first['cursor']
+    assert cursor > 0
+
+    assert get(client, f'/api/profile/{user_id}?since={cursor}') == {'cursor': cursor, 'profile': None}
+
+    client.open('POST', '/api/profile', json={'user_id': user_id, 'university': 'Strathmore'})
+    changed = get(client, f'/api/profile/{user_id}?since={cursor}')
+    assert changed['cursor'] > cursor
+    assert changed['profile']['university'] == 'Strathmore'
+
+
+def test_applications_since(client, student):
+    user_id = student[0]
+    assert get(client, f'/api/applications/{user_id}?since=0') == {'cursor': 0, 'items': []}
+
+    ids = [
+        client.open('POST', '/api/apply', json={'user_id': user_id, 'internship_id': n}).get_json()['id']
+        for n in (1, 2)
+    ]
+    first = get(client, f'/api/applications/{user_id}?since=0')
+    assert [item['id'] for item in first['items']] == ids
+    cursor = first['cursor']
+
+    assert get(client, f'/api/applications/{user_id}?since={cursor}') == {'cursor': cursor, 'items': []}
+
+    response = client.open('POST', '/admin/applications/status', json={'status': 'Approved', 'ids': [ids[1]]})
+    assert response.status_code == 200
+    changed = get(client, f'/api/applications/{user_id}?since={cursor}')
+    assert [(item['id'], item['status']) for item in changed['items']] == [(ids[1], 'Approved')]
+    assert changed['cursor'] > cursor
+
+    # A cursor from before both changes returns each row once, at its newest.
+    both = get(client, f'/api/applications/{user_id}?since=0')
+    assert sorted(item['id'] for item in both['items']) == sorted(ids)
+    assert both['cursor'] == changed['cursor']
+
+
+def test_since_must_be_a_number(client, student):
+    user_id = student[0]
+    assert client.open('GET', f'/api/applications/{user_id}?since=soon').status_code == 400
+    assert client.open('GET', f'/api/profile/{user_id}?since=soon').status_code == 400
+    assert get(client, f'/api/applications/{user_id}?since=-5') == {'cursor': 0, 'items': []}
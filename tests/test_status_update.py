@@ -0,0 +1,72 @@
+"""POST /admin/applications/status: set-based bulk status updates."""
+import json
+
+import pytest
+
+import Config
+
+
+def apply(client, user_id, internship_id):
+    response = client.open('POST', '/api/apply', json={'user_id': user_id, 'internship_id': internship_id})
+    assert response.status_code == 201
+    return response.get_json()['id']
+
+
+def update_status(client, body):
+    return client.open('POST', '/admin/applications/status', json=body)
+
+
+def test_status_update_by_ids(client, student):
+    user_id = student[0]
+    first, second = apply(client, user_id, 3), apply(client, user_id, 4)
+    # Cached now; the update must invalidate it.
+    assert {item['status'] for item in client.open('GET', f'/api/applications/{user_id}').get_json()} == {'Pending'}
+
+    response = update_status(client, {'status': 'Approved', 'ids': [first]})
+    assert response.status_code == 200
+    summary = response.get_json()
+    assert summary['updated'] == 1
+    assert summary['previous'] == {'Pending': 1}
+
+    statuses = {item['id']: item['status'] for item in client.open('GET', f'/api/applications/{user_id}').get_json()}
+    assert statuses == {first: 'Approved', second: 'Pending'}
+
+    # Rows already at the status are left alone.
+    response = update_status(client, {'status': 'Approved', 'ids': [first]})
+    assert response.get_json()['updated'] == 0
+
+
+def test_status_update_by_filter(client, make_student):
+    internship_id = 4
+    applications = [apply(client, make_student()[0], internship_id) for _ in range(3)]
+    update_status(client, {'status': 'Rejected', 'ids': applications[:1]})
+
+    response = update_status(client, {'status': 'Approved', 'filter': {'internship_id': internship_id, 'status': 'Pending'}})
+    assert response.status_code == 200
+    assert response.get_json()['updated'] >= 2
+
+    response = client.open('GET', '/admin/applications?format=ndjson')
+    rows = {row['id']: row['status'] for row in map(json.loads, response.data.decode().splitlines())}
+    assert [rows[i] for i in applications] == ['Rejected', 'Approved', 'Approved']
+
+
+@pytest.mark.parametrize('body', [
+    {'status': 'Hired', 'ids': [1]},
+    {'status': 'Approved'},
+    {'status': 'Approved', 'ids': []},
+    {'status': 'Approved', 'ids': ['1']},
+    {'status': 'Approved', 'filter': {'email': 'x'}},
+    {'status': 'Approved', 'filter': {'company': ''}},
+])
+def test_status_update_rejects_bad_requests(client, body):
+    assert update_status(client, body).status_code == 400
+
+
+def test_status_update_over_the_limit_changes_nothing(client, student, monkeypatch):
+    user_id = student[0]
+    ids = [apply(client, user_id, 1), apply(client, user_id, 2)]
+    monkeypatch.setattr(Config, 'STATUS_UPDATE_LIMIT', 1)
+
+    assert update_status(client, {'status': 'Approved', 'ids': ids}).status_code == 400
+    statuses = {item['status'] for item in client.open('GET', f'/api/applications/{user_id}').get_json()}
+    assert statuses == {'Pending'}
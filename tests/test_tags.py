@@ -0,0 +1,33 @@
+"""/admin/profiles/tags: boolean search over skill tags."""
+import uuid
+
+import pytest
+
+
+def unique(prefix):
+    return f'{prefix}{uuid.uuid4().hex[:8]}'
+
+
+def test_tag_search(client, make_student, walk):
+    python, sql, excel = unique('python'), unique('sql'), unique('excel')
+    both = make_student(profile={'skills': f'{python}, {sql}'})[0]
+    with_excel = make_student(profile={'skills': f'{python}; {excel}'})[0]
+    only_sql = make_student(profile={'skills': sql.upper()})[0]
+
+    def users(query, limit=100):
+        items, _ = walk(f'/admin/profiles/tags?q={query}', limit)
+        return [item['user_id'] for item in items]
+
+    assert users(python) == [with_excel, both]
+    assert users(f'{python}+AND+{sql}') == [both]
+    assert users(f'{python}+AND+NOT+{excel}') == [both]
+    assert users(f'{excel}+OR+{sql}') == [only_sql, with_excel, both]
+    assert users(f'({python}+OR+{sql})+AND+NOT+{excel}', limit=1) == [only_sql, both]
+
+    page = client.open('GET', f'/admin/profiles/tags?q={python}+OR+{sql}&limit=1').get_json()
+    assert page['total'] == 3
+
+
+@pytest.mark.parametrize('query', ['', 'python+AND', '(python', '%22python', 'NOT'])
+def test_tag_search_rejects_bad_queries(client, query):
+    assert client.open('GET', f'/admin/profiles/tags?q={query}').status_code == 400
@@ -0,0 +1,49 @@
+"""throttle.py: token buckets for login and forgot-password."""
+import pytest
+
+import Config
+import throttle
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def buckets(request, conn, monkeypatch):
+    conn.execute("DELETE FROM throttle_buckets")
+    conn.commit()
+    store = throttle.MemoryStore() if request.param == 'memory' else throttle.SQLiteStore(purge_probability=0)
+    monkeypatch.setattr(throttle, '_throttle', throttle.Throttle(Config.THROTTLE_LIMITS, store))
+    return throttle._throttle
+
+
+def test_login_is_refused_after_the_email_burst(client, student, buckets):
+    _, email, password = student
+    burst, period = Config.THROTTLE_LIMITS['login']['email']
+    for _ in range(burst):
+        response = client.open('POST', '/api/login', json={'email': email, 'password': 'wrong'})
+        assert response.status_code == 401
+
+    # Even the right password, under another spelling of the address.
+    response = client.open('POST', '/api/login', json={'email': email.upper(), 'password': password})
+    assert response.status_code == 429
+    assert 0 < int(response.headers['Retry-After']) <= period / burst
+    assert buckets.stats()['rules']['login'] == {'allowed': burst, 'throttled': 1}
+
+
+def test_forgot_password_is_refused_after_the_ip_burst(client, buckets):
+    burst, period = Config.THROTTLE_LIMITS['forgot_password']['ip']
+    for n in range(burst):
+        response = client.open('POST', '/api/forgot-password', json={'email': f'nobody-{n}@example.com'})
+        assert response.status_code == 200
+
+    response = client.open('POST', '/api/forgot-password', json={'email': 'somebody-else@example.com'})
+    assert response.status_code == 429
+    assert response.headers['Retry-After'] == str(int(period / burst))
+
+
+def test_bucket_refills_over_time():
+    store = throttle.MemoryStore()
+    bucket = [('login:email:a@example.com', 2, 60)]
+    assert store.take(bucket, 1000) == 0
+    assert store.take(bucket, 1000) == 0
+    assert store.take(bucket, 1000) == pytest.approx(30)
+    assert store.take(bucket, 1015) == pytest.approx(15)
+    assert store.take(bucket, 1030) == 0
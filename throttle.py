@@ -0,0 +1,144 @@
+"""
+Token-bucket throttling for the expensive auth endpoints.
+
+Each rule in Config.THROTTLE_LIMITS has one bucket per identity kind
+(email, client IP). A request is admitted only if every one of its buckets
+has a token, and then one token is taken from each. Buckets live in
+process memory, or in the throttle_buckets table when they have to be
+shared between gunicorn workers.
+"""
+import random
+import threading
+import time
+
+import Config
+import db
+
+
+def _refill(tokens, updated_at, now, burst, period):
+    return min(burst, tokens + (now - updated_at) * burst / period)
+
+
+def _wait_time(tokens, burst, period):
+    return (1 - tokens) * period / burst
+
+
+class MemoryStore:
+
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def take(self, buckets, now):
+        """
+        `buckets` is a list of (key, burst, period). Returns 0 if a token
+        was taken from every bucket, else the seconds until that is possible.
+        """
+        with self._lock:
+            levels = []
+            wait = 0.0
+            for key, burst, period in buckets:
+                tokens, updated_at = self._buckets.get(key, (burst, now))
+                tokens = _refill(tokens, updated_at, now, burst, period)
+                levels.append(tokens)
+                if tokens < 1:
+                    wait = max(wait, _wait_time(tokens, burst, period))
+            if wait:
+                return wait
+            for (key, _, _), tokens in zip(buckets, levels):
+                self._buckets[key] = (tokens - 1, now)
+            if len(self._buckets) > self.max_keys:
+                self._sweep(now)
+            return 0.0
+
+    def _sweep(self, now):
+        # Buckets idle for an hour have refilled under every configured limit.
+        cutoff = now - 3600
+        for key in [k for k, (_, updated_at) in self._buckets.items() if updated_at < cutoff]:
+            del self._buckets[key]
+
+
+class SQLiteStore:
+
+    def __init__(self, purge_probability=0.01):
+        self.purge_probability = purge_probability
+
+    def take(self, buckets, now):
+        conn = db.get_db()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            levels = []
+            wait = 0.0
+            for key, burst, period in buckets:
+                row = conn.execute(
+                    "SELECT tokens, updated_at FROM throttle_buckets WHERE key = ?", (key,)
+                ).fetchone()
+                tokens = _refill(row[0], row[1], now, burst, period) if row else burst
+                levels.append(tokens)
+                if tokens < 1:
+                    wait = max(wait, _wait_time(tokens, burst, period))
+            if not wait:
+                conn.executemany(
+                    """
+                    INSERT INTO throttle_buckets (key, tokens, updated_at) VALUES (?, ?, ?)
+                    ON CONFLICT (key) DO UPDATE SET tokens = excluded.tokens, updated_at = excluded.updated_at
+                    """,
+                    [(key, tokens - 1, now) for (key, _, _), tokens in zip(buckets, levels)]
+                )
+            if random.random() < self.purge_probability:
+                conn.execute("DELETE FROM throttle_buckets WHERE updated_at < ?", (now - 3600,))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        return wait
+
+
+class Throttle:
+
+    def __init__(self, limits, store):
+        self.limits = limits
+        self.store = store
+        self._lock = threading.Lock()
+        self._counts = {}
+
+    def hit(self, rule, identities):
+        """
+        Take a token for `rule` from the bucket of every identity that has a
+        limit, e.g. hit('login', {'email': ..., 'ip': ...}). Returns 0 when
+        the request may go ahead, else the seconds the client should wait.
+        """
+        buckets = []
+        for kind, (burst, period) in self.limits.get(rule, {}).items():
+            value = identities.get(kind)
+            if value:
+                buckets.append((f"{rule}:{kind}:{value}", burst, period))
+        if not buckets:
+            return 0.0
+        wait = self.store.take(buckets, time.time())
+        with self._lock:
+            counts = self._counts.setdefault(rule, {'allowed': 0, 'throttled': 0})
+            counts['throttled' if wait else 'allowed'] += 1
+        return wait
+
+    def stats(self):
+        with self._lock:
+            return {
+                'store': type(self.store).__name__,
+                'rules': {rule: dict(counts) for rule, counts in self._counts.items()},
+            }
+
+
+_throttle = None
+_throttle_lock = threading.Lock()
+
+
+def get_throttle():
+    global _throttle
+    if _throttle is None:
+        with _throttle_lock:
+            if _throttle is None:
+                store = SQLiteStore() if Config.THROTTLE_STORE == 'sqlite' else MemoryStore()
+                _throttle = Throttle(Config.THROTTLE_LIMITS, store)
+    return _throttle
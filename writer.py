@@ -0,0 +1,204 @@
+"""
+Single-writer group commit for the hot write routes.
+
+With Config.WRITE_QUEUE_ENABLED, apply and save-profile do not write on the
+request thread. They put a write function on a queue, and one writer
+thread per process drains the queue in batches of up to
+WRITE_QUEUE_MAX_BATCH, waiting at most WRITE_QUEUE_MAX_DELAY_MS for a batch
+to fill. Each batch is one transaction with one fsync. Every write runs
+inside its own savepoint, so a failing write (for example a duplicate
+application) is rolled back alone and its error is raised in the request
+that submitted it.
+
+job() wraps a write for a handler to yield (see handlers.py); async_app.py
+awaits it with run_async() instead of holding a thread until the batch
+commits.
+"""
+import asyncio
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError
+
+import Config
+import db
+
+
+class WriterBusy(Exception):
+    """The queue is full, or a write did not finish within the timeout."""
+
+
+class Job:
+
+    def __init__(self, writer, fn, *args):
+        self.writer = writer
+        self.fn = fn
+        self.args = args
+
+    def run(self):
+        return self.writer.run(self.fn, *self.args)
+
+    async def run_async(self):
+        future = self.writer.submit(self.fn, *self.args)
+        try:
+            # Shielded: as in run(), a write that times out stays queued.
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(future)), self.writer.timeout)
+        except asyncio.TimeoutError:
+            self.writer._bump('timeouts')
+            raise WriterBusy('Write did not complete in time')
+
+
+class GroupCommitWriter:
+
+    def __init__(self, max_batch=64, max_delay=0.002, max_pending=1000, timeout=5.0):
+        self.max_batch = max_batch
+        self.max_delay = max_delay
+        self.max_pending = max_pending
+        self.timeout = timeout
+        self._queue = None
+        self._thread = None
+        self._pid = None
+        self._lock = threading.Lock()
+        self._stats = {
+            'writes': 0,
+            'failed': 0,
+            'batches': 0,
+            'max_batch_seen': 0,
+            'rejected': 0,
+            'timeouts': 0,
+            'commit_time_ms': 0.0,
+        }
+
+    def _ensure_started(self):
+        # A forked worker inherits the queue object but not the thread.
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._queue = queue.Queue(self.max_pending)
+                    self._thread = threading.Thread(target=self._run, args=(self._queue,), daemon=True)
+                    self._thread.start()
+                    self._pid = os.getpid()
+
+    def submit(self, fn, *args):
+        """Queue `fn(conn, *args)` and return a Future for its result."""
+        self._ensure_started()
+        future = Future()
+        try:
+            self._queue.put_nowait((fn, args, future))
+        except queue.Full:
+            self._bump('rejected')
+            raise WriterBusy('Write queue is full')
+        return future
+
+    def run(self, fn, *args):
+        """Like submit() but wait for the result, re-raising the write's error."""
+        future = self.submit(fn, *args)
+        try:
+            return future.result(self.timeout)
+        except TimeoutError:
+            # The write stays queued and may still commit.
+            self._bump('timeouts')
+            raise WriterBusy('Write did not complete in time')
+
+    def job(self, fn, *args):
+        return Job(self, fn, *args)
+
+    def _take_batch(self, pending):
+        batch = [pending.get()]
+        deadline = time.monotonic() + self.max_delay
+        while len(batch) < self.max_batch:
+            try:
+                batch.append(pending.get_nowait())
+                continue
+            except queue.Empty:
+                pass
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(pending.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self, pending):
+        conn = db.get_pool().connect()
+        while True:
+            batch = self._take_batch(pending)
+            try:
+                self._write_batch(conn, batch)
+            except Exception as e:
+                print(f"Group commit error: {e}")
+                if conn.in_transaction:
+                    conn.rollback()
+                for _, _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+
+    def _write_batch(self, conn, batch):
+        outcomes = []
+        conn.execute("BEGIN IMMEDIATE")
+        for fn, args, future in batch:
+            if not future.set_running_or_notify_cancel():
+                continue
+            conn.execute("SAVEPOINT write")
+            try:
+                result = fn(conn, *args)
+            except Exception as e:
+                conn.execute("ROLLBACK TO write")
+                conn.execute("RELEASE write")
+                outcomes.append((future, None, e))
+            else:
+                conn.execute("RELEASE write")
+                outcomes.append((future, result, None))
+
+        started = time.perf_counter()
+        conn.commit()
+        commit_ms = (time.perf_counter() - started) * 1000
+
+        failed = 0
+        for future, result, error in outcomes:
+            if error is None:
+                future.set_result(result)
+            else:
+                failed += 1
+                future.set_exception(error)
+
+        with self._lock:
+            self._stats['batches'] += 1
+            self._stats['writes'] += len(outcomes)
+            self._stats['failed'] += failed
+            self._stats['max_batch_seen'] = max(self._stats['max_batch_seen'], len(outcomes))
+            self._stats['commit_time_ms'] += commit_ms
+
+    def _bump(self, key):
+        with self._lock:
+            self._stats[key] += 1
+
+    def stats(self):
+        with self._lock:
+            stats = dict(self._stats)
+        stats['enabled'] = Config.WRITE_QUEUE_ENABLED
+        stats['pending'] = self._queue.qsize() if self._queue is not None and self._pid == os.getpid() else 0
+        stats['avg_batch'] = round(stats['writes'] / stats['batches'], 2) if stats['batches'] else 0.0
+        stats['commit_time_ms'] = round(stats['commit_time_ms'], 3)
+        return stats
+
+
+_writer = None
+_writer_lock = threading.Lock()
+
+
+def get_writer():
+    global _writer
+    if _writer is None:
+        with _writer_lock:
+            if _writer is None:
+                _writer = GroupCommitWriter(
+                    max_batch=Config.WRITE_QUEUE_MAX_BATCH,
+                    max_delay=Config.WRITE_QUEUE_MAX_DELAY_MS / 1000,
+                    max_pending=Config.WRITE_QUEUE_MAX_PENDING,
+                    timeout=Config.WRITE_QUEUE_TIMEOUT,
+                )
+    return _writer